@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Checkpoints for resuming interrupted ROBOCOPY GUI jobs
+
+A checkpoint lives in the job folder and is updated while a job runs. It holds
+the command, the engine, the cumulative statistics and elapsed time, and (for
+the Python engine) the directories that were fully synced and the files that
+were being copied. When a job is stopped or the application dies, the next run
+can resume from it: completed directories are skipped and the statistics and
+elapsed time carry on from where they were.
+"""
+
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+CHECKPOINT_FILE = "checkpoint.sqlite"
+
+STATUS_RUNNING = "running"
+STATUS_STOPPED = "stopped"
+STATUS_FAILED = "failed"
+STATUS_COMPLETED = "completed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS completed_dirs (
+    path TEXT PRIMARY KEY
+);
+"""
+
+
+class JobCheckpoint:
+    """Thread-safe checkpoint store shared by the GUI and the copy engine"""
+
+    def __init__(self, path, flush_interval=2.0):
+        """
+        Args:
+            path (str): Checkpoint database file
+            flush_interval (float): Minimum seconds between non-forced writes
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._state = {key: json.loads(value)
+                       for key, value in self._conn.execute("SELECT key, value FROM state")}
+        self._pending_dirs = []
+        self._dirty = False
+        self._closed = False
+        self._last_flush = 0.0
+
+    def is_resumable(self):
+        """Check whether the checkpoint belongs to an unfinished job"""
+        with self._lock:
+            return bool(self._state.get("command")) and self._state.get("status") != STATUS_COMPLETED
+
+    def begin(self, command, engine_name, resume=False):
+        """
+        Start tracking a job
+
+        Args:
+            command (str): Command being run
+            engine_name (str): Name of the copy engine
+            resume (bool): Keep the existing progress instead of starting over
+        """
+        with self._lock:
+            if not resume:
+                self._conn.execute("DELETE FROM state")
+                self._conn.execute("DELETE FROM completed_dirs")
+                self._state = {"stats": {}, "elapsed": 0.0, "engine_stats": {}, "in_flight": []}
+                self._pending_dirs = []
+            self._state.update(command=command, engine=engine_name, status=STATUS_RUNNING,
+                               updated=time.time())
+            self._state["runs"] = self._state.get("runs", 0) + 1
+            self._dirty = True
+            self.flush(force=True)
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._state.get(key, default)
+
+    def update(self, **fields):
+        """Update state fields; written on the next flush"""
+        with self._lock:
+            self._state.update(fields)
+            self._state["updated"] = time.time()
+            self._dirty = True
+
+    def mark_dir_completed(self, rel_dir):
+        """Record a directory whose files were all synced"""
+        with self._lock:
+            self._pending_dirs.append(rel_dir)
+            self._dirty = True
+
+    def completed_dirs(self):
+        """
+        Get the directories completed by previous runs
+
+        Returns:
+            set: Directory paths relative to the job root
+        """
+        with self._lock:
+            dirs = {row[0] for row in self._conn.execute("SELECT path FROM completed_dirs")}
+            dirs.update(self._pending_dirs)
+            return dirs
+
+    def flush(self, force=False):
+        """
+        Write pending changes to disk
+
+        Args:
+            force (bool): Write even if the flush interval has not elapsed
+        """
+        with self._lock:
+            if self._closed or not self._dirty:
+                return
+            if not force and time.time() - self._last_flush < self.flush_interval:
+                return
+            try:
+                with self._conn:
+                    self._conn.executemany("INSERT OR IGNORE INTO completed_dirs (path) VALUES (?)",
+                                           [(d,) for d in self._pending_dirs])
+                    self._conn.executemany("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                                           [(k, json.dumps(v)) for k, v in self._state.items()])
+                self._pending_dirs = []
+                self._dirty = False
+                self._last_flush = time.time()
+            except sqlite3.Error as e:
+                self.logger.error(f"Failed to write checkpoint {self.path}: {e}")
+
+    def finish(self, status):
+        """
+        Record the final status of a run
+
+        A completed job drops its directory list since there is nothing left
+        to resume.
+
+        Args:
+            status (str): STATUS_COMPLETED, STATUS_STOPPED or STATUS_FAILED
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._state["status"] = status
+            self._state["in_flight"] = []
+            if status == STATUS_COMPLETED:
+                self._pending_dirs = []
+                self._conn.execute("DELETE FROM completed_dirs")
+            self._dirty = True
+            self.flush(force=True)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self.flush(force=True)
+            self._closed = True
+            self._conn.close()
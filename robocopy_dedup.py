@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Content-hash dedup index for the Python copy engine
+
+The index is a SQLite database shared by all jobs (in the jobs folder). It
+records destination files by size, mtime and device, and - only once another
+file of the same size turns up - a hash of their first 64 KB and of their
+whole content, computed in chunks. Before copying a file, the engine looks
+for an indexed destination file with the same size and mtime on the same
+device; if the head and full hashes match too, the new destination file is
+created as a hard link to it and no data is copied.
+
+A hard link shares one set of timestamps, so only files with equal mtimes are
+linked; otherwise the next run would see every linked file as changed. Index
+entries are checked against the file on disk before use, and entries whose
+file changed or disappeared are dropped.
+"""
+
+import os
+import sqlite3
+import hashlib
+import logging
+import threading
+
+from robocopy_utils import JOBS_DIR
+
+DEDUP_INDEX_FILE = "dedup.sqlite"
+
+# Smaller files are cheaper to copy than to hash and look up
+DEDUP_MIN_SIZE = 1024 * 1024
+HEAD_SIZE = 64 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Pending index entries written in one transaction
+_FLUSH_EVERY = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    device INTEGER NOT NULL,
+    head TEXT,
+    hash TEXT
+);
+CREATE INDEX IF NOT EXISTS files_size ON files (size, mtime_ns, device);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def hash_file(path, limit=None, chunk_size=HASH_CHUNK_SIZE, stop_event=None):
+    """
+    Hash a file's content in chunks
+
+    Args:
+        path (str): File to hash
+        limit (int): Hash only the first limit bytes
+        stop_event (threading.Event): Abandons the hash when set
+
+    Returns:
+        str or None: Hex digest, None if stopped
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    buffer = bytearray(min(chunk_size, limit) if limit else chunk_size)
+    view = memoryview(buffer)
+    remaining = limit
+    with open(path, "rb", buffering=0) as f:
+        while remaining is None or remaining > 0:
+            if stop_event is not None and stop_event.is_set():
+                return None
+            count = f.readinto(view if remaining is None else view[:min(len(buffer), remaining)])
+            if not count:
+                break
+            digest.update(view[:count])
+            if remaining is not None:
+                remaining -= count
+    return digest.hexdigest()
+
+
+def default_index_path():
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    return os.path.join(JOBS_DIR, DEDUP_INDEX_FILE)
+
+
+class DedupIndex:
+    """Index of destination file contents used to hard link duplicates"""
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): Index database file (defaults to the shared index in the jobs folder)
+        """
+        self.path = path or default_index_path()
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._pending = []
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def add(self, path, stat, head=None, content=None):
+        """Record a destination file (written in batches; see flush)"""
+        if stat.st_size < DEDUP_MIN_SIZE:
+            return
+        with self._lock:
+            self._pending.append((os.path.abspath(path), stat.st_size, stat.st_mtime_ns, stat.st_dev,
+                                  head, content))
+            if len(self._pending) >= _FLUSH_EVERY:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        with self._conn:
+            # Keep known hashes of an unchanged file
+            self._conn.executemany(
+                "INSERT INTO files (path, size, mtime_ns, device, head, hash) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET "
+                "head = CASE WHEN size = excluded.size AND mtime_ns = excluded.mtime_ns "
+                "THEN coalesce(excluded.head, head) ELSE excluded.head END, "
+                "hash = CASE WHEN size = excluded.size AND mtime_ns = excluded.mtime_ns "
+                "THEN coalesce(excluded.hash, hash) ELSE excluded.hash END, "
+                "size = excluded.size, mtime_ns = excluded.mtime_ns, device = excluded.device",
+                self._pending)
+        self._pending = []
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _set_hashes(self, path, head, content):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE files SET head = coalesce(?, head), hash = coalesce(?, hash) "
+                               "WHERE path = ?", (head, content, path))
+
+    def _drop(self, path):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def find_duplicate(self, src, src_stat, device, exclude=None, stop_event=None):
+        """
+        Find an indexed file with the same content as a source file
+
+        Candidates are narrowed by size, mtime and device first; the source
+        is only read if one exists, and a candidate's full hash is only
+        computed if its head hash matches.
+
+        Args:
+            src (str): Source file
+            src_stat (os.stat_result): Its stat
+            device (int): Device of the destination directory (hard links
+                cannot cross devices)
+            exclude (str): Path that must not be returned (the destination itself)
+
+        Returns:
+            tuple or None: (path, head, hash) of the duplicate
+        """
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, head, hash FROM files WHERE size = ? AND mtime_ns = ? AND device = ?",
+                (src_stat.st_size, src_stat.st_mtime_ns, device)).fetchall()
+        exclude = os.path.abspath(exclude) if exclude else None
+        rows = [row for row in rows if row[0] != exclude]
+        if not rows:
+            return None
+
+        src_head = hash_file(src, HEAD_SIZE, stop_event=stop_event)
+        src_hash = None
+        for path, head, content in rows:
+            if src_head is None:
+                return None
+            try:
+                stat = os.stat(path)
+            except OSError:
+                self._drop(path)
+                continue
+            if stat.st_size != src_stat.st_size or stat.st_mtime_ns != src_stat.st_mtime_ns:
+                self._drop(path)
+                continue
+            try:
+                if head is None:
+                    head = hash_file(path, HEAD_SIZE, stop_event=stop_event)
+                    self._set_hashes(path, head, None)
+                if head != src_head:
+                    continue
+                if src_hash is None:
+                    src_hash = hash_file(src, stop_event=stop_event)
+                if content is None:
+                    content = hash_file(path, stop_event=stop_event)
+                    self._set_hashes(path, None, content)
+            except OSError as e:
+                self.logger.debug(f"Could not hash {path}: {e}")
+                continue
+            if src_hash is not None and content == src_hash:
+                return path, src_head, src_hash
+        return None
+
+    def copy_rate(self):
+        """Copy throughput (bytes per worker-second) measured by earlier runs, if any"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'copy_rate'").fetchone()
+        return float(row[0]) if row else None
+
+    def record_copy_rate(self, rate):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('copy_rate', ?)", (str(rate),))
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+
+def link_file(target, dst):
+    """
+    Create dst as a hard link to target, replacing an existing dst
+
+    The link is made under a temporary name and renamed over dst, so an
+    existing destination (which may itself be a hard link) is replaced
+    rather than written through.
+    """
+    temp = f"{dst}.{os.getpid()}.{threading.get_ident()}.link"
+    os.link(target, temp)
+    try:
+        os.replace(temp, dst)
+    except OSError:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+
+
+def format_saved(seconds):
+    seconds = max(0, int(seconds))
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class DedupStats:
+    """Dedup counters of one job and the time estimate for the summary"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files_linked = 0
+        self.bytes_avoided = 0
+        self.lookup_seconds = 0.0
+        self.copy_seconds = 0.0
+        self.bytes_copied = 0
+
+    def add_lookup(self, seconds, linked_bytes=None):
+        with self._lock:
+            self.lookup_seconds += seconds
+            if linked_bytes is not None:
+                self.files_linked += 1
+                self.bytes_avoided += linked_bytes
+
+    def add_copy(self, seconds, size):
+        with self._lock:
+            self.copy_seconds += seconds
+            self.bytes_copied += size
+
+    def measured_rate(self):
+        """Bytes copied per worker-second in this job (None without enough data)"""
+        if self.copy_seconds <= 0 or not self.bytes_copied:
+            return None
+        return self.bytes_copied / self.copy_seconds
+
+    def time_saved(self, rate):
+        """Estimated worker time saved: copying the avoided bytes minus the hashing spent"""
+        if not rate:
+            return None
+        return self.bytes_avoided / rate - self.lookup_seconds
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Parallel tree diff for previewing mirror runs
+
+A TreeDiff compares a source and a destination tree without copying
+anything. Each directory pair is listed on a pool of workers (one scandir
+per side, so the walk is limited by directory latency rather than by file
+count, and many directories are listed at the same time); the two listings
+are sorted by name and merge-joined. Files are compared by size and mtime
+the way the Python engine does, honouring /XC /XN /XO /XL, file filters and
+/LEV of the command.
+
+Every file ends up in one category:
+
+    new        only in the source; will be copied
+    changed    in both but different; will be copied
+    extra      only in the destination; /MIR and /PURGE delete it
+    identical  in both and unchanged; skipped
+    excluded   different, but left alone by /XC /XN /XO or /XL
+
+Counts and bytes are kept per directory, so the preview can be drilled down
+from the totals to the directories where the changes are.
+"""
+
+import os
+import fnmatch
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from robocopy_engine import (classify_file, EVENT_SAME, EVENT_CHANGED, EVENT_NEWER, EVENT_OLDER,
+                             EVENT_NEW_FILE)
+
+CATEGORY_NEW = "new"
+CATEGORY_CHANGED = "changed"
+CATEGORY_EXTRA = "extra"
+CATEGORY_IDENTICAL = "identical"
+CATEGORY_EXCLUDED = "excluded"
+CATEGORIES = (CATEGORY_NEW, CATEGORY_CHANGED, CATEGORY_EXTRA, CATEGORY_IDENTICAL, CATEGORY_EXCLUDED)
+
+# Directory pairs listed at the same time
+DIFF_WORKERS = 16
+
+# Which trees a directory exists in
+_BOTH = "both"
+_SOURCE_ONLY = "source"
+_DEST_ONLY = "dest"
+
+
+def empty_counts():
+    """Per-category [files, bytes], plus new and extra directory counts"""
+    counts = {category: [0, 0] for category in CATEGORIES}
+    counts["new_dirs"] = 0
+    counts["extra_dirs"] = 0
+    return counts
+
+
+def add_counts(total, counts):
+    for category in CATEGORIES:
+        total[category][0] += counts[category][0]
+        total[category][1] += counts[category][1]
+    total["new_dirs"] += counts["new_dirs"]
+    total["extra_dirs"] += counts["extra_dirs"]
+
+
+def _list_sorted(path):
+    """List a directory as (key, name, is_dir, stat) sorted by key; stat is None for directories"""
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                stat = None if is_dir else entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            entries.append((os.path.normcase(entry.name), entry.name, is_dir, stat))
+    entries.sort(key=lambda entry: entry[0])
+    return entries
+
+
+class TreeDiff:
+    """Compares a source and a destination tree on a pool of workers"""
+
+    def __init__(self, source, dest, options=None, workers=DIFF_WORKERS, stop_event=None):
+        """
+        Args:
+            source (str): Source directory
+            dest (str): Destination directory
+            options (dict): Options of the command (parse_command); a /MIR copy if None
+            workers (int): Directory pairs listed at the same time
+            stop_event (threading.Event): Abandons the diff when set
+        """
+        self.source = source
+        self.dest = dest
+        self.options = options or {"mirror_mode": True, "file_filters": [], "levels": 0}
+        self.workers = max(1, int(workers))
+        self.stop_event = stop_event or threading.Event()
+        self.logger = logging.getLogger(__name__)
+        self.recurse = bool(self.options.get("mirror_mode") or self.options.get("copy_subdirs")
+                            or self.options.get("copy_empty_subdirs"))
+        self.dirs = {}
+        self.errors = []
+        self.dirs_listed = 0
+        self.totals = empty_counts()
+        self._subtrees = None
+        self._children = None
+
+    def _selected(self, name):
+        filters = self.options.get("file_filters")
+        return not filters or any(fnmatch.fnmatch(name, pattern) for pattern in filters)
+
+    def _descend(self, rel_dir):
+        """Check whether the subdirectories of a directory are compared (recursion and /LEV)"""
+        levels = self.options.get("levels")
+        return self.recurse and (not levels or (rel_dir.count(os.sep) + 2 if rel_dir else 1) < levels)
+
+    def _file_category(self, src_stat, dst_stat):
+        opts = self.options
+        kind = classify_file(src_stat, dst_stat)
+        if kind == EVENT_SAME:
+            return CATEGORY_IDENTICAL
+        if ((kind == EVENT_CHANGED and opts.get("exclude_changed"))
+                or (kind == EVENT_NEWER and opts.get("exclude_newer"))
+                or (kind == EVENT_OLDER and opts.get("exclude_older"))
+                or (kind == EVENT_NEW_FILE and opts.get("exclude_lonely"))):
+            return CATEGORY_EXCLUDED
+        return CATEGORY_NEW if kind == EVENT_NEW_FILE else CATEGORY_CHANGED
+
+    def _compare_dir(self, rel_dir, side):
+        """
+        Compare one directory pair
+
+        Returns:
+            tuple: (rel_dir, counts, [(child rel_dir, side)], error or None)
+        """
+        counts = empty_counts()
+        subdirs = []
+        descend = self._descend(rel_dir)
+        src_dir = os.path.join(self.source, rel_dir) if rel_dir else self.source
+        dst_dir = os.path.join(self.dest, rel_dir) if rel_dir else self.dest
+        try:
+            src_entries = _list_sorted(src_dir) if side != _DEST_ONLY else []
+            try:
+                dst_entries = _list_sorted(dst_dir) if side != _SOURCE_ONLY else []
+            except FileNotFoundError:
+                if rel_dir:
+                    raise
+                dst_entries = []
+        except OSError as e:
+            return rel_dir, counts, subdirs, e
+
+        def child(name):
+            return os.path.join(rel_dir, name) if rel_dir else name
+
+        def add_source(name, is_dir, stat):
+            if is_dir:
+                if descend:
+                    counts["new_dirs"] += 1
+                    subdirs.append((child(name), _SOURCE_ONLY))
+            elif self._selected(name):
+                category = CATEGORY_EXCLUDED if self.options.get("exclude_lonely") else CATEGORY_NEW
+                counts[category][0] += 1
+                counts[category][1] += stat.st_size
+
+        def add_extra(name, is_dir, stat):
+            if is_dir:
+                if descend:
+                    counts["extra_dirs"] += 1
+                    subdirs.append((child(name), _DEST_ONLY))
+            elif self._selected(name):
+                counts[CATEGORY_EXTRA][0] += 1
+                counts[CATEGORY_EXTRA][1] += stat.st_size
+
+        # Merge join of the two sorted listings
+        i = j = 0
+        while i < len(src_entries) or j < len(dst_entries):
+            src = src_entries[i] if i < len(src_entries) else None
+            dst = dst_entries[j] if j < len(dst_entries) else None
+            if dst is None or (src is not None and src[0] < dst[0]):
+                add_source(*src[1:])
+                i += 1
+            elif src is None or dst[0] < src[0]:
+                add_extra(*dst[1:])
+                j += 1
+            else:
+                _, name, src_is_dir, src_stat = src
+                _, dst_name, dst_is_dir, dst_stat = dst
+                if src_is_dir and dst_is_dir:
+                    if descend:
+                        subdirs.append((child(name), _BOTH))
+                elif not src_is_dir and not dst_is_dir:
+                    if self._selected(name):
+                        category = self._file_category(src_stat, dst_stat)
+                        counts[category][0] += 1
+                        counts[category][1] += src_stat.st_size
+                else:
+                    # A file where the other side has a directory: replaced
+                    add_extra(dst_name, dst_is_dir, dst_stat)
+                    add_source(name, src_is_dir, src_stat)
+                i += 1
+                j += 1
+        return rel_dir, counts, subdirs, None
+
+    def run(self):
+        """
+        Compare the trees
+
+        Returns:
+            bool: False if stopped before the comparison finished
+        """
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="diff") as pool:
+            pending = {pool.submit(self._compare_dir, "", _BOTH)}
+            while pending:
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                if self.stop_event.is_set():
+                    for future in pending:
+                        future.cancel()
+                    return False
+                for future in done:
+                    rel_dir, counts, subdirs, error = future.result()
+                    self.dirs_listed += 1
+                    if error is not None:
+                        if not rel_dir:
+                            raise error
+                        self.errors.append((rel_dir, error))
+                        self.logger.debug(f"Cannot compare {rel_dir}: {error}")
+                    self.dirs[rel_dir] = counts
+                    add_counts(self.totals, counts)
+                    for child, side in subdirs:
+                        pending.add(pool.submit(self._compare_dir, child, side))
+        return True
+
+    def subtree_totals(self):
+        """
+        Counts of every directory including everything below it
+
+        Returns:
+            dict: rel_dir -> counts
+        """
+        if self._subtrees is None:
+            subtrees = {}
+            children = {}
+            for rel_dir in sorted(self.dirs, key=lambda rel: rel.count(os.sep) if rel else -1, reverse=True):
+                total = subtrees.setdefault(rel_dir, empty_counts())
+                add_counts(total, self.dirs[rel_dir])
+                if rel_dir:
+                    parent = os.path.dirname(rel_dir)
+                    add_counts(subtrees.setdefault(parent, empty_counts()), total)
+                    children.setdefault(parent, []).append(rel_dir)
+            self._subtrees = subtrees
+            self._children = children
+        return self._subtrees
+
+    def children(self, rel_dir=""):
+        """
+        Subdirectories of a directory with their subtree counts, those with the most changed bytes first
+
+        Returns:
+            list: (child rel_dir, counts) tuples
+        """
+        subtrees = self.subtree_totals()
+        kids = [(rel, subtrees[rel]) for rel in self._children.get(rel_dir, [])]
+
+        def changed_bytes(item):
+            counts = item[1]
+            return sum(counts[category][1] for category in (CATEGORY_NEW, CATEGORY_CHANGED, CATEGORY_EXTRA))
+        kids.sort(key=lambda item: (-changed_bytes(item), item[0]))
+        return kids
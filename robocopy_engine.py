@@ -0,0 +1,1251 @@
+#!/usr/bin/env python3
+"""
+Copy engines for ROBOCOPY GUI
+
+The GUI always builds a ROBOCOPY command line. An engine turns that command
+into a running, Popen-compatible process object whose stdout produces
+ROBOCOPY-formatted lines, so the existing output parser, formatter and
+statistics code work unchanged whichever engine is used.
+"""
+
+import os
+import re
+import sys
+import time
+import errno
+import fnmatch
+import queue
+import shutil
+import logging
+import platform
+import threading
+import subprocess
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from robocopy_utils import get_job_folder
+from robocopy_manifest import SyncManifest, MANIFEST_FILE, manifest_signature
+from robocopy_throttle import TokenBucket
+from robocopy_priority import set_thread_priority
+from robocopy_dedup import DedupIndex, DedupStats, DEDUP_MIN_SIZE, link_file, format_saved
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Event kinds emitted by the Python engine. Each kind maps onto the line
+# format ROBOCOPY prints for the same situation (see format_event).
+EVENT_NEW_DIR = "new_dir"
+EVENT_DIR = "dir"
+EVENT_NEW_FILE = "new_file"
+EVENT_NEWER = "newer"
+EVENT_OLDER = "older"
+EVENT_CHANGED = "changed"
+EVENT_SAME = "same"
+EVENT_EXTRA_FILE = "extra_file"
+EVENT_EXTRA_DIR = "extra_dir"
+EVENT_ERROR = "error"
+EVENT_RETRY = "retry"
+EVENT_INFO = "info"
+
+CopyEvent = namedtuple("CopyEvent", ["kind", "path", "size", "message"])
+CopyEvent.__new__.__defaults__ = (None, 0, "")
+
+# ROBOCOPY exit code bits
+EXIT_COPIED = 1
+EXIT_EXTRAS = 2
+EXIT_MISMATCH = 4
+EXIT_FAILED = 8
+EXIT_FATAL = 16
+
+# Return code reported when a Python copy job is stopped, mirroring what
+# Popen reports for a child terminated by SIGTERM.
+TERMINATED_RETURN_CODE = -15
+
+# (CPU, I/O) priority of threads nobody re-prioritized
+NORMAL_PRIORITY = ("normal", "normal")
+
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+PAUSE_CHUNK_SIZE = 1024 * 1024
+
+_ZERO_COPY_FALLBACK_ERRNOS = {
+    errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP,
+    errno.ENOTSUP, errno.EBADF, errno.EPERM,
+}
+
+# Windows error codes and messages for common errno values so that error
+# lines look the same as those printed by robocopy.exe.
+_WINDOWS_ERRORS = {
+    errno.ENOENT: (2, "The system cannot find the file specified."),
+    errno.EACCES: (5, "Access is denied."),
+    errno.EPERM: (5, "Access is denied."),
+    errno.EBUSY: (32, "The process cannot access the file because it is being used by another process."),
+    errno.ENOSPC: (112, "There is not enough space on the disk."),
+    errno.ENOTDIR: (267, "The directory name is invalid."),
+}
+
+
+def windows_error(exc):
+    """
+    Map an OSError onto a ROBOCOPY style (code, message) pair
+
+    Args:
+        exc (OSError): Error raised by a filesystem call
+
+    Returns:
+        tuple: (error_code, message)
+    """
+    winerror = getattr(exc, "winerror", None)
+    if winerror:
+        return winerror, exc.strerror or str(exc)
+    if exc.errno in _WINDOWS_ERRORS:
+        return _WINDOWS_ERRORS[exc.errno]
+    return exc.errno or 0, exc.strerror or str(exc)
+
+
+def parse_command(command):
+    """
+    Parse a ROBOCOPY command line into an options dictionary
+
+    Keys follow the names used by the GUI configuration where one exists.
+
+    Args:
+        command (str): Command such as 'robocopy "C:\\src" "D:\\dst" /MIR /R:3'
+
+    Returns:
+        dict: Parsed options
+    """
+    tokens = re.findall(r'"[^"]*"|\S+', command)
+    if tokens and os.path.basename(tokens[0].strip('"')).lower() in ("robocopy", "robocopy.exe"):
+        tokens = tokens[1:]
+
+    options = {
+        "source_path": "",
+        "dest_path": "",
+        "copy_subdirs": False,
+        "copy_empty_subdirs": False,
+        "mirror_mode": False,
+        "purge_dest": False,
+        "move_files": False,
+        "exclude_changed": False,
+        "exclude_newer": False,
+        "exclude_older": False,
+        "exclude_lonely": False,
+        "list_only": False,
+        "verbose": False,
+        "retries": 1000000,
+        "wait_time": 30,
+        "threads": 1,
+        "levels": 0,
+        "log_file": None,
+        "log_append": False,
+        "file_filters": [],
+        "switches": [],
+    }
+
+    positional = []
+    for token in tokens:
+        # Quoted tokens are always paths, so POSIX paths are not taken for switches
+        if token.startswith('"'):
+            positional.append(token.strip('"'))
+            continue
+        if not token.startswith("/"):
+            positional.append(token)
+            continue
+
+        name, _, value = token[1:].partition(":")
+        name = name.upper()
+        options["switches"].append(token)
+
+        if name == "S":
+            options["copy_subdirs"] = True
+        elif name == "E":
+            options["copy_empty_subdirs"] = True
+        elif name == "MIR":
+            options["mirror_mode"] = True
+        elif name == "PURGE":
+            options["purge_dest"] = True
+        elif name == "MOV":
+            options["move_files"] = True
+        elif name == "XC":
+            options["exclude_changed"] = True
+        elif name == "XN":
+            options["exclude_newer"] = True
+        elif name == "XO":
+            options["exclude_older"] = True
+        elif name == "XL":
+            options["exclude_lonely"] = True
+        elif name == "L":
+            options["list_only"] = True
+        elif name == "V":
+            options["verbose"] = True
+        elif name == "R" and value.isdigit():
+            options["retries"] = int(value)
+        elif name == "W" and value.isdigit():
+            options["wait_time"] = int(value)
+        elif name == "MT":
+            # /MT without a value means 8 threads, as in robocopy.exe
+            options["threads"] = int(value) if value.isdigit() else 8
+        elif name == "LEV" and value.isdigit():
+            # Only the top n levels of the tree (0 = all)
+            options["levels"] = int(value)
+        elif name in ("LOG", "LOG+"):
+            options["log_file"] = value
+            options["log_append"] = name == "LOG+"
+
+    if len(positional) >= 1:
+        options["source_path"] = positional[0]
+    if len(positional) >= 2:
+        options["dest_path"] = positional[1]
+    # Further arguments are file names or wildcards, as in robocopy.exe
+    options["file_filters"] = positional[2:]
+
+    if options["mirror_mode"]:
+        options["copy_empty_subdirs"] = True
+        options["purge_dest"] = True
+
+    return options
+
+
+def format_event(event):
+    """
+    Format a copy event as the line robocopy.exe prints for it
+
+    Args:
+        event (CopyEvent): Event to format
+
+    Returns:
+        str: Output line
+    """
+    kind = event.kind
+    name = os.path.basename(event.path) if event.path else ""
+    if kind == EVENT_NEW_DIR:
+        return f"\t  New Dir  \t\t{event.size:>8}\t{event.path}"
+    if kind == EVENT_DIR:
+        return f"\t         \t\t{event.size:>8}\t{event.path}"
+    if kind == EVENT_NEW_FILE:
+        return f"\t    New File  \t\t{event.size:>10}\t{name}"
+    if kind == EVENT_NEWER:
+        return f"\t    Newer     \t\t{event.size:>10}\t{name}"
+    if kind == EVENT_OLDER:
+        return f"\t    Older     \t\t{event.size:>10}\t{name}"
+    if kind == EVENT_CHANGED:
+        return f"\t    Changed   \t\t{event.size:>10}\t{name}"
+    if kind == EVENT_SAME:
+        return f"\t    same      \t\t{event.size:>10}\t{name}"
+    if kind == EVENT_EXTRA_FILE:
+        return f"\t    *EXTRA File \t\t{event.size:>10}\t{event.path}"
+    if kind == EVENT_EXTRA_DIR:
+        return f"\t  *EXTRA Dir  \t\t{event.size:>8}\t{event.path}"
+    if kind == EVENT_ERROR:
+        return f"{time.strftime('%Y/%m/%d %H:%M:%S')} {event.message}"
+    return event.message
+
+
+class CopyStopped(Exception):
+    """Raised inside a file copy when the job is stopped mid-file"""
+
+
+def copy_file_data(src_fd, dst_fd, size, chunk_size=COPY_CHUNK_SIZE, throttle=None, stop_event=None,
+                   run_gate=None):
+    """
+    Copy file contents between descriptors, preferring kernel zero-copy
+
+    Tries os.copy_file_range, then os.sendfile, then a plain read/write loop.
+    A zero-copy method is abandoned for the next one only if it fails before
+    any data was transferred.
+
+    Args:
+        src_fd (int): Source descriptor positioned at offset 0
+        dst_fd (int): Destination descriptor positioned at offset 0
+        size (int): Number of bytes to copy
+        chunk_size (int): Maximum bytes per system call
+        throttle (TokenBucket): Bandwidth limit applied before every chunk
+        stop_event (threading.Event): Aborts a throttled wait when set
+        run_gate (threading.Event): Cleared while the job is paused
+
+    Returns:
+        int: Number of bytes copied
+
+    Raises:
+        CopyStopped: stop_event was set while waiting for the throttle or a pause
+    """
+    copied = 0
+    if throttle is not None:
+        chunk_size = min(chunk_size, throttle.chunk_size)
+    elif run_gate is not None:
+        # Keep chunks small enough for a pause to take effect promptly
+        chunk_size = min(chunk_size, PAUSE_CHUNK_SIZE)
+
+    def wait_for(count):
+        if run_gate is not None and not run_gate.is_set():
+            run_gate.wait()
+            if stop_event is not None and stop_event.is_set():
+                raise CopyStopped()
+        if throttle is not None and not throttle.consume(count, stop_event):
+            raise CopyStopped()
+        return count
+
+    if hasattr(os, "copy_file_range"):
+        try:
+            while copied < size:
+                count = os.copy_file_range(src_fd, dst_fd, wait_for(min(chunk_size, size - copied)))
+                if count == 0:
+                    break
+                copied += count
+            return copied
+        except OSError as e:
+            if copied or e.errno not in _ZERO_COPY_FALLBACK_ERRNOS:
+                raise
+
+    if hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+        try:
+            while copied < size:
+                count = os.sendfile(dst_fd, src_fd, copied, wait_for(min(chunk_size, size - copied)))
+                if count == 0:
+                    break
+                copied += count
+            return copied
+        except OSError as e:
+            if copied or e.errno not in _ZERO_COPY_FALLBACK_ERRNOS:
+                raise
+
+    while True:
+        data = os.read(src_fd, wait_for(min(chunk_size, 1024 * 1024)))
+        if not data:
+            break
+        view = memoryview(data)
+        while view:
+            written = os.write(dst_fd, view)
+            view = view[written:]
+        copied += len(data)
+    return copied
+
+
+def copy_file(src, dst, chunk_size=COPY_CHUNK_SIZE, throttle=None, stop_event=None, run_gate=None):
+    """
+    Copy a single file and its timestamps
+
+    Args:
+        src (str): Source file path
+        dst (str): Destination file path
+        chunk_size (int): Maximum bytes per system call
+        throttle (TokenBucket): Bandwidth limit shared by all copy threads
+        stop_event (threading.Event): Aborts a throttled wait when set
+        run_gate (threading.Event): Cleared while the job is paused
+
+    Returns:
+        int: Number of bytes copied
+    """
+    src_fd = os.open(src, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        st = os.fstat(src_fd)
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o666)
+        try:
+            copied = copy_file_data(src_fd, dst_fd, st.st_size, chunk_size, throttle, stop_event, run_gate)
+        except BaseException:
+            os.close(dst_fd)
+            try:
+                os.remove(dst)
+            except OSError:
+                pass
+            raise
+        os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+
+    os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+    return copied
+
+
+def _dir_mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def classify_file(src_stat, dst_stat):
+    """
+    Classify a source file against its destination counterpart
+
+    Args:
+        src_stat (os.stat_result): Source file stat
+        dst_stat (os.stat_result or None): Destination file stat, if present
+
+    Returns:
+        str: One of EVENT_NEW_FILE, EVENT_NEWER, EVENT_OLDER, EVENT_CHANGED, EVENT_SAME
+    """
+    if dst_stat is None:
+        return EVENT_NEW_FILE
+    if src_stat.st_mtime_ns > dst_stat.st_mtime_ns:
+        return EVENT_NEWER
+    if src_stat.st_mtime_ns < dst_stat.st_mtime_ns:
+        return EVENT_OLDER
+    if src_stat.st_size != dst_stat.st_size:
+        return EVENT_CHANGED
+    return EVENT_SAME
+
+
+class _OutputPipe:
+    """Line pipe with the readline/close interface of Popen.stdout"""
+
+    _EOF = object()
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self.closed = False
+
+    def write_line(self, line):
+        self._queue.put(line + "\n")
+
+    def finish(self):
+        self._queue.put(self._EOF)
+
+    def readline(self):
+        if self.closed:
+            return ""
+        item = self._queue.get()
+        if item is self._EOF:
+            self._queue.put(self._EOF)
+            return ""
+        return item
+
+    def __iter__(self):
+        return iter(self.readline, "")
+
+    def close(self):
+        self.closed = True
+
+
+class PythonCopyJob:
+    """Pure-Python implementation of the core ROBOCOPY copy semantics"""
+
+    def __init__(self, options, on_event=None, manifest_path=None, checkpoint=None, resume=False,
+                 throttle=None, executor=None, dedup_index=None):
+        """
+        Args:
+            options (dict): Options as returned by parse_command
+            on_event (callable): Called with (CopyEvent, line) for every event
+            manifest_path (str): SQLite manifest enabling incremental mode
+            checkpoint (JobCheckpoint): Checkpoint updated as directories complete
+            resume (bool): Skip directories completed by an earlier run
+            throttle (TokenBucket): Bandwidth cap shared by all copy threads
+            executor (Executor): Copy worker pool shared with other jobs; by
+                default the job starts its own pool of /MT threads. Shared
+                workers take the job's priority for each of its copies and
+                go back to normal priority after it.
+            dedup_index (DedupIndex): Hard link files whose content is already
+                at the destination instead of copying them; the job closes it
+        """
+        self.options = options
+        self.throttle = throttle
+        self.executor = executor
+        self.dedup = dedup_index
+        self.dedup_stats = DedupStats()
+        self.on_event = on_event
+        self.manifest_path = manifest_path
+        self.manifest = None
+        self.checkpoint = checkpoint
+        self.resume = resume
+        self._completed_dirs = set()
+        self._dir_progress = {}
+        self._in_flight = set()
+        self.logger = logging.getLogger(__name__)
+        self.stop_event = threading.Event()
+        self.run_gate = threading.Event()
+        self.run_gate.set()
+        self.priority = NORMAL_PRIORITY
+        self._native_ids = set()
+        self._active_ids = set()
+        self._restore_failed = False
+        self._lock = threading.Lock()
+        self._log_handle = None
+        self._failed_dirs = set()
+        self._synced_dirs = []
+        self.stats = {
+            "dirs_total": 0, "dirs_copied": 0, "dirs_skipped": 0, "dirs_failed": 0, "dirs_extra": 0,
+            "files_total": 0, "files_copied": 0, "files_skipped": 0, "files_failed": 0, "files_extra": 0,
+            "bytes_total": 0, "bytes_copied": 0, "bytes_skipped": 0, "bytes_failed": 0, "bytes_extra": 0,
+        }
+        self._completed_stats = dict(self.stats)
+
+    def stop(self):
+        """Request the job to stop as soon as possible"""
+        self.stop_event.set()
+        self.run_gate.set()
+
+    def pause(self):
+        """Hold the walk and all copies (including partly copied files) until unpause"""
+        if not self.stop_event.is_set():
+            self.run_gate.clear()
+
+    def unpause(self):
+        self.run_gate.set()
+
+    @property
+    def paused(self):
+        return not self.run_gate.is_set()
+
+    def set_priority(self, cpu_priority, io_priority):
+        """
+        Set the CPU and I/O priority of the job's threads, including workers started later
+
+        Returns:
+            bool: True if the priority was applied to every running thread
+        """
+        with self._lock:
+            self.priority = (cpu_priority, io_priority)
+            # Threads of a shared pool that are no longer working for this job keep theirs
+            results = [set_thread_priority(tid, cpu_priority, io_priority) for tid in self._active_ids]
+        return all(results)
+
+    def native_ids(self):
+        """Native ids of the threads that ran this job"""
+        with self._lock:
+            return list(self._native_ids)
+
+    def _register_thread(self):
+        tid = threading.get_native_id()
+        with self._lock:
+            self._native_ids.add(tid)
+            self._active_ids.add(tid)
+            if self.priority != NORMAL_PRIORITY:
+                set_thread_priority(tid, *self.priority)
+
+    def _release_thread(self):
+        """Give a pooled thread back with normal priority once it stops working for this job"""
+        tid = threading.get_native_id()
+        with self._lock:
+            self._active_ids.discard(tid)
+            if self.priority == NORMAL_PRIORITY or self._restore_failed:
+                return
+            # Raising the priority again may need administrator rights; the
+            # failure is logged once and later copies do not retry it
+            self._restore_failed = not set_thread_priority(tid)
+
+    def _pooled(self, task, *args):
+        """Run a copy on a shared worker thread as one of this job's threads"""
+        self._register_thread()
+        try:
+            return task(*args)
+        finally:
+            self._release_thread()
+
+    def emit(self, event):
+        line = format_event(event)
+        if self._log_handle:
+            with self._lock:
+                self._log_handle.write(line + "\n")
+        if self.on_event:
+            self.on_event(event, line)
+
+    def _add(self, rel_dir=None, **increments):
+        with self._lock:
+            progress = self._dir_progress.get(rel_dir) if rel_dir is not None else None
+            for key, value in increments.items():
+                self.stats[key] += value
+                if progress is not None:
+                    progress["stats"][key] = progress["stats"].get(key, 0) + value
+
+    def _begin_dir(self, rel_dir):
+        if self.checkpoint:
+            with self._lock:
+                self._dir_progress[rel_dir] = {"pending": 0, "walked": False, "stats": {}}
+
+    def _finish_dir_walk(self, rel_dir):
+        with self._lock:
+            progress = self._dir_progress.get(rel_dir)
+            if progress is not None:
+                progress["walked"] = True
+                self._check_dir_complete(rel_dir, progress)
+
+    def _check_dir_complete(self, rel_dir, progress):
+        """Checkpoint a directory once it is walked and its copies are done (lock held)"""
+        if not progress["walked"] or progress["pending"]:
+            return
+        del self._dir_progress[rel_dir]
+        if rel_dir in self._failed_dirs or self.stop_event.is_set():
+            return
+        for key, value in progress["stats"].items():
+            self._completed_stats[key] += value
+        self.checkpoint.mark_dir_completed(rel_dir)
+        self.checkpoint.update(engine_stats=dict(self._completed_stats))
+        self.checkpoint.flush()
+
+    def _set_in_flight(self, path, active):
+        if self.checkpoint:
+            with self._lock:
+                if active:
+                    self._in_flight.add(path)
+                else:
+                    self._in_flight.discard(path)
+                self.checkpoint.update(in_flight=sorted(self._in_flight))
+
+    def run(self):
+        """
+        Run the copy job to completion
+
+        Returns:
+            int: ROBOCOPY compatible exit code
+        """
+        opts = self.options
+        source = opts["source_path"]
+        dest = opts["dest_path"]
+
+        if opts.get("log_file"):
+            try:
+                self._log_handle = open(opts["log_file"], "a" if opts["log_append"] else "w", encoding="utf-8")
+            except OSError as e:
+                self.logger.warning(f"Could not open log file {opts['log_file']}: {e}")
+
+        try:
+            self._emit_header(source, dest)
+
+            if not source or not os.path.isdir(source):
+                self.emit(CopyEvent(EVENT_ERROR, source, 0,
+                                    f"ERROR 2 (0x00000002) Accessing Source Directory {source}"))
+                self.emit(CopyEvent(EVENT_INFO, message="The system cannot find the path specified."))
+                return EXIT_FATAL
+
+            if self.manifest_path and not opts["list_only"]:
+                self.manifest = SyncManifest(self.manifest_path, manifest_signature(opts))
+
+            if opts["list_only"]:
+                self.checkpoint = None
+            elif self.checkpoint and self.resume:
+                # Continue from the directories and statistics of earlier runs
+                self._completed_dirs = self.checkpoint.completed_dirs()
+                restored = self.checkpoint.get("engine_stats") or {}
+                for key in self.stats:
+                    self.stats[key] = restored.get(key, 0)
+                self._completed_stats = dict(self.stats)
+                self.emit(CopyEvent(EVENT_INFO, message=f"  Resuming : {len(self._completed_dirs)} "
+                                                        f"directories already completed"))
+                self.emit(CopyEvent(EVENT_INFO, message=""))
+
+            start_time = time.time()
+            threads = max(1, int(opts.get("threads") or 1))
+            # Bound the number of queued copies so huge trees do not build
+            # millions of pending futures.
+            slots = threading.BoundedSemaphore(threads * 4)
+            self._register_thread()
+            if self.executor is not None:
+                try:
+                    self._walk(source, dest, self.executor, slots)
+                    # Every queued copy holds a slot; taking them all waits for the last copy
+                    for _ in range(threads * 4):
+                        slots.acquire()
+                finally:
+                    # The walker thread is pooled as well
+                    self._release_thread()
+            else:
+                with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="pycopy",
+                                        initializer=self._register_thread) as pool:
+                    self._walk(source, dest, pool, slots)
+            elapsed = time.time() - start_time
+
+            if self.checkpoint:
+                self.checkpoint.flush(force=True)
+
+            if self.stop_event.is_set():
+                return TERMINATED_RETURN_CODE
+
+            if self.manifest:
+                self._update_manifest()
+
+            self._emit_summary(elapsed)
+            return self.exit_code()
+        finally:
+            if self.manifest:
+                self.manifest.close()
+                self.manifest = None
+            if self.dedup:
+                self.dedup.close()
+                self.dedup = None
+            if self._log_handle:
+                self._log_handle.close()
+                self._log_handle = None
+
+    def _update_manifest(self):
+        """Record fingerprints of directories whose files all synced cleanly"""
+        for rel_dir, dst_dir, src_mtime_ns, subdirs, file_count, total_bytes in self._synced_dirs:
+            if rel_dir in self._failed_dirs:
+                continue
+            dst_mtime_ns = _dir_mtime_ns(dst_dir)
+            if dst_mtime_ns is not None:
+                self.manifest.record_dir(rel_dir, src_mtime_ns, dst_mtime_ns, subdirs, file_count, total_bytes)
+        self.manifest.commit()
+
+    def exit_code(self):
+        code = 0
+        if self.stats["files_copied"]:
+            code |= EXIT_COPIED
+        if self.stats["files_extra"] or self.stats["dirs_extra"]:
+            code |= EXIT_EXTRAS
+        if self.stats["files_failed"] or self.stats["dirs_failed"]:
+            code |= EXIT_FAILED
+        return code
+
+    def _emit_header(self, source, dest):
+        rule = "-" * 79
+        for line in (rule, "   ROBOCOPY     ::     Python Copy Engine", rule, "",
+                     f"  Started : {time.strftime('%A, %B %d, %Y %H:%M:%S')}",
+                     f"   Source : {source}",
+                     f"     Dest : {dest}", "",
+                     f"  Options : {' '.join(self.options.get('switches', []))}", "", rule, ""):
+            self.emit(CopyEvent(EVENT_INFO, message=line))
+
+    def _emit_summary(self, elapsed):
+        s = self.stats
+        elapsed_str = f"{int(elapsed // 3600)}:{int(elapsed % 3600 // 60):02d}:{int(elapsed % 60):02d}"
+        bytes_per_sec = int(s["bytes_copied"] / elapsed) if elapsed > 0 else s["bytes_copied"]
+        lines = [
+            "", "-" * 79, "",
+            f"{'':15}{'Total':>10}{'Copied':>10}{'Skipped':>10}{'Mismatch':>10}{'FAILED':>10}{'Extras':>10}",
+        ]
+        for label, prefix in (("Dirs", "dirs"), ("Files", "files"), ("Bytes", "bytes")):
+            lines.append(f"{label:>10} : {s[prefix + '_total']:>9}{s[prefix + '_copied']:>10}"
+                         f"{s[prefix + '_skipped']:>10}{0:>10}{s[prefix + '_failed']:>10}"
+                         f"{s[prefix + '_extra']:>10}")
+        lines.append(f"{'Times':>10} : {elapsed_str:>9}")
+        lines.append(f"{'Speed':>10} : {bytes_per_sec:>20} Bytes/sec.")
+        lines.append(f"{'Speed':>10} : {bytes_per_sec * 60 / (1024 * 1024):>20.3f} MegaBytes/min.")
+        lines.append(f"{'Ended':>10} : {time.strftime('%A, %B %d, %Y %H:%M:%S')}")
+        if self.dedup:
+            lines.append(self._dedup_summary())
+        for line in lines:
+            self.emit(CopyEvent(EVENT_INFO, message=line))
+
+    def _dedup_summary(self):
+        dedup = self.dedup_stats
+        rate = dedup.measured_rate()
+        if rate:
+            self.dedup.record_copy_rate(rate)
+        else:
+            # Too little was copied to measure; use the rate of earlier runs
+            rate = self.dedup.copy_rate()
+        saved = dedup.time_saved(rate)
+        return (f"{'Dedup':>10} : {dedup.files_linked} files linked, {dedup.bytes_avoided} bytes avoided, "
+                f"{format_saved(saved) if saved is not None else 'unknown'} saved")
+
+    def _recurse(self):
+        opts = self.options
+        return opts["copy_subdirs"] or opts["copy_empty_subdirs"] or opts["mirror_mode"]
+
+    def _descend(self, rel_dir):
+        """Check whether the subdirectories of a directory are within /LEV"""
+        levels = self.options.get("levels")
+        return not levels or (rel_dir.count(os.sep) + 2 if rel_dir else 1) < levels
+
+    def _walk(self, source, dest, pool, slots):
+        opts = self.options
+        recurse = self._recurse()
+        stack = [("", True)]
+
+        while stack and not self.stop_event.is_set():
+            self.run_gate.wait()
+            rel_dir, is_root = stack.pop()
+            src_dir = os.path.join(source, rel_dir) if rel_dir else source
+            dst_dir = os.path.join(dest, rel_dir) if rel_dir else dest
+
+            if self.manifest:
+                src_mtime_ns = _dir_mtime_ns(src_dir)
+                record = self.manifest.is_unchanged(rel_dir, src_mtime_ns, _dir_mtime_ns(dst_dir))
+                if record:
+                    # Fingerprint unchanged: skip listing and comparing this directory
+                    self._add(dirs_total=1, dirs_skipped=1,
+                              files_total=record.file_count, files_skipped=record.file_count,
+                              bytes_total=record.total_bytes, bytes_skipped=record.total_bytes)
+                    if recurse and self._descend(rel_dir):
+                        for name in reversed(record.subdirs):
+                            stack.append((os.path.join(rel_dir, name) if rel_dir else name, False))
+                    continue
+                self.manifest.forget_dir(rel_dir)
+
+            if rel_dir in self._completed_dirs:
+                # Finished by an earlier run; its statistics were restored from the checkpoint
+                if recurse and self._descend(rel_dir):
+                    try:
+                        subdirs = self._scan_subdirs(src_dir)
+                    except OSError:
+                        subdirs = []
+                    for name in reversed(subdirs):
+                        stack.append((os.path.join(rel_dir, name) if rel_dir else name, False))
+                continue
+
+            try:
+                src_entries = self._scan(src_dir)
+            except OSError as e:
+                code, message = windows_error(e)
+                self.emit(CopyEvent(EVENT_ERROR, src_dir, 0,
+                                    f"ERROR {code} (0x{code:08X}) Scanning Source Directory {src_dir}"))
+                self.emit(CopyEvent(EVENT_INFO, message=message))
+                self._add(dirs_failed=1)
+                continue
+
+            try:
+                dst_entries = self._scan(dst_dir)
+                dst_exists = True
+            except FileNotFoundError:
+                dst_entries = {}
+                dst_exists = False
+            except OSError as e:
+                code, message = windows_error(e)
+                self.emit(CopyEvent(EVENT_ERROR, dst_dir, 0,
+                                    f"ERROR {code} (0x{code:08X}) Scanning Destination Directory {dst_dir}"))
+                self.emit(CopyEvent(EVENT_INFO, message=message))
+                self._add(dirs_failed=1)
+                continue
+
+            files = [(name, st) for name, (is_dir, st) in src_entries.items()
+                     if not is_dir and self._selected(name)]
+            subdirs = sorted(name for name, (is_dir, _) in src_entries.items() if is_dir)
+
+            self._begin_dir(rel_dir)
+            self._add(rel_dir, dirs_total=1)
+            if dst_exists:
+                self._add(rel_dir, dirs_skipped=1)
+                self.emit(CopyEvent(EVENT_DIR, src_dir + os.sep, len(files)))
+            elif is_root or opts["copy_empty_subdirs"] or files:
+                self._add(rel_dir, dirs_copied=1)
+                self.emit(CopyEvent(EVENT_NEW_DIR, src_dir + os.sep, len(files)))
+                if not opts["list_only"]:
+                    try:
+                        os.makedirs(dst_dir, exist_ok=True)
+                    except OSError as e:
+                        self._report_failure("Creating Destination Directory", dst_dir, e)
+                        self._add(dirs_failed=1)
+                        continue
+
+            self._handle_extras(rel_dir, dst_dir, src_entries, dst_entries, recurse)
+
+            for name, src_stat in sorted(files):
+                if self.stop_event.is_set():
+                    break
+                dst_entry = dst_entries.get(name)
+                dst_stat = dst_entry[1] if dst_entry and not dst_entry[0] else None
+                self._dispatch_file(rel_dir, os.path.join(src_dir, name), os.path.join(dst_dir, name),
+                                    src_stat, dst_stat, pool, slots)
+
+            if self.manifest and src_mtime_ns is not None:
+                self._synced_dirs.append((rel_dir, dst_dir, src_mtime_ns, subdirs, len(files),
+                                          sum(st.st_size for _, st in files)))
+
+            self._finish_dir_walk(rel_dir)
+
+            if recurse and self._descend(rel_dir):
+                for name in reversed(subdirs):
+                    stack.append((os.path.join(rel_dir, name) if rel_dir else name, False))
+
+    def _selected(self, name):
+        """Check a file name against the file names/wildcards given on the command line"""
+        filters = self.options.get("file_filters")
+        return not filters or any(fnmatch.fnmatch(name, pattern) for pattern in filters)
+
+    def _scan(self, path):
+        entries = {}
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    entries[entry.name] = (is_dir, None if is_dir else entry.stat(follow_symlinks=False))
+                except OSError:
+                    continue
+        return entries
+
+    def _scan_subdirs(self, path):
+        with os.scandir(path) as it:
+            return sorted(entry.name for entry in it if entry.is_dir(follow_symlinks=False))
+
+    def _handle_extras(self, rel_dir, dst_dir, src_entries, dst_entries, recurse):
+        purge = self.options["purge_dest"] and not self.options["list_only"]
+        for name, (is_dir, dst_stat) in sorted(dst_entries.items()):
+            src_entry = src_entries.get(name)
+            if src_entry is not None and src_entry[0] == is_dir:
+                continue
+            if is_dir and not recurse:
+                continue
+            if not is_dir and not self._selected(name):
+                continue
+            path = os.path.join(dst_dir, name)
+            if is_dir:
+                self._add(rel_dir, dirs_extra=1)
+                self.emit(CopyEvent(EVENT_EXTRA_DIR, path + os.sep, 0))
+            else:
+                self._add(rel_dir, files_extra=1, bytes_extra=dst_stat.st_size)
+                self.emit(CopyEvent(EVENT_EXTRA_FILE, path, dst_stat.st_size))
+            if purge:
+                try:
+                    if is_dir:
+                        shutil.rmtree(path)
+                    else:
+                        os.remove(path)
+                except OSError as e:
+                    self._report_failure("Deleting Extra " + ("Directory" if is_dir else "File"), path, e)
+                    self._failed_dirs.add(rel_dir)
+
+    def _dispatch_file(self, rel_dir, src, dst, src_stat, dst_stat, pool, slots):
+        opts = self.options
+        kind = classify_file(src_stat, dst_stat)
+        size = src_stat.st_size
+        self._add(rel_dir, files_total=1, bytes_total=size)
+
+        skip = (kind == EVENT_SAME
+                or (kind == EVENT_CHANGED and opts["exclude_changed"])
+                or (kind == EVENT_NEWER and opts["exclude_newer"])
+                or (kind == EVENT_OLDER and opts["exclude_older"])
+                or (kind == EVENT_NEW_FILE and opts["exclude_lonely"]))
+        if skip:
+            self._add(rel_dir, files_skipped=1, bytes_skipped=size)
+            if self.dedup and dst_stat is not None and kind == EVENT_SAME:
+                # Unchanged destination files are link targets for later copies
+                self.dedup.add(dst, dst_stat)
+            if opts["list_only"] and opts["verbose"]:
+                # Listings report skipped files too (copy runs leave them out to keep output small)
+                self.emit(CopyEvent(kind, src, size))
+            return
+
+        self.emit(CopyEvent(kind, src, size))
+        if opts["list_only"]:
+            self._add(rel_dir, files_copied=1, bytes_copied=size)
+            return
+
+        with self._lock:
+            if rel_dir in self._dir_progress:
+                self._dir_progress[rel_dir]["pending"] += 1
+        slots.acquire()
+        if pool is self.executor:
+            future = pool.submit(self._pooled, self._copy_with_retries, rel_dir, src, dst, size)
+        else:
+            future = pool.submit(self._copy_with_retries, rel_dir, src, dst, size)
+        future.add_done_callback(lambda _f: slots.release())
+
+    def _copy_with_retries(self, rel_dir, src, dst, size):
+        self._set_in_flight(src, True)
+        try:
+            return self._copy_attempts(rel_dir, src, dst, size)
+        finally:
+            self._set_in_flight(src, False)
+            with self._lock:
+                progress = self._dir_progress.get(rel_dir)
+                if progress is not None:
+                    progress["pending"] -= 1
+                    self._check_dir_complete(rel_dir, progress)
+
+    def _copy_attempts(self, rel_dir, src, dst, size):
+        opts = self.options
+        attempts = 0
+        while not self.stop_event.is_set():
+            try:
+                if not os.path.isdir(os.path.dirname(dst)):
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                self.run_gate.wait()
+                if self.dedup and size >= DEDUP_MIN_SIZE and not opts["move_files"] \
+                        and self._link_duplicate(src, dst):
+                    self._add(rel_dir, files_copied=1, bytes_copied=size)
+                    return True
+                # A destination with other hard links (e.g. linked by dedup) is
+                # replaced, not written through. Checked here for every caller;
+                # Windows directory listings do not report the link count.
+                try:
+                    if os.stat(dst).st_nlink != 1:
+                        os.remove(dst)
+                except FileNotFoundError:
+                    pass
+                started = time.perf_counter()
+                copied = copy_file(src, dst, throttle=self.throttle, stop_event=self.stop_event,
+                                   run_gate=self.run_gate)
+                if self.dedup:
+                    self.dedup_stats.add_copy(time.perf_counter() - started, copied)
+                    self.dedup.add(dst, os.stat(dst))
+                self._add(rel_dir, files_copied=1, bytes_copied=copied)
+                if opts["move_files"]:
+                    try:
+                        os.remove(src)
+                    except OSError as e:
+                        self._report_failure("Deleting Source File", src, e)
+                return True
+            except CopyStopped:
+                break
+            except OSError as e:
+                self._report_failure("Copying File", src, e)
+                if attempts >= opts["retries"]:
+                    self.emit(CopyEvent(EVENT_INFO, message="ERROR: RETRY LIMIT EXCEEDED."))
+                    break
+                attempts += 1
+                self.emit(CopyEvent(EVENT_RETRY, src, 0,
+                                    f"Waiting {opts['wait_time']} seconds... Retrying..."))
+                self.stop_event.wait(opts["wait_time"])
+        self._add(rel_dir, files_failed=1, bytes_failed=size)
+        with self._lock:
+            self._failed_dirs.add(rel_dir)
+        return False
+
+    def _link_duplicate(self, src, dst):
+        """
+        Hard link dst to an indexed file with the same content as src
+
+        Returns:
+            bool: True if linked; False means the file has to be copied
+        """
+        started = time.perf_counter()
+        linked = None
+        try:
+            src_stat = os.stat(src)
+            device = os.stat(os.path.dirname(dst)).st_dev
+            match = self.dedup.find_duplicate(src, src_stat, device, exclude=dst, stop_event=self.stop_event)
+            if match is not None:
+                target, head, content = match
+                link_file(target, dst)
+                self.dedup.add(dst, os.stat(dst), head, content)
+                linked = src_stat.st_size
+        except OSError as e:
+            # No hard links on this file system, too many links, ...: copy instead
+            self.logger.debug(f"Dedup skipped for {src}: {e}")
+        self.dedup_stats.add_lookup(time.perf_counter() - started, linked)
+        return linked is not None
+
+    def _report_failure(self, action, path, exc):
+        code, message = windows_error(exc)
+        self.emit(CopyEvent(EVENT_ERROR, path, 0, f"ERROR {code} (0x{code:08X}) {action} {path}"))
+        self.emit(CopyEvent(EVENT_INFO, path, 0, message))
+
+
+class EngineProcess:
+    """Popen-compatible handle for a copy job running in a background thread"""
+
+    def __init__(self, job, on_line=None, threaded=True):
+        """
+        Args:
+            job (PythonCopyJob): Job to run
+            on_line (callable): Receives each output line instead of stdout
+            threaded (bool): Run the job in its own thread; otherwise the
+                caller runs it by calling run() (e.g. in an executor)
+        """
+        self.job = job
+        self.pid = os.getpid()
+        self.returncode = None
+        self.stdout = _OutputPipe()
+        self.on_line = on_line
+        self._done = threading.Event()
+        job.on_event = self._on_event
+        if threaded:
+            self._thread = threading.Thread(target=self.run, daemon=True, name="python-copy-engine")
+            self._thread.start()
+
+    def _on_event(self, event, line):
+        if self.on_line:
+            self.on_line(line)
+        else:
+            self.stdout.write_line(line)
+
+    def run(self):
+        """Run the job to completion and return its exit code"""
+        try:
+            code = self.job.run()
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Python copy engine failed: {e}")
+            self._on_event(None, f"ERROR : {e}")
+            code = EXIT_FATAL
+        self.returncode = code
+        self.stdout.finish()
+        self._done.set()
+        return code
+
+    def poll(self):
+        return self.returncode if self._done.is_set() else None
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise subprocess.TimeoutExpired("python-copy-engine", timeout)
+        return self.returncode
+
+    def terminate(self):
+        self.job.stop()
+
+    def kill(self):
+        self.job.stop()
+
+    def suspend(self):
+        self.job.pause()
+
+    def set_priority(self, cpu_priority, io_priority):
+        return self.job.set_priority(cpu_priority, io_priority)
+
+    def native_ids(self):
+        return self.job.native_ids()
+
+    def resume(self):
+        self.job.unpause()
+
+
+class RobocopyEngine:
+    """Runs commands with robocopy.exe"""
+
+    name = "robocopy"
+
+    def __init__(self, **settings):
+        # Engine settings only apply to the Python engine
+        self.settings = settings
+
+    def start(self, command):
+        # Use shell=True for Windows compatibility
+        return subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            shell=True,
+            bufsize=1,
+            universal_newlines=True
+        )
+
+
+class PythonCopyEngine:
+    """Runs commands with the cross-platform Python copy implementation"""
+
+    name = "python"
+
+    def __init__(self, incremental=False, checkpoint=None, resume=False, bandwidth_cap=0, dedup=False,
+                 **settings):
+        """
+        Args:
+            incremental (bool): Keep a file-state manifest in the job folder
+                and skip directories whose fingerprint has not changed
+            checkpoint (JobCheckpoint): Checkpoint to record progress in
+            resume (bool): Continue from the checkpoint of an interrupted run
+            bandwidth_cap (float): Maximum transfer rate in MB/s (0 = unlimited)
+            dedup (bool): Hard link files already present at the destination
+                (shared content-hash index, see robocopy_dedup)
+        """
+        self.incremental = incremental
+        self.dedup = dedup
+        self.checkpoint = checkpoint
+        self.resume = resume
+        self.throttle = TokenBucket(bandwidth_cap) if bandwidth_cap and bandwidth_cap > 0 else None
+
+    def create_job(self, command, executor=None):
+        """Build the copy job for a command without starting it"""
+        options = parse_command(command)
+        manifest_path = None
+        if self.incremental and options["source_path"] and options["dest_path"]:
+            folder = get_job_folder(options["source_path"], options["dest_path"])
+            manifest_path = os.path.join(folder, MANIFEST_FILE)
+        dedup_index = DedupIndex() if self.dedup and not options["list_only"] else None
+        return PythonCopyJob(options, manifest_path=manifest_path, checkpoint=self.checkpoint,
+                             resume=self.resume, throttle=self.throttle, executor=executor,
+                             dedup_index=dedup_index)
+
+    def start(self, command):
+        return EngineProcess(self.create_job(command))
+
+
+def _separate_process(process):
+    """
+    Check whether psutil may act on a handle's pid
+
+    Python engine jobs (and groups of them) report the GUI's own pid; they
+    must never be suspended or killed through it.
+    """
+    return psutil is not None and process.pid is not None and process.pid != os.getpid()
+
+
+def _process_tree(process):
+    """psutil handles for a process started with shell=True and its children"""
+    parent = psutil.Process(process.pid)
+    return [parent] + parent.children(recursive=True)
+
+
+def suspend_process(process):
+    """
+    Suspend a running job
+
+    Python engine jobs pause themselves. robocopy.exe processes are suspended
+    with psutil (including the shell's children), which is optional.
+
+    Args:
+        process: Handle returned by an engine's start()
+
+    Returns:
+        bool: False if the process cannot be suspended on this system
+    """
+    if hasattr(process, "suspend"):
+        return process.suspend() is not False
+    if not _separate_process(process):
+        return False
+    try:
+        for proc in _process_tree(process):
+            proc.suspend()
+        return True
+    except psutil.Error as e:
+        logging.getLogger(__name__).error(f"Failed to suspend process {process.pid}: {e}")
+        return False
+
+
+def resume_process(process):
+    """
+    Resume a job suspended with suspend_process
+
+    Returns:
+        bool: False if the process could not be resumed
+    """
+    if hasattr(process, "resume"):
+        return process.resume() is not False
+    if not _separate_process(process):
+        return False
+    try:
+        for proc in _process_tree(process):
+            proc.resume()
+        return True
+    except psutil.Error as e:
+        logging.getLogger(__name__).error(f"Failed to resume process {process.pid}: {e}")
+        return False
+
+
+def kill_process(process):
+    """
+    Kill a running job
+
+    robocopy.exe runs under a shell (shell=True), so killing only the shell
+    would leave robocopy.exe running and holding the output pipe open; its
+    children are killed too when psutil is available.
+    """
+    if not hasattr(process, "job") and _separate_process(process):
+        try:
+            for child in psutil.Process(process.pid).children(recursive=True):
+                child.kill()
+        except psutil.Error as e:
+            logging.getLogger(__name__).warning(f"Could not kill children of process {process.pid}: {e}")
+    process.kill()
+
+
+ENGINES = {
+    "robocopy": RobocopyEngine,
+    "python": PythonCopyEngine,
+}
+
+
+def robocopy_available():
+    """Check whether robocopy.exe can be run on this machine"""
+    return platform.system() == "Windows" and shutil.which("robocopy") is not None
+
+
+def get_engine(name="auto", **settings):
+    """
+    Get a copy engine by name
+
+    Args:
+        name (str): 'robocopy', 'python' or 'auto' (robocopy.exe when available)
+        **settings: Engine settings such as incremental=True or bandwidth_cap=10
+
+    Returns:
+        RobocopyEngine or PythonCopyEngine
+    """
+    name = (name or "auto").lower()
+    if name == "auto":
+        name = "robocopy" if robocopy_available() else "python"
+    if name not in ENGINES:
+        raise ValueError(f"Unknown copy engine: {name}")
+    return ENGINES[name](**settings)
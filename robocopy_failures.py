@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Failed-file tracking for ROBOCOPY GUI jobs
+
+A FailureCollector reads the output of a job (robocopy.exe or the Python
+engine, which prints the same ERROR lines) and collects every path that
+failed, with its error code, message and the number of in-run retries. The
+collected failures are kept in a FailureSet in the job folder, so that a
+follow-up run can copy only the failed files instead of the whole tree.
+
+A retry run is split into batches, one per directory: failed files are
+passed to robocopy as file names ("robocopy src\\dir dst\\dir a.txt b.txt
+..."), and directories that could not be read at all are copied again with
+the original options.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+
+from robocopy_engine import parse_command
+from robocopy_utils import relative_path
+
+FAILURES_FILE = "failures.sqlite"
+
+KIND_FILE = "file"
+KIND_DIR = "dir"
+
+# cmd.exe accepts 8191 characters; leave room for the /IPG and log switches
+MAX_COMMAND_LENGTH = 7600
+
+# Switches that make robocopy walk or purge the tree; file batches copy only
+# the named files of one directory
+_TREE_SWITCHES = ("/S", "/E", "/MIR", "/PURGE", "/LEV:", "/CREATE")
+
+_ERROR_LINE = re.compile(r"ERROR (\d+) \(0x[0-9A-Fa-f]+\) (.*?(?:File|Directory)) (.+)$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS failures (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    code INTEGER NOT NULL,
+    action TEXT NOT NULL,
+    message TEXT NOT NULL,
+    retries INTEGER NOT NULL,
+    runs INTEGER NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def parse_error_line(line):
+    """
+    Parse a ROBOCOPY error line
+
+    Args:
+        line (str): Line such as
+            '2024/01/15 10:30:00 ERROR 5 (0x00000005) Copying File C:\\src\\a.txt'
+
+    Returns:
+        tuple or None: (code, action, path), None for other lines
+    """
+    match = _ERROR_LINE.search(line)
+    if not match:
+        return None
+    path = match.group(3).strip()
+    if not path:
+        return None
+    return int(match.group(1)), match.group(2), os.path.normpath(path)
+
+
+class FailureCollector:
+    """Collects failed paths from the output lines of one job"""
+
+    def __init__(self):
+        self.failures = {}
+        self._last = None
+
+    def feed(self, line):
+        """
+        Process one output line
+
+        Returns:
+            dict or None: The failure entry the line reported, if any
+        """
+        parsed = parse_error_line(line)
+        if parsed is None:
+            # robocopy prints the error message on the line after the error
+            if self._last is not None:
+                text = line.strip()
+                if text and not text.startswith("Waiting") and "RETRY LIMIT" not in text:
+                    self._last["message"] = text
+                self._last = None
+            return None
+
+        code, action, path = parsed
+        entry = self.failures.get(path)
+        if entry is None:
+            entry = {"path": path, "kind": KIND_FILE if action.endswith("File") else KIND_DIR,
+                     "code": code, "action": action, "message": "", "retries": 0}
+            self.failures[path] = entry
+        else:
+            # Each in-run retry that fails prints the error again
+            entry["retries"] += 1
+            entry["code"] = code
+        self._last = entry
+        return entry
+
+    def __len__(self):
+        return len(self.failures)
+
+
+class FailureSet:
+    """Failed paths of a job, stored in its job folder"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Failure database file
+        """
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def _upsert(self, entries):
+        now = time.time()
+        self._conn.executemany(
+            "INSERT INTO failures (path, kind, code, action, message, retries, runs, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, 1, ?) "
+            "ON CONFLICT(path) DO UPDATE SET kind = excluded.kind, code = excluded.code, "
+            "action = excluded.action, message = excluded.message, "
+            "retries = retries + excluded.retries, runs = runs + 1, updated = excluded.updated",
+            [(e["path"], e["kind"], e["code"], e["action"], e["message"], e["retries"], now)
+             for e in entries])
+
+    @property
+    def command(self):
+        """Command of the run the failures belong to (its options are reused for retries)"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'command'").fetchone()
+        return row[0] if row else None
+
+    def record_run(self, command, failures, complete=True):
+        """
+        Store the failures of a full run
+
+        Args:
+            command (str): Command of the run
+            failures (dict): FailureCollector.failures
+            complete (bool): The run went through the whole tree, so paths it
+                did not report have been copied; a stopped run only adds
+        """
+        with self._lock, self._conn:
+            if complete:
+                self._conn.execute("DELETE FROM failures")
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('command', ?)", (command,))
+            self._upsert(failures.values())
+
+    def record_retry(self, attempted, failures, complete=True):
+        """
+        Store the outcome of a retry run
+
+        Args:
+            attempted (list): Paths the retry run was given
+            failures (dict): FailureCollector.failures of the retry run
+            complete (bool): False if the retry run was stopped; attempted
+                paths that did not fail again are then kept
+        """
+        with self._lock, self._conn:
+            if complete:
+                resolved = [(path,) for path in attempted if path not in failures]
+                self._conn.executemany("DELETE FROM failures WHERE path = ?", resolved)
+            self._upsert(failures.values())
+
+    def entries(self, limit=None):
+        """
+        Get the stored failures
+
+        Returns:
+            list: Failure dicts ordered by path
+        """
+        query = "SELECT path, kind, code, action, message, retries, runs FROM failures ORDER BY path"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._conn.execute(query).fetchall()
+        keys = ("path", "kind", "code", "action", "message", "retries", "runs")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM failures").fetchone()[0]
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM failures")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _quote(path):
+    return f'"{path}"'
+
+
+def batch_switches(options):
+    """
+    Switches for batches derived from a command
+
+    Args:
+        options (dict): Options of the command (parse_command)
+
+    Returns:
+        tuple: (switches, file_switches) - file_switches lack the switches
+            that walk or purge the tree
+    """
+    switches = []
+    for switch in options["switches"]:
+        if switch.upper().startswith("/LOG:"):
+            # Batches must not overwrite each other's log
+            switch = "/LOG+:" + switch[5:]
+        switches.append(switch)
+    file_switches = [s for s in switches
+                     if not any(s.upper() == t or (t.endswith(":") and s.upper().startswith(t))
+                                for t in _TREE_SWITCHES)]
+    return switches, file_switches
+
+
+def file_batches(source, dest, rel_dir, items, switches):
+    """
+    robocopy commands copying named files of one directory
+
+    Args:
+        source (str): Source root
+        dest (str): Destination root
+        rel_dir (str): Directory relative to the roots
+        items (list): (file name, payload) tuples
+        switches (list): Switches for every command
+
+    Returns:
+        list: (command, payloads) tuples, split to stay below MAX_COMMAND_LENGTH
+    """
+    src, dst = os.path.join(source, rel_dir), os.path.join(dest, rel_dir)
+    head = " ".join(["robocopy", _quote(src), _quote(dst)])
+    tail = " ".join(switches)
+    batches = []
+    names, payloads, length = [], [], len(head) + len(tail) + 2
+    for name, payload in items:
+        if names and length + len(name) + 3 > MAX_COMMAND_LENGTH:
+            batches.append((" ".join([head] + [_quote(n) for n in names] + [tail]), payloads))
+            names, payloads, length = [], [], len(head) + len(tail) + 2
+        names.append(name)
+        payloads.append(payload)
+        length += len(name) + 3
+    if names:
+        batches.append((" ".join([head] + [_quote(n) for n in names] + [tail]), payloads))
+    return batches
+
+
+def build_retry_batches(command, entries):
+    """
+    Build the commands of a retry run
+
+    Args:
+        command (str): Command of the run that produced the failures
+        entries (list): Failure dicts (FailureSet.entries)
+
+    Returns:
+        list: (command, paths) tuples; paths are the failures the batch retries
+    """
+    options = parse_command(command)
+    source, dest = options["source_path"], options["dest_path"]
+    if not source or not dest:
+        return []
+    recursive = options["copy_subdirs"] or options["copy_empty_subdirs"]
+
+    switches, file_switches = batch_switches(options)
+
+    dirs = {}
+    files = {}
+    for entry in entries:
+        # Destination-side errors name the destination path
+        rel = relative_path(entry["path"], (source, dest))
+        if rel is None:
+            continue
+        if entry["kind"] == KIND_DIR:
+            dirs.setdefault(rel, []).append(entry["path"])
+        else:
+            files.setdefault(os.path.dirname(rel), []).append((os.path.basename(rel), entry["path"]))
+
+    def covering_dir(rel_dir):
+        # Top-most retried directory whose batch also covers rel_dir
+        for retried in sorted(dirs, key=len):
+            if retried == rel_dir or (recursive and (retried == "" or rel_dir.startswith(retried + os.sep))):
+                return retried
+        return None
+
+    dir_paths = {}
+    for rel_dir, paths in dirs.items():
+        dir_paths.setdefault(covering_dir(rel_dir), []).extend(paths)
+    for rel_dir in list(files):
+        retried = covering_dir(rel_dir)
+        if retried is not None:
+            dir_paths[retried].extend(path for _, path in files.pop(rel_dir))
+
+    batches = []
+    for rel_dir in sorted(dir_paths):
+        src, dst = os.path.join(source, rel_dir), os.path.join(dest, rel_dir)
+        batches.append((" ".join(["robocopy", _quote(src), _quote(dst)] + switches), dir_paths[rel_dir]))
+
+    for rel_dir in sorted(files):
+        batches.extend(file_batches(source, dest, rel_dir, sorted(files[rel_dir]), file_switches))
+    return batches
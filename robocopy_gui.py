@@ -6,8 +6,6 @@ A comprehensive user-friendly interface for Windows ROBOCOPY command management.
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-import subprocess
-import threading
 import os
 import json
 import logging
@@ -16,6 +14,71 @@ import queue
 import sys
 import time
 import webbrowser
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from robocopy_engine import get_engine, parse_command, suspend_process, resume_process, kill_process
+from robocopy_utils import get_job_folder, job_log_path, PathInspector
+from robocopy_treestats import TreeStatsCache
+from robocopy_logtail import LogTail, line_tag, LOG_WINDOW_LINES
+from robocopy_logs import LogManager, RotatingLogHandler, RateLimitedLog, start_log_listener, LEGACY_LOGS
+from robocopy_history import (RunHistory, job_key, STATUS_IMPORTED, KIND_COPY, KIND_LIST, KIND_RETRY, KIND_PLAN,
+                              KIND_WATCH, KIND_VERIFY)
+from robocopy_regression import (Baseline, detect, trend, describe_regression, run_duration, run_throughput,
+                                 format_duration, BASELINE_RUNS, METRIC_DURATION, METRIC_THROUGHPUT)
+from robocopy_rules import RuleEngine, command_fields, GROUP_RANGES
+from robocopy_diff import (TreeDiff, CATEGORY_NEW, CATEGORY_CHANGED, CATEGORY_EXTRA, CATEGORY_IDENTICAL,
+                           CATEGORY_EXCLUDED)
+from robocopy_space import (SpaceForecaster, free_space, estimate_needed, SPACE_MARGIN,
+                            SPACE_SAMPLE_INTERVAL, FORECAST_WARN, FORECAST_PAUSE)
+from robocopy_probe import (PathProber, PathUnreachable, path_status, destination_status,
+                            STATUS_MISSING, STATUS_DIR)
+from robocopy_checkpoint import (JobCheckpoint, CHECKPOINT_FILE, STATUS_COMPLETED,
+                                 STATUS_FAILED, STATUS_STOPPED, STATUS_RUNNING)
+from robocopy_throttle import IpgController, THROTTLE_STATE_FILE
+from robocopy_priority import (CPU_PRIORITIES, IO_PRIORITIES, UsageMonitor,
+                               set_process_priority)
+from robocopy_stop import StopController, STOP_FINALIZED_MESSAGE
+from robocopy_supervisor import JobSupervisor, EVENT_STARTED, EVENT_LINE, EVENT_FINISHED
+from robocopy_failures import (FailureCollector, FailureSet, FAILURES_FILE, KIND_DIR,
+                               build_retry_batches)
+from robocopy_plan import (PlanBuilder, CopyPlan, PlanEngine, PLAN_FILE, ACTION_COPY, ACTION_DELETE,
+                           ACTION_SKIP, KIND_FILE, planning_command, execution_command,
+                           robocopy_plan_batches)
+from robocopy_scheduler import (JobScheduler, ScheduledJob, ScheduleError,
+                                ACTION_START, ACTION_SUSPEND, ACTION_RESUME)
+from robocopy_watch import SyncWatcher, watch_commands
+from robocopy_verify import VerifyEngine, copied_files, DEFAULT_VERIFY_CONCURRENCY
+
+# How often the job scheduler checks for due, closing and reopening windows
+SCHEDULER_INTERVAL_MS = 15000
+
+# How often watch mode checks for changed directories to sync
+WATCH_INTERVAL_MS = 1000
+
+# Typing pause before the source path is inspected, and how often a running inspection is polled
+SOURCE_INSPECT_DELAY_MS = 400
+INSPECT_POLL_MS = 50
+
+# Stored source tree statistics younger than this are shown without refreshing them
+TREE_STATS_FRESH_SECONDS = 60
+TREE_STATS_POLL_MS = 250
+
+# Application log shown in the Logs tab, and how often it is checked for new lines while the tab is open
+GUI_LOG_FILE = 'robocopy_gui.log'
+LOG_TAIL_POLL_MS = 1000
+
+# Runs per page of the run history in the Logs tab
+HISTORY_PAGE_SIZE = 50
+
+# Seconds over which the peak throughput of a run is measured
+PEAK_SPEED_WINDOW = 2.0
+
+# Output lines pushed through the GUI pipeline by --benchmark-logging
+LOGGING_BENCHMARK_LINES = 20000
+
+# How often the mirror preview window shows the progress of its comparison
+DIFF_POLL_MS = 200
 
 class ToolTip:
     """Creates a tooltip for a given widget"""
@@ -75,6 +138,80 @@ class AdvancedRobocopyGUI:
         self.files_copied = 0
         self.bytes_copied = 0
         
+        # Checkpoint of the running job (for resuming interrupted jobs)
+        self.checkpoint = None
+        self.stop_requested = False
+        self.stats_offset = {}
+        
+        # Scheduled jobs (start times and allowed time windows)
+        self.scheduler = JobScheduler()
+        self.scheduled_stop = False
+        
+        # CPU/I/O usage of the running job
+        self.usage_monitor = None
+        
+        # Jobs run on the supervisor's event loop and report to the output queue
+        self.supervisor = JobSupervisor(self.output_queue)
+        self.current_job_ids = set()
+        self.pending_job_ids = set()
+        self.job_context = {}
+        
+        # Failed paths of the running job, and the paths a retry run retries
+        self.failure_collector = None
+        self.retry_paths = []
+        self.failure_count = 0
+        
+        # Every run is recorded in the run history; the Logs tab shows it a page at a time
+        self.run_history = RunHistory()
+        try:
+            self.run_history.import_legacy()
+        except Exception as e:
+            self.logger.error(f"Failed to import command history: {str(e)}")
+        self.history_run_id = None
+        self.last_history_run_id = None
+        self.history_rows = []
+        self.history_page_starts = []
+        self.peak_sample = None
+        
+        # Copy plan built by a list-only run; batched runs print one summary per batch
+        self.plan_builder = None
+        self.batched_run = False
+        self.stop_controller = None
+        
+        # Watch mode: changed source directories are synced by small targeted jobs
+        self.watch = None
+        self.watch_enabled = tk.BooleanVar(value=False)
+        self.watch_run = False
+        
+        # Files copied by the running job, compared with their sources once it finishes
+        self.verify_builder = None
+        self.verify_run = False
+        
+        # Path checks run on background workers; the source is inspected once typing pauses
+        self.path_prober = PathProber()
+        self.path_inspector = PathInspector(fs=self.path_prober.fs)
+        self.source_inspect_id = None
+        self.dest_probe = None
+        
+        # Whole-tree statistics of the source, stored between sessions and refreshed in the background
+        self.tree_stats = TreeStatsCache()
+        self.tree_stats_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="treestats")
+        self.tree_stats_stop = None
+        
+        # Option validation rules; the command's switches are checked before it runs
+        self.option_rules = RuleEngine()
+        self.switch_rules = RuleEngine(groups=(GROUP_RANGES,))
+        
+        # Free space of the running job's destination, sampled to pause the job before the disk is full
+        self.space_forecaster = None
+        self.space_dest = None
+        self.space_probe = None
+        # Free-space probe of a job about to start
+        self.space_check = None
+        self.space_sampled = 0.0
+        self.space_paused = False
+        self.space_warned = False
+        
         # Progress tracking variables
         self.progress_var = tk.DoubleVar()
         self.auto_scroll_var = tk.BooleanVar(value=True)
@@ -110,8 +247,14 @@ class AdvancedRobocopyGUI:
         self.start_performance_timer()
         self.root.after(1000, self.update_performance_stats)
         
-        # Auto-refresh log on startup
-        self.root.after(1000, self.refresh_log)
+        # Auto-refresh log on startup, then follow it while the Logs tab is open
+        self.root.after(1000, self.poll_log_tail)
+        
+        # Tell the user about an interrupted job for the loaded paths
+        self.root.after(1500, self.check_interrupted_job)
+        
+        # Start the job scheduler
+        self.root.after(5000, self.scheduler_tick)
     
     def setup_styles(self):
         """Setup modern styling for the application"""
@@ -162,6 +305,15 @@ class AdvancedRobocopyGUI:
         tools_menu.add_command(label="Performance Monitor", command=self.show_performance_monitor)
         tools_menu.add_command(label="Command History", command=self.show_command_history)
         tools_menu.add_command(label="Validate Paths", command=self.validate_all_paths)
+        tools_menu.add_command(label="Resume Interrupted Job", command=self.resume_job)
+        tools_menu.add_command(label="Retry Failed Files...", command=self.retry_failures)
+        tools_menu.add_command(label="Create Copy Plan", command=self.create_plan)
+        tools_menu.add_command(label="Execute Copy Plan...", command=self.execute_plan)
+        tools_menu.add_command(label="Preview Mirror Changes...", command=self.preview_mirror)
+        tools_menu.add_command(label="Job Performance Trend...", command=self.show_job_trend)
+        tools_menu.add_checkbutton(label="Watch Source for Changes", variable=self.watch_enabled,
+                                   command=self.toggle_watch)
+        tools_menu.add_command(label="Job Scheduler...", command=self.show_scheduler)
         tools_menu.add_separator()
         tools_menu.add_command(label="ROBOCOPY Documentation", command=self.open_robocopy_docs)
         
@@ -176,15 +328,21 @@ class AdvancedRobocopyGUI:
     
     def setup_logging(self):
         """Setup logging configuration"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('robocopy_gui.log'),
-                logging.StreamHandler()
-            ]
-        )
+        # The application log and robocopy's logs are rotated by size and age and compressed
+        self.log_manager = LogManager()
+        for legacy_log in LEGACY_LOGS:
+            self.log_manager.rotate_if_needed(legacy_log)
+        
+        # Records are written by a listener thread, not by the thread that logs them
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+        handlers = [RotatingLogHandler(GUI_LOG_FILE, self.log_manager), logging.StreamHandler()]
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        queue_handler, self.log_listener = start_log_listener(handlers)
+        logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
         self.logger = logging.getLogger(__name__)
+        # Debug messages logged for every output line
+        self.line_debug = RateLimitedLog(self.logger)
     
     def create_widgets(self):
         """Create and arrange GUI widgets with advanced features"""
@@ -251,6 +409,9 @@ class AdvancedRobocopyGUI:
         self.source_status = ttk.Label(source_frame, text="", foreground="gray")
         self.source_status.grid(row=1, column=0, columnspan=2, sticky="w")
         
+        self.source_tree_status = ttk.Label(source_frame, text="", foreground="gray")
+        self.source_tree_status.grid(row=2, column=0, columnspan=2, sticky="w")
+        
         # Destination directory selection with validation
         dest_label = ttk.Label(main_frame, text="Destination Directory:")
         dest_label.grid(row=1, column=0, sticky="w", pady=5)
@@ -513,7 +674,8 @@ class AdvancedRobocopyGUI:
                 "Mirror Mode Warning",
                 "⚠️ MIRROR MODE WARNING ⚠️\n\n"
                 "Mirror mode will DELETE files in the destination that don't exist in the source!\n\n"
-                "This can result in permanent data loss if used incorrectly.\n\n"
+                "This can result in permanent data loss if used incorrectly.\n"
+                "Use Tools → Preview Mirror Changes to see what would be deleted.\n\n"
                 "Are you sure you want to enable Mirror Mode?",
                 icon="warning"
             )
@@ -655,46 +817,166 @@ class AdvancedRobocopyGUI:
             self.generate_command()
     
     def on_source_change(self, event=None):
-        """Handle source path changes with real-time validation"""
-        path = self.source_path.get()
-        if not path:
+        """Handle source path changes; the path is inspected once typing pauses"""
+        if self.source_inspect_id is not None:
+            self.root.after_cancel(self.source_inspect_id)
+            self.source_inspect_id = None
+        self.path_inspector.cancel()
+        if self.tree_stats_stop is not None:
+            self.tree_stats_stop.set()
+            self.tree_stats_stop = None
+        self.source_tree_status.config(text="")
+        
+        if not self.source_path.get():
             self.source_status.config(text="", foreground="gray")
             return
-            
-        if os.path.exists(path) and os.path.isdir(path):
-            try:
-                file_count = len([f for f in os.listdir(path) if os.path.isfile(os.path.join(path, f))])
-                dir_count = len([d for d in os.listdir(path) if os.path.isdir(os.path.join(path, d))])
-                self.source_status.config(text=f"✓ Valid source ({file_count} files, {dir_count} directories)", 
-                                        foreground="green")
-            except PermissionError:
-                self.source_status.config(text="⚠ Access denied - check permissions", foreground="orange")
-        else:
-            self.source_status.config(text="✗ Invalid path or not a directory", foreground="red")
         
+        self.source_status.config(text="Checking...", foreground="gray")
+        self.source_inspect_id = self.root.after(SOURCE_INSPECT_DELAY_MS, self.inspect_source)
+    
+    def inspect_source(self):
+        """Check the source path on the background workers and regenerate the command"""
+        self.source_inspect_id = None
+        path = self.source_path.get()
+        if path:
+            self.poll_source_probe(path, self.path_prober.submit(path_status, path))
         self.generate_command()
     
+    def poll_source_probe(self, path, probe):
+        """Start listing the source once it is known to be a reachable directory"""
+        if not probe.done():
+            self.root.after(INSPECT_POLL_MS, self.poll_source_probe, path, probe)
+            return
+        if path != self.source_path.get():
+            probe.cancel()
+            return
+        try:
+            status = probe.result()
+        except PathUnreachable as e:
+            self.source_status.config(text=f"⚠ Source is not reachable ({e.strerror})", foreground="orange")
+            return
+        except OSError:
+            # Let the listing report what is wrong (e.g. access denied)
+            status = STATUS_DIR
+        
+        if status != STATUS_DIR:
+            self.source_status.config(text="✗ Invalid path or not a directory", foreground="red")
+            return
+        self.poll_source_inspection(path, self.path_inspector.inspect(path))
+        self.show_tree_stats(path)
+    
+    def poll_source_inspection(self, path, future):
+        """Show the inspection result once it is ready, unless the path changed meanwhile"""
+        if not future.done():
+            self.root.after(INSPECT_POLL_MS, self.poll_source_inspection, path, future)
+            return
+        result = future.result()
+        if result is None or path != self.source_path.get():
+            return
+        
+        if not result["is_dir"]:
+            self.source_status.config(text="✗ Invalid path or not a directory", foreground="red")
+        elif isinstance(result["error"], PermissionError):
+            self.source_status.config(text="⚠ Access denied - check permissions", foreground="orange")
+        elif result["error"] is not None:
+            self.source_status.config(text=f"⚠ Cannot read directory: {result['error'].strerror or result['error']}",
+                                    foreground="orange")
+        else:
+            self.source_status.config(text=f"✓ Valid source ({result['files']} files, {result['dirs']} directories)", 
+                                    foreground="green")
+    
+    def show_tree_stats(self, path):
+        """Show the stored statistics of the whole source tree and refresh them if they are old"""
+        summary = self.tree_stats.summary(path)
+        if summary is not None:
+            self.source_tree_status.config(text=self.format_tree_stats(summary))
+            if time.time() - summary["updated"] < TREE_STATS_FRESH_SECONDS:
+                return
+        else:
+            self.source_tree_status.config(text="Whole tree: counting...")
+        
+        stop_event = self.tree_stats_stop = threading.Event()
+        future = self.tree_stats_executor.submit(self.tree_stats.refresh, path, stop_event)
+        self.poll_tree_stats(path, future, stop_event)
+    
+    def poll_tree_stats(self, path, future, stop_event):
+        """Show refreshed tree statistics unless the source changed meanwhile"""
+        if not future.done():
+            self.root.after(TREE_STATS_POLL_MS, self.poll_tree_stats, path, future, stop_event)
+            return
+        if stop_event is not self.tree_stats_stop:
+            return
+        self.tree_stats_stop = None
+        try:
+            summary = future.result()
+        except OSError as e:
+            self.logger.warning(f"Could not count the source tree {path}: {e}")
+            self.source_tree_status.config(text="")
+            return
+        if summary is not None:
+            self.source_tree_status.config(text=self.format_tree_stats(summary))
+    
+    def refresh_dest_tree_stats(self, path):
+        """Count the destination tree in the background; the free-space check subtracts its bytes"""
+        summary = self.tree_stats.summary(path)
+        if summary is None or time.time() - summary["updated"] >= TREE_STATS_FRESH_SECONDS:
+            self.tree_stats_executor.submit(self.tree_stats.refresh, path)
+    
+    def format_tree_stats(self, summary):
+        age = int(time.time() - summary["updated"])
+        if age < 60:
+            updated = "just now"
+        elif age < 3600:
+            updated = f"{age // 60} min ago"
+        elif age < 86400:
+            updated = f"{age // 3600} h ago"
+        else:
+            updated = datetime.fromtimestamp(summary["updated"]).strftime("%Y-%m-%d %H:%M")
+        return (f"Whole tree: {summary['files']:,} files, {self.format_bytes(summary['bytes'])} in "
+                f"{summary['dirs']:,} directories, {summary['depth']} levels deep (counted {updated})")
+    
     def on_dest_change(self, event=None):
-        """Handle destination path changes with real-time validation"""
+        """Handle destination path changes; the path is checked on the background workers"""
+        if self.dest_probe is not None:
+            self.dest_probe.cancel()
+            self.dest_probe = None
+        
         path = self.dest_path.get()
         if not path:
             self.dest_status.config(text="", foreground="gray")
             return
-            
-        if os.path.exists(path):
-            if os.path.isdir(path):
-                self.dest_status.config(text="✓ Destination exists and is accessible", foreground="green")
-            else:
-                self.dest_status.config(text="✗ Path exists but is not a directory", foreground="red")
-        else:
-            parent_dir = os.path.dirname(path)
-            if parent_dir and os.path.exists(parent_dir):
-                self.dest_status.config(text="✓ Will be created (parent directory exists)", foreground="blue")
-            else:
-                self.dest_status.config(text="⚠ Parent directory does not exist", foreground="orange")
         
+        self.dest_probe = self.path_prober.submit(destination_status, path)
+        self.poll_dest_probe(self.dest_probe)
         self.generate_command()
     
+    def poll_dest_probe(self, probe):
+        """Show the destination check once it finished or timed out"""
+        if probe is not self.dest_probe:
+            return
+        if not probe.done():
+            self.root.after(INSPECT_POLL_MS, self.poll_dest_probe, probe)
+            return
+        self.dest_probe = None
+        try:
+            status, parent_status = probe.result()
+        except PathUnreachable as e:
+            self.dest_status.config(text=f"⚠ Destination is not reachable ({e.strerror})", foreground="orange")
+            return
+        except OSError as e:
+            self.dest_status.config(text=f"⚠ Cannot check destination: {e.strerror or e}", foreground="orange")
+            return
+        
+        if status == STATUS_DIR:
+            self.dest_status.config(text="✓ Destination exists and is accessible", foreground="green")
+            self.refresh_dest_tree_stats(probe.path)
+        elif status != STATUS_MISSING:
+            self.dest_status.config(text="✗ Path exists but is not a directory", foreground="red")
+        elif parent_status == STATUS_DIR:
+            self.dest_status.config(text="✓ Will be created (parent directory exists)", foreground="blue")
+        else:
+            self.dest_status.config(text="⚠ Parent directory does not exist", foreground="orange")
+    
     def validate_number(self, value):
         """Validate numeric input for spinboxes"""
         if value == "":
@@ -744,6 +1026,39 @@ class AdvancedRobocopyGUI:
         wait_spinbox.grid(row=2, column=1, sticky="w")
         ToolTip(wait_spinbox, "Wait time between retries in seconds.\nLonger waits may help with network issues but slow overall process.")
         
+        # Copy engine selection
+        ttk.Label(perf_frame, text="Copy Engine:").grid(row=3, column=0, sticky="w", padx=(0, 10))
+        self.copy_engine = tk.StringVar(value="auto")
+        engine_combo = ttk.Combobox(perf_frame, textvariable=self.copy_engine, width=10, state="readonly",
+                                    values=("auto", "robocopy", "python"))
+        engine_combo.grid(row=3, column=1, sticky="w")
+        ToolTip(engine_combo, "Program used to run the command.\nauto: ROBOCOPY on Windows, built-in Python engine elsewhere\nrobocopy: always use robocopy.exe\npython: built-in cross-platform engine (/E /S /MIR /PURGE /XO /XN /XC /MOV /R /W /MT)")
+        
+        # Bandwidth cap
+        ttk.Label(perf_frame, text="Bandwidth Cap (MB/s):").grid(row=4, column=0, sticky="w", padx=(0, 10))
+        self.bandwidth_cap = tk.StringVar(value="0")
+        bandwidth_spinbox = ttk.Spinbox(perf_frame, from_=0, to=10000, textvariable=self.bandwidth_cap, width=10,
+                                       validate='key', validatecommand=(self.root.register(self.validate_number), '%P'))
+        bandwidth_spinbox.grid(row=4, column=1, sticky="w")
+        ToolTip(bandwidth_spinbox, "Maximum transfer rate in MB/s (0 = unlimited).\nPython engine: enforced exactly.\nROBOCOPY: approximated with /IPG, which is re-tuned after each run\nof the same job from the measured speed.")
+        
+        # Job priority (adjustable while the job runs)
+        ttk.Label(perf_frame, text="CPU Priority:").grid(row=5, column=0, sticky="w", padx=(0, 10))
+        self.cpu_priority = tk.StringVar(value="normal")
+        cpu_priority_combo = ttk.Combobox(perf_frame, textvariable=self.cpu_priority, width=12, state="readonly",
+                                          values=CPU_PRIORITIES)
+        cpu_priority_combo.grid(row=5, column=1, sticky="w")
+        cpu_priority_combo.bind('<<ComboboxSelected>>', lambda e: self.apply_job_priority())
+        ToolTip(cpu_priority_combo, "CPU priority of the copy job. Lower it to leave CPU time\nfor other services on this machine. Can be changed while a job runs;\nraising it again may require administrator rights.")
+        
+        ttk.Label(perf_frame, text="I/O Priority:").grid(row=6, column=0, sticky="w", padx=(0, 10))
+        self.io_priority = tk.StringVar(value="normal")
+        io_priority_combo = ttk.Combobox(perf_frame, textvariable=self.io_priority, width=12, state="readonly",
+                                         values=IO_PRIORITIES)
+        io_priority_combo.grid(row=6, column=1, sticky="w")
+        io_priority_combo.bind('<<ComboboxSelected>>', lambda e: self.apply_job_priority())
+        ToolTip(io_priority_combo, "Disk I/O priority of the copy job (idle = only use the disk\nwhen nothing else does). Can be changed while a job runs.\nROBOCOPY jobs need the optional psutil package.")
+        
         # Advanced copy options
         advanced_copy_frame = ttk.LabelFrame(main_frame, text="Advanced Copy Options", padding="10")
         advanced_copy_frame.pack(fill=tk.X, pady=(0, 10))
@@ -786,6 +1101,33 @@ class AdvancedRobocopyGUI:
         only_newer_cb.grid(row=2, column=1, sticky="w", pady=2, padx=(20, 0))
         ToolTip(only_newer_cb, "Copy only files that are newer in the source.")
         
+        self.incremental = tk.BooleanVar()
+        incremental_cb = ttk.Checkbutton(advanced_copy_frame, text="Incremental sync (file-state manifest)", 
+                                       variable=self.incremental)
+        incremental_cb.grid(row=3, column=0, sticky="w", pady=2)
+        ToolTip(incremental_cb, "Python engine only: remember the synced state in the job folder and\nskip directories that have not changed since the last run.\nIn-place edits that do not change a directory are not detected -\nrun a full sync periodically.")
+        
+        self.dedup = tk.BooleanVar()
+        dedup_cb = ttk.Checkbutton(advanced_copy_frame, text="Deduplicate (hard link identical files)", 
+                                 variable=self.dedup)
+        dedup_cb.grid(row=3, column=1, sticky="w", pady=2, padx=(20, 0))
+        ToolTip(dedup_cb, "Python engine only: keep a content-hash index of destination files and\ncreate a hard link instead of copying a file whose content (and mtime)\nis already on the destination volume. Files under 1 MB are always copied.")
+        
+        self.verify_copy = tk.BooleanVar()
+        verify_cb = ttk.Checkbutton(advanced_copy_frame, text="Verify copied files", 
+                                  variable=self.verify_copy)
+        verify_cb.grid(row=4, column=0, sticky="w", pady=2)
+        ToolTip(verify_cb, "After the copy, compare every copied file with its source.\nFiles that differ are added to Tools → Retry Failed Files.")
+        
+        verify_frame = ttk.Frame(advanced_copy_frame)
+        verify_frame.grid(row=4, column=1, sticky="w", pady=2, padx=(20, 0))
+        ttk.Label(verify_frame, text="Verify threads:").pack(side=tk.LEFT)
+        self.verify_threads = tk.StringVar(value=str(DEFAULT_VERIFY_CONCURRENCY))
+        verify_spinbox = ttk.Spinbox(verify_frame, from_=1, to=64, textvariable=self.verify_threads, width=5,
+                                     validate='key', validatecommand=(self.root.register(self.validate_number), '%P'))
+        verify_spinbox.pack(side=tk.LEFT, padx=(5, 0))
+        ToolTip(verify_spinbox, "Files read at the same time while verifying.\nLower it for spinning disks or busy shares, raise it for SSDs.")
+        
         # Logging and monitoring
         logging_frame = ttk.LabelFrame(main_frame, text="Logging & Monitoring", padding="10")
         logging_frame.pack(fill=tk.X, pady=(0, 10))
@@ -854,6 +1196,13 @@ class AdvancedRobocopyGUI:
         self.eta_label = ttk.Label(metrics_frame, text="ETA: Calculating...")
         self.eta_label.grid(row=3, column=1, sticky="w", padx=(0, 20))
         
+        # Effective resource usage of the job (to verify priority settings)
+        self.job_cpu_label = ttk.Label(metrics_frame, text="Job CPU: -")
+        self.job_cpu_label.grid(row=4, column=0, sticky="w", padx=(0, 20))
+        
+        self.job_io_label = ttk.Label(metrics_frame, text="Job Disk I/O: -")
+        self.job_io_label.grid(row=4, column=1, sticky="w", padx=(0, 20))
+        
         # Progress indicator frame
         progress_frame = ttk.LabelFrame(main_frame, text="Operation Progress", padding="10")
         progress_frame.pack(fill=tk.X, pady=(0, 10))
@@ -937,12 +1286,18 @@ class AdvancedRobocopyGUI:
         
         ttk.Button(log_controls, text="Clear Log", command=self.clear_log).pack(side=tk.LEFT, padx=(0, 5))
         ttk.Button(log_controls, text="Save Log", command=self.save_log).pack(side=tk.LEFT, padx=(0, 5))
-        ttk.Button(log_controls, text="Refresh", command=self.refresh_log).pack(side=tk.LEFT)
+        ttk.Button(log_controls, text="Refresh", command=self.refresh_log).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(log_controls, text="Older Lines", command=self.load_older_log).pack(side=tk.LEFT)
         
-        # Log text area with enhanced formatting
+        # Log text area with enhanced formatting; only the newest lines are shown,
+        # older ones are read a page at a time
+        self.log_tail = LogTail(GUI_LOG_FILE)
+        self.log_window_limit = LOG_WINDOW_LINES
         self.log_text = scrolledtext.ScrolledText(log_frame, height=20, wrap=tk.WORD, 
                                                  font=("Consolas", 9))
         self.log_text.pack(fill=tk.BOTH, expand=True)
+        self.log_text.bind("<MouseWheel>", self.on_log_scroll, add="+")
+        self.log_text.bind("<Button-4>", self.on_log_scroll, add="+")
         
         # Configure log text tags for colored output
         self.log_text.tag_configure("error", foreground="red", font=("Consolas", 9, "bold"))
@@ -950,8 +1305,8 @@ class AdvancedRobocopyGUI:
         self.log_text.tag_configure("info", foreground="blue")
         self.log_text.tag_configure("success", foreground="green", font=("Consolas", 9, "bold"))
         
-        # Command history
-        history_frame = ttk.LabelFrame(main_frame, text="Command History", padding="10")
+        # Run history
+        history_frame = ttk.LabelFrame(main_frame, text="Run History", padding="10")
         history_frame.pack(fill=tk.X)
         
         self.history_listbox = tk.Listbox(history_frame, height=5, font=("Consolas", 9))
@@ -961,7 +1316,12 @@ class AdvancedRobocopyGUI:
         history_controls.pack(fill=tk.X)
         
         ttk.Button(history_controls, text="Load Selected", command=self.load_from_history).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(history_controls, text="Open Run Log", command=self.show_run_log).pack(side=tk.LEFT, padx=(0, 5))
         ttk.Button(history_controls, text="Clear History", command=self.clear_history).pack(side=tk.LEFT)
+        ttk.Button(history_controls, text="Older ▶", command=self.show_older_history).pack(side=tk.RIGHT)
+        ttk.Button(history_controls, text="◀ Newer", command=self.show_newer_history).pack(side=tk.RIGHT, padx=(0, 5))
+        self.history_page_label = ttk.Label(history_controls, text="")
+        self.history_page_label.pack(side=tk.RIGHT, padx=(0, 10))
     
     def create_status_bar(self):
         """Create status bar at bottom of window"""
@@ -1025,6 +1385,7 @@ class AdvancedRobocopyGUI:
                         speed_bps = bytes_copied / elapsed
                         speed_mbps = speed_bps / (1024 * 1024)
                         self.performance_stats['speed_mbps'] = speed_mbps
+                        self.track_peak_speed(bytes_copied)
                         if hasattr(self, 'copy_speed_label'):
                             self.copy_speed_label.config(text=f"Speed: {speed_mbps:.1f} MB/s")
                 
@@ -1039,6 +1400,15 @@ class AdvancedRobocopyGUI:
                 if hasattr(self, 'operation_status_label'):
                     self.operation_status_label.config(text="Status: Operation in progress...")
                 
+                # Show the job's effective CPU and I/O usage
+                self.update_job_usage()
+                
+                # Pause the job before the destination runs out of space
+                self.check_destination_space()
+                
+                # Keep the job checkpoint current
+                self.save_checkpoint()
+                
                 # Schedule faster updates during operation
                 self.root.after(500, self.update_performance_stats)
             else:
@@ -1052,6 +1422,18 @@ class AdvancedRobocopyGUI:
             # Schedule next update
             self.root.after(1000, self.update_performance_stats)
     
+    def track_peak_speed(self, bytes_copied):
+        """Keep the highest speed of the run measured over PEAK_SPEED_WINDOW seconds"""
+        now = time.time()
+        if self.peak_sample is None or bytes_copied < self.peak_sample[1]:
+            self.peak_sample = (now, bytes_copied)
+            return
+        sample_time, sample_bytes = self.peak_sample
+        if now - sample_time >= PEAK_SPEED_WINDOW:
+            speed_mbps = (bytes_copied - sample_bytes) / (now - sample_time) / (1024 * 1024)
+            self.performance_stats['peak_mbps'] = max(self.performance_stats.get('peak_mbps', 0.0), speed_mbps)
+            self.peak_sample = (now, bytes_copied)
+    
     def create_additional_options(self, parent):
         """Create additional option controls"""
         additional_frame = ttk.LabelFrame(parent, text="Additional Options")
@@ -1092,7 +1474,7 @@ class AdvancedRobocopyGUI:
         directory = filedialog.askdirectory(title="Select Source Directory")
         if directory:
             self.source_path.set(directory)
-            self.generate_command()
+            self.on_source_change()
     
     def browse_dest(self):
         """Browse for destination directory"""
@@ -1231,6 +1613,13 @@ Administrator privileges allow copying NTFS security permissions and accessing p
         if threads_val and threads_val.isdigit() and int(threads_val) > 1:
             cmd.append(f"/MT:{threads_val}")
         
+        # Bandwidth cap as an inter-packet gap (the gap is re-tuned when the job runs)
+        bandwidth_cap = self.get_bandwidth_cap()
+        if bandwidth_cap > 0:
+            controller = self.get_ipg_controller(self.source_path.get(), self.dest_path.get())
+            if controller:
+                cmd.append(f"/IPG:{controller.ipg_for(bandwidth_cap)}")
+        
         # Logging options
         if hasattr(self, 'verbose') and self.verbose.get():
             cmd.append("/V")
@@ -1239,7 +1628,7 @@ Administrator privileges allow copying NTFS security permissions and accessing p
             cmd.append("/L")
         
         if hasattr(self, 'create_log') and self.create_log.get():
-            cmd.extend(["/LOG+:robocopy_operation.log"])
+            cmd.extend([f"/LOG+:{job_log_path(self.source_path.get(), self.dest_path.get())}"])
         
         # Always add these for better output (unless show_progress is disabled)
         cmd.append("/TEE")
@@ -1253,19 +1642,16 @@ Administrator privileges allow copying NTFS security permissions and accessing p
         command_str = " ".join(cmd)
         self.command_display.config(text=command_str, foreground="blue")
         
-        # Add to history with timestamp
-        if hasattr(self, 'history_listbox'):
-            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-            history_entry = f"[{timestamp}] {command_str}"
-            self.history_listbox.insert(0, history_entry)
-            if self.history_listbox.size() > 20:  # Keep only last 20 commands
-                self.history_listbox.delete(20, tk.END)
-            
-            # Also save to history file
-            self.save_command_history(history_entry)
-        
         self.logger.info(f"Generated command: {command_str}")
-        self.update_status("Command generated successfully")
+        _, _, errors = self.option_rules.evaluate({
+            "source_path": self.source_path.get(), "dest_path": self.dest_path.get(),
+            "mirror_mode": self.mirror_mode.get(), "copy_subdirs": self.copy_subdirs.get(),
+            "copy_empty_subdirs": self.copy_empty_subdirs.get(), "retries": self.retries.get(),
+            "wait_time": self.wait_time.get(), "threads": self.threads.get()})
+        if errors:
+            self.update_status(f"⚠ {errors[0]}")
+        else:
+            self.update_status("Command generated successfully")
         
         # Store command for execution
         self.current_command = command_str
@@ -1285,69 +1671,51 @@ Administrator privileges allow copying NTFS security permissions and accessing p
         # Schedule next keep-alive check every 50ms
         self.root.after(50, self.keepalive_gui)
     
-    def execute_command(self):
-        """Execute the generated ROBOCOPY command with validation"""
+    def execute_command(self, resume=False, unattended=False, on_result=None):
+        """
+        Execute the generated ROBOCOPY command with validation
+        
+        The destination's free space is checked in the background first, so
+        the job may start after this returns.
+        
+        Args:
+            resume (bool): Continue the interrupted run recorded in the job checkpoint
+            unattended (bool): Started by the scheduler; nobody is asked about a free-space shortfall
+            on_result (callable): Called with True once the job started, or False if it was not started
+        """
+        report = on_result or (lambda started: None)
         command = getattr(self, 'current_command', '')
         if not command or "Please select" in command:
             messagebox.showerror("Error", "Please generate a valid command first.")
+            report(False)
             return
         
         if self.current_process and self.current_process.poll() is None:
             messagebox.showwarning("Warning", "A command is already running. Please stop it first.")
+            report(False)
             return
         
-        # Validate command parameters - updated for colon syntax
-        if "/W:" in command:
-            # Check if /W: parameter has a valid value
-            parts = command.split()
-            w_param = None
-            for part in parts:
-                if part.startswith("/W:"):
-                    w_param = part[3:]  # Extract value after /W:
-                    break
-            
-            if w_param is None:
-                messagebox.showerror("Error", "Invalid /W parameter: missing wait time value")
-                return
-            
-            if not w_param.isdigit() or int(w_param) <= 0:
-                messagebox.showerror("Error", f"Invalid /W parameter: '{w_param}' is not a valid wait time")
-                return
-        
-        # Similar validation for /R parameter
-        if "/R:" in command:
-            parts = command.split()
-            r_param = None
-            for part in parts:
-                if part.startswith("/R:"):
-                    r_param = part[3:]  # Extract value after /R:
-                    break
-            
-            if r_param is None:
-                messagebox.showerror("Error", "Invalid /R parameter: missing retry count value")
-                return
-            
-            if not r_param.isdigit():
-                messagebox.showerror("Error", f"Invalid /R parameter: '{r_param}' is not a valid retry count")
-                return
+        if self.stop_controller and self.stop_controller.active:
+            messagebox.showwarning("Warning", "The previous command is still stopping. Please try again shortly.")
+            report(False)
+            return
         
-        # Similar validation for /MT parameter
-        if "/MT:" in command:
-            parts = command.split()
-            mt_param = None
-            for part in parts:
-                if part.startswith("/MT:"):
-                    mt_param = part[4:]  # Extract value after /MT:
-                    break
-            
-            if mt_param is None:
-                messagebox.showerror("Error", "Invalid /MT parameter: missing thread count value")
-                return
-            
-            if not mt_param.isdigit() or int(mt_param) <= 0:
-                messagebox.showerror("Error", f"Invalid /MT parameter: '{mt_param}' is not a valid thread count")
-                return
+        # Validate the numeric switches of the command (/R:, /W:, /MT:)
+        valid, _, errors = self.switch_rules.evaluate(command_fields(parse_command(command)))
+        if not valid:
+            messagebox.showerror("Error", "Invalid command parameters:\n\n" + "\n".join(errors))
+            report(False)
+            return
         
+        def start():
+            self.start_operation(command, resume=resume)
+            report(self.operation_in_progress)
+        self.confirm_destination_space(command, start, unattended=unattended, on_declined=lambda: report(False))
+    
+    def start_operation(self, command, retry_batches=None, plan_actions=None, watch_targets=None,
+                        verify_files=None, resume=False):
+        """Reset the output and progress display and start a command, a retry run, a copy plan, a watch sync
+        or the verification of a finished copy"""
         # Clear any previous process state
         if self.current_process:
             try:
@@ -1358,10 +1726,25 @@ Administrator privileges allow copying NTFS security permissions and accessing p
                 pass
         self.current_process = None
         self.operation_in_progress = False
-        
-        # Clear output
-        self.output_text.delete(1.0, tk.END)
-        self.output_text.insert(tk.END, f"Executing: {command}\n\n", "command")
+        self.stop_requested = False
+        
+        # Clear output (verification continues below the output of its copy)
+        if verify_files is None:
+            self.output_text.delete(1.0, tk.END)
+        if verify_files is not None:
+            self.output_text.insert(tk.END, f"\nVerifying {len(verify_files):,} copied files of: {command}\n\n",
+                                    "command")
+        elif retry_batches:
+            self.output_text.insert(tk.END, f"Retrying failed files of: {command}\n"
+                                            f"({len(retry_batches)} batches)\n\n", "command")
+        elif plan_actions is not None:
+            self.output_text.insert(tk.END, f"Executing copy plan ({len(plan_actions):,} actions) of: "
+                                            f"{command}\n\n", "command")
+        elif watch_targets:
+            self.output_text.insert(tk.END, f"Syncing {len(watch_targets):,} changed directories of: "
+                                            f"{command}\n\n", "command")
+        else:
+            self.output_text.insert(tk.END, f"Executing: {command}\n\n", "command")
         
         # Start progress bar (check if Basic Settings progress bar exists)
         if hasattr(self, 'progress'):
@@ -1377,15 +1760,26 @@ Administrator privileges allow copying NTFS security permissions and accessing p
         
         self.logger.info("Starting new operation - old state cleared")
         
-        # Execute command in thread
-        threading.Thread(target=self.run_command, args=(command,), daemon=True).start()
+        # Hand the command to the job supervisor
+        self.run_command(command, retry_batches, plan_actions, watch_targets, verify_files, resume)
         self.update_status("Command execution started")
         
-        # Force GUI update after starting thread
+        # Force GUI update after starting the job
         self.root.update_idletasks()
     
-    def run_command(self, command):
-        """Enhanced command execution with performance tracking"""
+    def run_command(self, command, retry_batches=None, plan_actions=None, watch_targets=None, verify_files=None,
+                    resume=False):
+        """
+        Submit a command to the job supervisor with performance tracking
+        
+        Args:
+            command (str): Command to run; for a retry run, the command that failed
+            retry_batches (list): (command, paths) batches from build_retry_batches
+            plan_actions (list): Actions of a stored copy plan to execute
+            watch_targets (list): Changed (directory, recursive) tuples to sync in watch mode
+            verify_files (list): (relative path, size) tuples of copied files to verify
+            resume (bool): Continue the interrupted run recorded in the job checkpoint
+        """
         try:
             self.logger.info(f"Executing command: {command}")
             self.operation_in_progress = True
@@ -1400,6 +1794,41 @@ Administrator privileges allow copying NTFS security permissions and accessing p
                 'speed_mbps': 0.0,
                 'errors': 0
             }
+            self.stats_offset = {}
+            
+            # Open the job checkpoint; when resuming, carry stats and elapsed time forward
+            targeted = (bool(retry_batches) or plan_actions is not None or bool(watch_targets)
+                        or verify_files is not None)
+            self.watch_run = bool(watch_targets)
+            self.verify_run = verify_files is not None
+            resume = resume and not targeted
+            self.failure_collector = FailureCollector()
+            self.retry_paths = [path for _, paths in retry_batches or [] for path in paths]
+            options = parse_command(command)
+            if options["log_file"] and not self.verify_run:
+                try:
+                    self.log_manager.prepare(command, options["log_file"], options["log_append"])
+                except Exception as e:
+                    self.logger.warning(f"Could not prepare the job log {options['log_file']}: {e}")
+            self.plan_builder = PlanBuilder(command) if options["list_only"] else None
+            verify = (hasattr(self, 'verify_copy') and self.verify_copy.get() and not self.verify_run
+                      and not options["list_only"] and not options["move_files"])
+            self.verify_builder = PlanBuilder(command) if verify else None
+            writes = not options["list_only"] and not self.verify_run
+            self.space_forecaster = SpaceForecaster() if writes else None
+            self.space_dest = options["dest_path"]
+            self.space_probe = None
+            self.space_sampled = 0.0
+            self.space_paused = self.space_warned = False
+            # Retry, plan and watch runs do not walk the tree, so they leave the job checkpoint alone
+            self.checkpoint = None if targeted else self.open_checkpoint(command)
+            if resume and self.checkpoint and self.checkpoint.is_resumable():
+                self.performance_stats.update(self.checkpoint.get("stats") or {})
+                self.operation_start_time = time.time() - self.checkpoint.get("elapsed", 0.0)
+                self.output_queue.put(('info', f"Resuming interrupted job (run {self.checkpoint.get('runs', 0) + 1})"))
+            else:
+                resume = False
+            self.start_history_run(command, options, retry_batches, plan_actions, watch_targets, verify_files)
             
             self.logger.info(f"Performance tracking initialized at {self.operation_start_time}")
             
@@ -1434,26 +1863,99 @@ Administrator privileges allow copying NTFS security permissions and accessing p
             
             self.logger.debug("All performance labels reset")
             
-            # Use shell=True for Windows compatibility
-            self.current_process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                shell=True,
-                bufsize=1,
-                universal_newlines=True
-            )
-            
-            self.logger.info(f"Process started with PID: {self.current_process.pid}")
-            
-            # Start output reading thread
-            threading.Thread(target=self.read_output, daemon=True).start()
+            # Start the command with the selected engine (robocopy.exe or the built-in Python engine)
+            bandwidth_cap = self.get_bandwidth_cap()
+            engine = get_engine(self.copy_engine.get() if hasattr(self, 'copy_engine') else "auto",
+                                incremental=hasattr(self, 'incremental') and self.incremental.get()
+                                and not targeted,
+                                dedup=hasattr(self, 'dedup') and self.dedup.get(),
+                                checkpoint=self.checkpoint, resume=resume, bandwidth_cap=bandwidth_cap)
+            ipg = None
+            self.batched_run = False
+            if targeted:
+                # Batches keep the switches (and /IPG) of the command they come from
+                self.job_context = {'command': command, 'engine': engine.name,
+                                    'bandwidth_cap': bandwidth_cap, 'ipg': None}
+                if retry_batches:
+                    self.performance_stats['total_files'] = len(self.retry_paths)
+                    jobs = [(batch, engine) for batch, _ in retry_batches]
+                    name = "retry"
+                elif watch_targets:
+                    jobs = [(batch, engine) for batch in watch_commands(command, watch_targets)]
+                    name = "watch"
+                elif verify_files is not None:
+                    self.performance_stats['total_files'] = len(verify_files)
+                    jobs = [(command, VerifyEngine(verify_files, self.get_verify_threads()))]
+                    name = "verify"
+                else:
+                    jobs = self.plan_jobs(command, plan_actions, engine)
+                    name = "plan"
+                self.batched_run = len(jobs) > 1
+                self.current_process = self.supervisor.submit_group(jobs, name=name)
+                self.current_job_ids = set(self.current_process.job_ids)
+                self.pending_job_ids = set(self.current_job_ids)
+                self.logger.info(f"{len(jobs)} jobs submitted for the {name} run (engine: {engine.name})")
+                return
+            if bandwidth_cap > 0 and engine.name == "robocopy":
+                command, ipg = self.apply_ipg(command, bandwidth_cap)
+            if self.checkpoint:
+                self.checkpoint.begin(command, engine.name, resume=resume)
+            if resume and engine.name == "robocopy":
+                # robocopy.exe re-checks the whole tree and reports only this run in its summary
+                self.stats_offset = {'files_copied': self.performance_stats.get('files_copied', 0)}
+            self.job_context = {'command': command, 'engine': engine.name,
+                                'bandwidth_cap': bandwidth_cap, 'ipg': ipg}
+            self.current_process = self.supervisor.submit(command, engine)
+            self.current_job_ids = {self.current_process.job_id}
+            self.pending_job_ids = set(self.current_job_ids)
+            self.logger.info(f"Job {self.current_process.job_id} submitted (engine: {engine.name})")
+        except Exception as e:
+            error_msg = f"\n❌ Error executing command: {str(e)}\n"
+            self.output_queue.put(('error', error_msg))
+            self.logger.error(f"Error executing command: {str(e)}")
+            self.finish_history_run(None, STATUS_FAILED)
+            self.finish_checkpoint(STATUS_FAILED)
+            self.end_operation()
+    
+    def handle_job_event(self, job_id, kind, payload):
+        """Handle a supervisor event on the Tk thread; returns an output line to display, if any"""
+        if job_id not in self.current_job_ids:
+            # Late events of a job that was already stopped and finalized
+            return None
+        if kind == EVENT_LINE:
+            if self.failure_collector is not None:
+                self.failure_collector.feed(payload)
+            if self.plan_builder is not None:
+                self.plan_builder.feed(payload)
+            if self.verify_builder is not None:
+                self.verify_builder.feed(payload)
+            return payload
+        if kind == EVENT_STARTED:
+            self.logger.info(f"Process started with PID: {payload} (engine: {self.job_context.get('engine')})")
+            if self.current_process is not None:
+                if len(self.current_job_ids) == 1:
+                    self.usage_monitor = UsageMonitor(self.current_process)
+                self.apply_job_priority(job_start=True)
+        elif kind == EVENT_FINISHED:
+            # A retry run finishes once the finished events of all its batches were handled
+            self.pending_job_ids.discard(job_id)
+            if not self.pending_job_ids:
+                process = self.current_process
+                self.on_job_finished(process.poll() if process is not None else payload)
+        return None
+    
+    def on_job_finished(self, return_code):
+        """Report the outcome of a finished job (runs after all of its output was displayed)"""
+        try:
+            if self.stop_requested:
+                # The stop state machine finalizes the stats
+                return
             
-            # Start checking output queue
-            self.check_output_queue()
+            self.finish_history_run(return_code)
             
-            return_code = self.current_process.wait()
+            if self.verify_run:
+                self.finish_verification(return_code)
+                return
             
             # ROBOCOPY Return Codes:
             # 0 = No files copied. No failure was encountered.
@@ -1502,31 +2004,51 @@ Administrator privileges allow copying NTFS security permissions and accessing p
                     self.output_queue.put(('warning', f"\n⚠️ Operation completed with warnings! Return code: {return_code}\n"))
                     self.logger.warning(f"Operation completed with warnings - return code: {return_code}")
             
-            # Display Operation Summary after completion
-            self.show_operation_summary(return_code)
-                    
+            # Keep the failed paths for Tools → Retry Failed Files
+            self.record_failures(complete=return_code < 16)
+            if return_code < 16:
+                self.record_plan()
+            
+            # Record the outcome in the checkpoint; unfinished jobs stay resumable
+            if return_code < 8:
+                self.finish_checkpoint(STATUS_COMPLETED)
+            else:
+                self.finish_checkpoint(STATUS_FAILED)
+            
+            # Re-tune the robocopy inter-packet gap from this run's speed
+            context = self.job_context
+            if context.get('ipg') is not None and return_code < 8:
+                self.record_ipg_sample(context['command'], context['bandwidth_cap'], context['ipg'])
+            
+            # Display Operation Summary after completion; watch syncs only report to the output
+            if self.watch_run:
+                self.output_queue.put(('info', f"👁 Synced {self.performance_stats.get('files_copied', 0):,} files "
+                                               f"({self.format_bytes(self.performance_stats.get('bytes_copied', 0))}) "
+                                               f"- watching for further changes"))
+            else:
+                self.show_operation_summary(return_code)
+            
+            # Compare the copied files with their sources once this operation has ended
+            if return_code < 16:
+                self.schedule_verification()
         except Exception as e:
-            error_msg = f"\n❌ Error executing command: {str(e)}\n"
-            self.output_queue.put(('error', error_msg))
-            self.logger.error(f"Error executing command: {str(e)}")
+            self.logger.error(f"Error finishing job: {str(e)}")
         finally:
-            self.output_queue.put(('control', 'STOP_PROGRESS'))
-            self.operation_in_progress = False  # Mark operation as complete
-            self.current_process = None  # Clear process reference
-            self.operation_start_time = None  # Clear start time
-            self.logger.info("Operation completed, flags cleared and process reference removed")
-    
-    def read_output(self):
-        """Read output from subprocess in a separate thread"""
-        try:
-            if self.current_process and self.current_process.stdout:
-                for line in iter(self.current_process.stdout.readline, ''):
-                    if line:
-                        clean_line = line.rstrip('\n\r')
-                        self.output_queue.put(clean_line)
-                self.current_process.stdout.close()
-        except Exception as e:
-            logging.error(f"Error reading output: {e}")
+            self.end_operation()
+    
+    def end_operation(self):
+        """Clear the running-operation state"""
+        self.output_queue.put(('control', 'STOP_PROGRESS'))
+        self.operation_in_progress = False  # Mark operation as complete
+        self.current_process = None  # Clear process reference
+        self.usage_monitor = None
+        self.space_forecaster = None
+        if self.space_probe is not None:
+            self.space_probe.cancel()
+            self.space_probe = None
+        if not self.stop_requested:
+            self.operation_start_time = None  # Clear start time (a stop clears it when finalized)
+        self.logger.info("Operation completed, flags cleared and process reference removed")
     
     def format_output_line(self, line):
         """Format output line with appropriate styling markers and error detection"""
@@ -1682,7 +2204,8 @@ Administrator privileges allow copying NTFS security permissions and accessing p
                     file_size = int(size_match.group(1))
                     self.performance_stats['bytes_copied'] += file_size
                     self.performance_stats['files_copied'] += 1
-                    self.logger.debug(f"Parsed file copy: {file_size} bytes, total files: {self.performance_stats['files_copied']}, total bytes: {self.performance_stats['bytes_copied']}")
+                    self.line_debug.log("file", "Parsed file copy: %d bytes, total files: %d, total bytes: %d", file_size,
+                                        self.performance_stats['files_copied'], self.performance_stats['bytes_copied'])
                     
                     # Update main progress if we have total files count
                     if self.performance_stats.get('total_files', 0) > 0:
@@ -1711,16 +2234,20 @@ Administrator privileges allow copying NTFS security permissions and accessing p
             # Format: "  New Dir          3    C:\path\to\dir\"
             elif "New Dir" in line:
                 self.performance_stats['dirs_copied'] += 1
-                self.logger.debug(f"Parsed directory creation, total dirs: {self.performance_stats['dirs_copied']}")
+                self.line_debug.log("dir", "Parsed directory creation, total dirs: %d", self.performance_stats['dirs_copied'])
                 return
             
             # Parse files summary from final report
             # Format: "   Files :         8         8         0         0         0         0"
+            elif self.batched_run and line.strip().startswith(("Files :", "Bytes :")):
+                # Each batch prints its own summary; the totals come from the file lines
+                return
+            
             elif line.strip().startswith("Files :"):
                 numbers = re.findall(r'\d+', line)
                 if len(numbers) >= 2:
                     total_files = int(numbers[0])  # First number is total files
-                    copied_files = int(numbers[1])  # Second number is copied files
+                    copied_files = int(numbers[1]) + self.stats_offset.get('files_copied', 0)  # Second number is copied files
                     self.performance_stats['total_files'] = total_files
                     # Update files copied from summary (more accurate than counting)
                     self.performance_stats['files_copied'] = copied_files
@@ -1772,6 +2299,22 @@ Administrator privileges allow copying NTFS security permissions and accessing p
                     self.logger.info(f"Parsed speed: {self.performance_stats['speed_mbps']:.2f} MB/s ({speed_mb_per_min} MB/min)")
                     return
             
+            # Parse dedup savings of the Python engine
+            # Format: "   Dedup : 3 files linked, 31457280 bytes avoided, 0:00:02 saved"
+            elif line.strip().startswith("Dedup :"):
+                dedup_match = re.search(r'Dedup :\s+(\d+) files linked, (\d+) bytes avoided, (\S+) saved', line)
+                if dedup_match:
+                    # Batched runs print one summary per batch
+                    stats = self.performance_stats
+                    stats['dedup_files'] = stats.get('dedup_files', 0) + int(dedup_match.group(1))
+                    stats['dedup_bytes'] = stats.get('dedup_bytes', 0) + int(dedup_match.group(2))
+                    saved = dedup_match.group(3)
+                    if saved != "unknown":
+                        hours, minutes, seconds = (int(part) for part in saved.split(":"))
+                        stats['dedup_seconds'] = stats.get('dedup_seconds', 0) + hours * 3600 + minutes * 60 + seconds
+                    self.logger.info(f"Parsed dedup summary: {dedup_match.group(1)} files linked")
+                    return
+            
             # Calculate progress percentage if we have total files
             if (self.performance_stats['total_files'] > 0 and 
                 self.performance_stats['files_copied'] > 0):
@@ -1794,7 +2337,7 @@ Administrator privileges allow copying NTFS security permissions and accessing p
                     else:
                         self.progress_label.config(text=f"Processing: {progress:.1f}% ({files_copied}/{total_files} files)")
                 
-                self.logger.debug(f"Progress updated immediately: {progress:.1f}%")
+                self.line_debug.log("progress", "Progress updated immediately: %.1f%%", progress)
         
         except Exception as e:
             logging.error(f"Error parsing ROBOCOPY output line '{line}': {e}")
@@ -1837,14 +2380,21 @@ Administrator privileges allow copying NTFS security permissions and accessing p
                 item = self.output_queue.get_nowait()
                 processed_lines += 1
                 
+                # Supervisor events are (job_id, kind, payload) tuples
+                if isinstance(item, tuple) and len(item) == 3:
+                    line = self.handle_job_event(*item)
+                    if line is None:
+                        continue
                 # Handle both tuple (msg_type, text) and plain string messages
-                if isinstance(item, tuple) and len(item) == 2:
+                elif isinstance(item, tuple) and len(item) == 2:
                     msg_type, line = item
                     # Handle control messages
                     if msg_type == 'control':
                         if line == 'STOP_PROGRESS':
                             # Progress stopped - handled elsewhere
                             pass
+                        elif line == STOP_FINALIZED_MESSAGE:
+                            self.finalize_stop()
                         continue
                 else:
                     # Plain string message (legacy format)
@@ -1882,85 +2432,74 @@ Administrator privileges allow copying NTFS security permissions and accessing p
                 # Debug: Log current stats (reduce logging frequency)
                 if hasattr(self, 'performance_stats') and processed_lines >= max_lines_per_update:
                     stats = self.performance_stats
-                    self.logger.debug(f"Performance update - Files: {stats.get('files_copied', 0)}/{stats.get('total_files', 0)}, "
-                                    f"Bytes: {stats.get('bytes_copied', 0)}, Speed: {stats.get('speed_mbps', 0):.1f}")
+                    self.line_debug.log("performance", "Performance update - Files: %d/%d, Bytes: %d, Speed: %.1f",
+                                        stats.get('files_copied', 0), stats.get('total_files', 0),
+                                        stats.get('bytes_copied', 0), stats.get('speed_mbps', 0))
         
         except queue.Empty:
             pass
         except Exception as e:
             logging.error(f"Error processing output queue: {e}")
         
-        # Schedule next check - faster polling for better responsiveness
-        if hasattr(self, 'current_process') and self.current_process:
-            self.root.after(100, self.check_output_queue)  # Check every 100ms instead of 500ms
+        # Schedule next check - keep polling so output left after the process exits is shown too
+        self.root.after(100, self.check_output_queue)
 
     def stop_command(self):
-        """Stop the currently running command"""
-        # Check if operation is in progress or process exists
-        if self.operation_in_progress or (self.current_process and self.current_process.poll() is None):
-            try:
-                # Wait a moment for process to initialize if operation just started
-                if self.operation_in_progress and not self.current_process:
-                    self.logger.info("Operation starting, waiting for process initialization...")
-                    import time
-                    for _ in range(10):  # Wait up to 1 second
-                        time.sleep(0.1)
-                        if self.current_process:
-                            break
-                
-                # Now check if we have a process to stop
-                if self.current_process:
-                    poll_result = self.current_process.poll()
-                    if poll_result is None:
-                        # Process is running - terminate it
-                        self.logger.info("Attempting to stop running command...")
-                        self.current_process.terminate()
-                        
-                        # Give process time to terminate gracefully
-                        try:
-                            self.current_process.wait(timeout=3)
-                        except:
-                            # Force kill if it doesn't terminate gracefully
-                            self.logger.warning("Process did not terminate gracefully, forcing kill...")
-                            self.current_process.kill()
-                        
-                        self.output_text.insert(tk.END, "\n🛑 Command stopped by user\n")
-                        if hasattr(self, 'auto_scroll_var') and self.auto_scroll_var.get():
-                            self.output_text.see(tk.END)
-                        
-                        # Reset progress
-                        if hasattr(self, 'progress'):
-                            self.progress.stop()
-                            self.progress.config(mode='determinate', value=0)
-                        
-                        if hasattr(self, 'progress_label'):
-                            self.progress_label.config(text="Operation stopped by user")
-                        
-                        # Stop the output queue checking and mark operation as complete
-                        self.current_process = None
-                        self.operation_in_progress = False
-                        
-                        self.logger.info("Command stopped by user")
-                        self.update_status("Operation stopped")
-                        messagebox.showinfo("Stopped", "Operation stopped successfully")
-                    else:
-                        # Process already finished
-                        self.operation_in_progress = False
-                        self.logger.info("Process has already finished")
-                        messagebox.showinfo("Info", "Command has already completed.")
-                else:
-                    # Operation flag set but no process created yet
-                    self.operation_in_progress = False
-                    self.logger.warning("Operation flag was set but no process was created")
-                    messagebox.showinfo("Info", "Operation was starting but could not be stopped.")
-                    
-            except Exception as e:
-                self.operation_in_progress = False
-                self.logger.error(f"Error stopping command: {str(e)}")
-                messagebox.showerror("Error", f"Error stopping command: {str(e)}")
-        else:
+        """Stop the currently running command without blocking the GUI (see robocopy_stop)"""
+        if self.stop_controller and self.stop_controller.active:
+            self.update_status("Stop already in progress...")
+            return
+        if not (self.operation_in_progress or (self.current_process and self.current_process.poll() is None)):
             messagebox.showinfo("Info", "No command is currently running.")
             self.logger.info("Stop button clicked but no process is running")
+            return
+        
+        self.logger.info("Attempting to stop running command...")
+        self.stop_requested = True
+        self.stop_controller = StopController(lambda: self.current_process, self.output_queue,
+                                              self.is_output_drained, kill=kill_process)
+        self.stop_controller.request()
+        if hasattr(self, 'progress_label'):
+            self.progress_label.config(text="Stopping operation...")
+        self.update_status("Stopping operation...")
+        self.step_stop()
+    
+    def step_stop(self):
+        """Advance the stop state machine from the Tk loop"""
+        try:
+            if self.stop_controller and self.stop_controller.step():
+                self.root.after(100, self.step_stop)
+        except Exception as e:
+            self.logger.error(f"Error stopping command: {str(e)}")
+    
+    def is_output_drained(self):
+        """Check whether the stopped job's output, up to its finished event, was processed"""
+        return not self.operation_in_progress
+    
+    def finalize_stop(self):
+        """Last stop step: all output has been parsed, so record the final stats"""
+        self.update_performance_display()
+        self.finish_history_run(None, STATUS_STOPPED)
+        # Keep the checkpoint so the job can be resumed
+        self.finish_checkpoint(STATUS_STOPPED)
+        self.record_failures(complete=False)
+        self.plan_builder = None  # An interrupted listing is not a complete plan
+        self.verify_builder = None
+        self.operation_start_time = None
+        
+        self.output_text.insert(tk.END, "\n🛑 Command stopped\n")
+        if hasattr(self, 'auto_scroll_var') and self.auto_scroll_var.get():
+            self.output_text.see(tk.END)
+        
+        # Reset progress
+        if hasattr(self, 'progress'):
+            self.progress.stop()
+            self.progress.config(mode='determinate', value=0)
+        if hasattr(self, 'progress_label'):
+            self.progress_label.config(text="Operation stopped")
+        
+        self.logger.info("Command stopped")
+        self.update_status("Operation stopped")
     
     def save_config(self):
         """Save current configuration to file"""
@@ -1979,7 +2518,15 @@ Administrator privileges allow copying NTFS security permissions and accessing p
             "purge_dest": self.purge_dest.get(),
             "exclude_changed": self.exclude_changed.get(),
             "exclude_newer": self.exclude_newer.get(),
-            "verbose": self.verbose.get()
+            "verbose": self.verbose.get(),
+            "copy_engine": self.copy_engine.get(),
+            "incremental": self.incremental.get(),
+            "dedup": self.dedup.get(),
+            "verify_copy": self.verify_copy.get(),
+            "verify_threads": self.verify_threads.get(),
+            "bandwidth_cap": self.bandwidth_cap.get(),
+            "cpu_priority": self.cpu_priority.get(),
+            "io_priority": self.io_priority.get()
         }
         
         try:
@@ -1991,13 +2538,14 @@ Administrator privileges allow copying NTFS security permissions and accessing p
             messagebox.showerror("Error", f"Failed to save configuration: {str(e)}")
             self.logger.error(f"Failed to save configuration: {str(e)}")
     
-    def load_config(self):
-        """Load configuration from file"""
-        if not os.path.exists(self.config_file):
+    def load_config(self, config_file=None):
+        """Load configuration from file (the current configuration file by default)"""
+        config_file = config_file or self.config_file
+        if not os.path.exists(config_file):
             return
         
         try:
-            with open(self.config_file, 'r') as f:
+            with open(config_file, 'r') as f:
                 config = json.load(f)
             
             self.source_path.set(config.get("source_path", ""))
@@ -2015,6 +2563,15 @@ Administrator privileges allow copying NTFS security permissions and accessing p
             self.exclude_changed.set(config.get("exclude_changed", False))
             self.exclude_newer.set(config.get("exclude_newer", False))
             self.verbose.set(config.get("verbose", True))
+            self.copy_engine.set(config.get("copy_engine", "auto"))
+            self.incremental.set(config.get("incremental", False))
+            self.dedup.set(config.get("dedup", False))
+            self.verify_copy.set(config.get("verify_copy", False))
+            self.verify_threads.set(config.get("verify_threads", str(DEFAULT_VERIFY_CONCURRENCY)))
+            self.bandwidth_cap.set(config.get("bandwidth_cap", "0"))
+            self.cpu_priority.set(config.get("cpu_priority", "normal"))
+            self.io_priority.set(config.get("io_priority", "normal"))
+            self.on_source_change()
             
             self.logger.info("Configuration loaded")
         except Exception as e:
@@ -2077,38 +2634,929 @@ Administrator privileges allow copying NTFS security permissions and accessing p
         """Switch to logs tab"""
         self.notebook.select(3)  # Select logs tab
     
+    def scheduler_tick(self):
+        """Carry out due scheduler actions; runs on the Tk loop and never waits for a job"""
+        try:
+            # A job waiting for its free-space check is about to start
+            running = (self.operation_in_progress or self.space_check is not None
+                       or (self.current_process is not None and self.current_process.poll() is None))
+            if self.scheduler.active and not running and not self.scheduler.suspended:
+                self.scheduler.job_finished()
+            for action, job in self.scheduler.tick(busy=running):
+                if action == ACTION_START:
+                    self.run_scheduled_job(job)
+                elif action == ACTION_SUSPEND:
+                    self.suspend_scheduled_job(job)
+                elif action == ACTION_RESUME:
+                    self.resume_scheduled_job(job)
+        except Exception as e:
+            self.logger.error(f"Scheduler error: {e}")
+        self.root.after(SCHEDULER_INTERVAL_MS, self.scheduler_tick)
+    
+    def toggle_watch(self):
+        """Start or stop watching the source for changes (Tools → Watch Source for Changes)"""
+        if self.watch is not None:
+            self.watch.stop()
+            self.watch = None
+        if not self.watch_enabled.get():
+            self.update_status("Watch mode stopped")
+            self.logger.info("Watch mode stopped")
+            return
+        
+        self.generate_command()
+        command = getattr(self, 'current_command', '')
+        if not command or "Please select" in command or not os.path.isdir(self.source_path.get()):
+            messagebox.showerror("Error", "Please select an existing source and a destination first.")
+            self.watch_enabled.set(False)
+            return
+        try:
+            self.watch = SyncWatcher(command)
+            self.watch.start()
+        except Exception as e:
+            self.logger.error(f"Failed to start watch mode: {e}")
+            messagebox.showerror("Error", f"Could not watch the source:\n{e}")
+            self.watch = None
+            self.watch_enabled.set(False)
+            return
+        
+        self.output_queue.put(('info', f"\n👁 Watching {self.watch.source} for changes ({self.watch.backend}); "
+                                       f"changed directories are synced to {self.watch.dest}. "
+                                       f"Run a full copy first if the destination is not in sync yet.\n"))
+        self.update_status(f"Watching source for changes ({self.watch.backend})")
+        self.logger.info(f"Watch mode started ({self.watch.backend}) for: {command}")
+        self.root.after(WATCH_INTERVAL_MS, self.watch_tick)
+    
+    def watch_tick(self):
+        """Dispatch the changed directories once their debounce window has passed"""
+        watch = self.watch
+        if watch is None:
+            return
+        try:
+            if not watch.running:
+                self.logger.error("Watcher stopped unexpectedly, leaving watch mode")
+                self.update_status("Watch mode stopped: the watcher failed (see log)")
+                self.watch = None
+                self.watch_enabled.set(False)
+                return
+            # Changes keep accumulating while a job runs, then go out together
+            busy = (self.operation_in_progress or self.space_check is not None
+                    or (self.stop_controller and self.stop_controller.active))
+            if not busy:
+                targets = watch.due()
+                if targets and not watch_commands(watch.command, targets):
+                    # Nothing to run: starting would wait for jobs that never finish
+                    self.logger.debug(f"Watch mode: {len(targets)} changed directories are not copied by the job")
+                elif targets:
+                    self.logger.info(f"Watch mode: syncing {len(targets)} changed directories")
+                    self.start_operation(watch.command, watch_targets=targets)
+        except Exception as e:
+            self.logger.error(f"Watch mode error: {e}")
+        self.root.after(WATCH_INTERVAL_MS, self.watch_tick)
+    
+    def start_scheduled_config(self, job, resume=False):
+        """Load a scheduled job's configuration and execute it; scheduled_job_started gets the outcome"""
+        if not os.path.exists(job.config_file):
+            self.logger.error(f"Scheduled job '{job.name}': configuration {job.config_file} not found")
+            self.update_status(f"Scheduled job '{job.name}' skipped: configuration not found")
+            self.scheduled_job_started(job, resume, False)
+            return
+        self.load_config(job.config_file)
+        self.generate_command()
+        self.execute_command(resume=resume, unattended=True,
+                             on_result=lambda started: self.scheduled_job_started(job, resume, started))
+    
+    def scheduled_job_started(self, job, resumed, started):
+        """Track a scheduled job that started (or resumed from its checkpoint); end it if it could not start"""
+        if not started:
+            self.scheduler.job_finished()
+            return
+        if resumed:
+            self.logger.info(f"Scheduled job '{job.name}' resumed")
+            self.update_status(f"Scheduled job '{job.name}' resumed")
+        else:
+            self.update_status(f"Scheduled job '{job.name}' started")
+    
+    def run_scheduled_job(self, job):
+        """Start a scheduled job"""
+        self.logger.info(f"Starting scheduled job '{job.name}'")
+        self.scheduler.job_started(job, datetime.now())
+        self.start_scheduled_config(job)
+    
+    def suspend_scheduled_job(self, job):
+        """Suspend a scheduled job whose time window closed"""
+        process = self.current_process
+        if process is None:
+            return
+        if suspend_process(process):
+            self.output_queue.put(('warning', f"\n⏸ Scheduled job '{job.name}' suspended: outside its time window\n"))
+        else:
+            # robocopy.exe cannot be suspended without psutil: stop it and
+            # resume from the checkpoint when the window reopens
+            self.scheduled_stop = True
+            self.stop_command()
+            self.output_queue.put(('warning', f"\n⏸ Scheduled job '{job.name}' stopped: outside its time window\n"))
+        self.scheduler.job_suspended()
+        self.logger.info(f"Scheduled job '{job.name}' suspended")
+        self.update_status(f"Scheduled job '{job.name}' suspended until its window reopens")
+    
+    def resume_scheduled_job(self, job):
+        """Resume a suspended scheduled job when its time window reopens"""
+        self.scheduler.job_resumed()
+        if self.scheduled_stop:
+            # Stopped when the window closed: start again from the checkpoint
+            self.scheduled_stop = False
+            self.start_scheduled_config(job, resume=True)
+            return
+        resumed = self.current_process is not None and resume_process(self.current_process)
+        if resumed:
+            self.output_queue.put(('info', f"\n▶ Scheduled job '{job.name}' resumed\n"))
+        self.scheduled_job_started(job, True, resumed)
+    
+    def show_scheduler(self):
+        """Show the job scheduler dialog"""
+        window = tk.Toplevel(self.root)
+        window.title("Job Scheduler")
+        window.geometry("760x480")
+        
+        list_frame = ttk.LabelFrame(window, text="Scheduled Jobs", padding="10")
+        list_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 5))
+        jobs_listbox = tk.Listbox(list_frame, font=("Consolas", 9))
+        jobs_listbox.pack(fill=tk.BOTH, expand=True)
+        
+        form = ttk.LabelFrame(window, text="Job", padding="10")
+        form.pack(fill=tk.X, padx=10, pady=5)
+        form.columnconfigure(1, weight=1)
+        
+        name_var = tk.StringVar()
+        config_var = tk.StringVar(value=os.path.abspath(self.config_file))
+        cron_var = tk.StringVar()
+        windows_var = tk.StringVar()
+        enabled_var = tk.BooleanVar(value=True)
+        
+        ttk.Label(form, text="Name:").grid(row=0, column=0, sticky="w", padx=(0, 10))
+        ttk.Entry(form, textvariable=name_var).grid(row=0, column=1, sticky="ew")
+        ttk.Label(form, text="Configuration:").grid(row=1, column=0, sticky="w", padx=(0, 10))
+        ttk.Entry(form, textvariable=config_var).grid(row=1, column=1, sticky="ew")
+        ttk.Button(form, text="Browse", command=lambda: config_var.set(filedialog.askopenfilename(
+            title="Select Configuration", filetypes=[("JSON files", "*.json"), ("All files", "*.*")])
+            or config_var.get())).grid(row=1, column=2, padx=(5, 0))
+        ttk.Label(form, text="Start times (cron):").grid(row=2, column=0, sticky="w", padx=(0, 10))
+        cron_entry = ttk.Entry(form, textvariable=cron_var)
+        cron_entry.grid(row=2, column=1, sticky="ew")
+        ToolTip(cron_entry, "minute hour day month weekday, e.g. '30 22 * * mon-fri'.\nLeave empty to start once each time a window opens.")
+        ttk.Label(form, text="Allowed windows:").grid(row=3, column=0, sticky="w", padx=(0, 10))
+        windows_entry = ttk.Entry(form, textvariable=windows_var)
+        windows_entry.grid(row=3, column=1, sticky="ew")
+        ToolTip(windows_entry, "Semicolon-separated, e.g. 'Mon-Fri 22:00-06:00; Sat-Sun 00:00-24:00'.\nA running job is suspended when its window closes and resumed\nwhen it reopens. Leave empty to allow any time.")
+        ttk.Checkbutton(form, text="Enabled", variable=enabled_var).grid(row=4, column=1, sticky="w")
+        
+        def refresh():
+            jobs_listbox.delete(0, tk.END)
+            now = datetime.now()
+            for job in self.scheduler.jobs:
+                cron = str(job.cron) if job.cron else "-"
+                windows = "; ".join(str(w) for w in job.windows) or "any time"
+                state = "running" if self.scheduler.active is job else job.next_run(now)
+                jobs_listbox.insert(tk.END, f"{job.name:<20} {cron:<18} {windows:<28} {state}")
+        
+        def select(event=None):
+            selection = jobs_listbox.curselection()
+            if not selection:
+                return
+            job = self.scheduler.jobs[selection[0]]
+            name_var.set(job.name)
+            config_var.set(job.config_file)
+            cron_var.set(str(job.cron) if job.cron else "")
+            windows_var.set("; ".join(str(w) for w in job.windows))
+            enabled_var.set(job.enabled)
+        
+        def save():
+            name = name_var.get().strip()
+            if not name:
+                messagebox.showerror("Error", "Please enter a job name.", parent=window)
+                return
+            existing = self.scheduler.get(name)
+            try:
+                job = ScheduledJob(name, config_var.get().strip(), cron_var.get().strip(),
+                                   [w for w in windows_var.get().split(";") if w.strip()],
+                                   enabled_var.get(),
+                                   existing.last_run.isoformat() if existing and existing.last_run else None)
+            except ScheduleError as e:
+                messagebox.showerror("Error", str(e), parent=window)
+                return
+            self.scheduler.add(job)
+            self.logger.info(f"Scheduled job '{name}' saved")
+            refresh()
+        
+        def remove():
+            name = name_var.get().strip()
+            if name and self.scheduler.get(name):
+                self.scheduler.remove(name)
+                self.logger.info(f"Scheduled job '{name}' removed")
+                refresh()
+        
+        jobs_listbox.bind('<<ListboxSelect>>', select)
+        button_frame = ttk.Frame(window)
+        button_frame.pack(fill=tk.X, padx=10, pady=(5, 10))
+        ttk.Button(button_frame, text="Save Job", command=save).pack(side=tk.LEFT)
+        ttk.Button(button_frame, text="Remove Job", command=remove).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Button(button_frame, text="Close", command=window.destroy).pack(side=tk.RIGHT)
+        refresh()
+    
+    def apply_job_priority(self, job_start=False):
+        """Apply the CPU and I/O priority settings to the running job"""
+        process = self.current_process
+        if process is None or process.poll() is not None:
+            return
+        cpu_priority, io_priority = self.cpu_priority.get(), self.io_priority.get()
+        if job_start and cpu_priority == io_priority == "normal":
+            return
+        try:
+            if set_process_priority(process, cpu_priority, io_priority):
+                self.logger.info(f"Job priority set to CPU '{cpu_priority}', I/O '{io_priority}'")
+            else:
+                self.logger.warning(f"Job priority CPU '{cpu_priority}', I/O '{io_priority}' "
+                                    f"could not be fully applied on this system")
+        except Exception as e:
+            self.logger.error(f"Failed to set job priority: {e}")
+    
+    def update_job_usage(self):
+        """Show the effective CPU and disk I/O usage of the running job"""
+        monitor = self.usage_monitor
+        if not monitor or not hasattr(self, 'job_cpu_label'):
+            return
+        usage = monitor.sample()
+        if usage is None:
+            return
+        self.job_cpu_label.config(text=f"Job CPU: {usage['cpu_percent']:.0f}% "
+                                       f"(priority: {self.cpu_priority.get()})")
+        self.job_io_label.config(text=f"Job Disk I/O: read {usage['read_mbps']:.1f} MB/s, "
+                                      f"write {usage['write_mbps']:.1f} MB/s (priority: {self.io_priority.get()})")
+    
+    def confirm_destination_space(self, command, on_confirmed, needed=None, unattended=False, on_declined=None):
+        """
+        Compare the bytes a job will write with the destination's free space before it starts
+        
+        The free space is probed in the background, so a stalled share does not
+        block the GUI; on_confirmed is called once the job may start.
+        
+        Args:
+            command (str): Command about to run
+            on_confirmed (callable): Starts the job
+            needed (int): Bytes the job writes (estimated from the tree statistics if None)
+            unattended (bool): Start the job without asking when space is short (scheduled runs)
+            on_declined (callable): Called instead of on_confirmed when the job is not started
+        """
+        on_declined = on_declined or (lambda: None)
+        if self.space_check is not None:
+            self.update_status("Still checking the destination's free space...")
+            on_declined()
+            return
+        options = parse_command(command)
+        source, dest = options["source_path"], options["dest_path"]
+        if options["list_only"] or not source or not dest:
+            on_confirmed()
+            return
+        if needed is None:
+            needed = estimate_needed(self.tree_stats.summary(source), self.tree_stats.summary(dest))
+            if needed is None:
+                self.logger.info("Source tree not counted yet; skipping the free-space check")
+                on_confirmed()
+                return
+        self.space_check = self.path_prober.submit(free_space, dest)
+        self.update_status("Checking the destination's free space...")
+        self.finish_space_check(dest, needed, unattended, on_confirmed, on_declined)
+    
+    def finish_space_check(self, dest, needed, unattended, on_confirmed, on_declined):
+        """Start the job once the free-space probe of confirm_destination_space finished or timed out"""
+        probe = self.space_check
+        if not probe.done():
+            self.root.after(INSPECT_POLL_MS, self.finish_space_check, dest, needed, unattended, on_confirmed,
+                            on_declined)
+            return
+        self.space_check = None
+        if self.operation_in_progress or (self.current_process and self.current_process.poll() is None):
+            # Another job started while the probe was running
+            if not unattended:
+                messagebox.showwarning("Warning", "A command is already running. Please stop it first.")
+            on_declined()
+            return
+        try:
+            free = probe.result()
+        except OSError as e:
+            self.logger.warning(f"Could not check the free space of {dest}: {e}")
+            on_confirmed()
+            return
+        if free - SPACE_MARGIN >= needed:
+            on_confirmed()
+            return
+        
+        message = (f"The destination has {self.format_bytes(free)} free, but this job is estimated "
+                   f"to write {self.format_bytes(needed)}.")
+        self.logger.warning(message)
+        if unattended:
+            # Unattended run: start it; it is paused before the disk is full
+            self.output_queue.put(('warning', f"⚠ {message}\n"))
+            on_confirmed()
+        elif messagebox.askyesno("Destination Space",
+                                 f"{message}\n\nThe job will be paused if the destination is about "
+                                 f"to run out of space.\n\nStart anyway?"):
+            on_confirmed()
+        else:
+            self.update_status("Ready")
+            on_declined()
+    
+    def check_destination_space(self):
+        """Sample the destination's free space in the background and act on the forecast"""
+        forecaster = self.space_forecaster
+        if forecaster is None:
+            return
+        probe = self.space_probe
+        if probe is not None:
+            if not probe.done():
+                return
+            self.space_probe = None
+            try:
+                forecaster.add(probe.result())
+                self.act_on_space_forecast(forecaster)
+            except OSError as e:
+                self.logger.debug(f"Free space of {self.space_dest} not sampled: {e}")
+        if time.monotonic() - self.space_sampled >= SPACE_SAMPLE_INTERVAL:
+            self.space_sampled = time.monotonic()
+            self.space_probe = self.path_prober.submit(free_space, self.space_dest)
+    
+    def act_on_space_forecast(self, forecaster):
+        """Warn when the destination will soon be full; pause the job before it is, resume once space is freed"""
+        process = self.current_process
+        if process is None or self.scheduler.suspended:
+            return
+        free = forecaster.free
+        if self.space_paused:
+            if forecaster.can_resume() and resume_process(process):
+                self.space_paused = False
+                forecaster.resumed()
+                self.output_queue.put(('info', f"\n▶ Job resumed: the destination has {self.format_bytes(free)} "
+                                               f"free again\n"))
+                self.update_status("Job resumed - destination space available")
+            return
+        
+        state = forecaster.state()
+        seconds = forecaster.seconds_left()
+        left = f", full in about {self.format_time(seconds)} at the current rate" if seconds is not None else ""
+        if state == FORECAST_PAUSE:
+            if suspend_process(process):
+                self.space_paused = True
+                forecaster.paused()
+                self.output_queue.put(('warning', f"\n⏸ Job paused: the destination has only "
+                                                  f"{self.format_bytes(free)} free{left}. Free up space on the "
+                                                  f"destination - the job resumes automatically.\n"))
+                self.update_status("Job paused - destination almost full")
+                self.logger.warning(f"Job paused: {free} bytes free on the destination")
+            elif not self.space_warned:
+                self.space_warned = True
+                self.output_queue.put(('warning', f"\n⚠ The destination is almost full "
+                                                  f"({self.format_bytes(free)} free{left}) and this job cannot "
+                                                  f"be paused on this system.\n"))
+        elif state == FORECAST_WARN and not self.space_warned:
+            self.space_warned = True
+            self.output_queue.put(('warning', f"\n⚠ Destination space is running low: "
+                                              f"{self.format_bytes(free)} free{left}\n"))
+            self.logger.warning(f"Destination space running low: {free} bytes free{left}")
+    
+    def get_bandwidth_cap(self):
+        """Get the bandwidth cap in MB/s (0 = unlimited)"""
+        try:
+            return max(0.0, float(self.bandwidth_cap.get().strip() or 0))
+        except (AttributeError, ValueError):
+            return 0.0
+    
+    def get_ipg_controller(self, source, dest):
+        """Get the /IPG controller stored in the job folder of a source/destination pair"""
+        if not source or not dest:
+            return None
+        try:
+            # Called for every generated command; the folder is created once a run saves its gap
+            return IpgController(os.path.join(get_job_folder(source, dest, create=False), THROTTLE_STATE_FILE))
+        except OSError as e:
+            self.logger.error(f"Failed to open bandwidth state: {e}")
+            return None
+    
+    def apply_ipg(self, command, bandwidth_cap):
+        """
+        Set /IPG in a robocopy command to the gap learned for its job
+        
+        Returns:
+            tuple: (command, ipg) - ipg is None when no gap could be determined
+        """
+        options = parse_command(command)
+        controller = self.get_ipg_controller(options["source_path"], options["dest_path"])
+        if not controller:
+            return command, None
+        ipg = controller.ipg_for(bandwidth_cap)
+        parts = [part for part in command.split(" ") if not part.upper().startswith("/IPG:")]
+        command = " ".join(parts + [f"/IPG:{ipg}"])
+        self.logger.info(f"Bandwidth cap {bandwidth_cap} MB/s applied as /IPG:{ipg}")
+        return command, ipg
+    
+    def record_ipg_sample(self, command, bandwidth_cap, ipg):
+        """Feed the measured speed of a finished robocopy run back into the /IPG controller"""
+        options = parse_command(command)
+        controller = self.get_ipg_controller(options["source_path"], options["dest_path"])
+        if not controller:
+            return
+        bytes_copied = self.performance_stats.get('bytes_copied', 0)
+        measured = self.performance_stats.get('speed_mbps', 0.0)
+        if not measured and self.operation_start_time:
+            elapsed = time.time() - self.operation_start_time
+            measured = bytes_copied / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+        controller.record_run(bandwidth_cap, ipg, measured, bytes_copied)
+    
+    def open_checkpoint(self, command):
+        """Open the checkpoint of the job folder for a command"""
+        try:
+            options = parse_command(command)
+            if not options["source_path"] or not options["dest_path"] or options["list_only"]:
+                return None
+            folder = get_job_folder(options["source_path"], options["dest_path"])
+            return JobCheckpoint(os.path.join(folder, CHECKPOINT_FILE))
+        except Exception as e:
+            self.logger.error(f"Failed to open job checkpoint: {e}")
+            return None
+    
+    def find_interrupted_checkpoint(self):
+        """Find a resumable checkpoint for the current source and destination"""
+        source = self.source_path.get()
+        dest = self.dest_path.get()
+        if not source or not dest:
+            return None
+        path = os.path.join(get_job_folder(source, dest, create=False), CHECKPOINT_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            checkpoint = JobCheckpoint(path)
+        except Exception as e:
+            self.logger.error(f"Failed to read job checkpoint: {e}")
+            return None
+        if checkpoint.is_resumable():
+            return checkpoint
+        checkpoint.close()
+        return None
+    
+    def save_checkpoint(self):
+        """Store current stats and elapsed time in the job checkpoint"""
+        checkpoint = self.checkpoint
+        if checkpoint and self.operation_start_time:
+            checkpoint.update(stats=dict(self.performance_stats),
+                              elapsed=time.time() - self.operation_start_time)
+            checkpoint.flush()
+    
+    def finish_checkpoint(self, status):
+        """Record the final job status in the checkpoint and close it"""
+        checkpoint, self.checkpoint = self.checkpoint, None
+        if not checkpoint:
+            return
+        try:
+            if self.operation_start_time:
+                checkpoint.update(stats=dict(self.performance_stats),
+                                  elapsed=time.time() - self.operation_start_time)
+            checkpoint.finish(status)
+            checkpoint.close()
+            self.logger.info(f"Job checkpoint saved with status '{status}'")
+        except Exception as e:
+            self.logger.error(f"Failed to finalize job checkpoint: {e}")
+    
+    def check_interrupted_job(self):
+        """Point out an interrupted job for the configured paths at startup"""
+        checkpoint = self.find_interrupted_checkpoint()
+        if checkpoint:
+            checkpoint.close()
+            self.update_status("Interrupted job found for these paths - use Tools → Resume Interrupted Job")
+    
+    def resume_job(self):
+        """Resume the interrupted job for the current source and destination"""
+        if self.operation_in_progress:
+            messagebox.showwarning("Warning", "A command is already running. Please stop it first.")
+            return
+        
+        checkpoint = self.find_interrupted_checkpoint()
+        if not checkpoint:
+            messagebox.showinfo("Resume Job", "No interrupted job found for the current source and destination.")
+            return
+        
+        command = checkpoint.get("command")
+        stats = checkpoint.get("stats") or {}
+        elapsed = checkpoint.get("elapsed", 0.0)
+        status = checkpoint.get("status")
+        checkpoint.close()
+        
+        if not messagebox.askyesno(
+            "Resume Job",
+            f"Resume the interrupted job ({status})?\n\n{command}\n\n"
+            f"Files so far: {stats.get('files_copied', 0):,}\n"
+            f"Data so far: {self.format_bytes(stats.get('bytes_copied', 0))}\n"
+            f"Elapsed so far: {self.format_time(elapsed)}"
+        ):
+            return
+        
+        self.current_command = command
+        self.command_display.config(text=command, foreground="blue")
+        self.execute_command(resume=True)
+    
+    def open_failure_set(self, source, dest, create=False):
+        """Open the failed-path store of the job folder for a source/destination pair"""
+        if not source or not dest:
+            return None
+        try:
+            path = os.path.join(get_job_folder(source, dest, create=create), FAILURES_FILE)
+            if not create and not os.path.exists(path):
+                return None
+            return FailureSet(path)
+        except Exception as e:
+            self.logger.error(f"Failed to open failure set: {e}")
+            return None
+    
+    def record_failures(self, complete):
+        """
+        Store the paths that failed in the finished (or stopped) run
+        
+        Args:
+            complete (bool): The run went through everything it was given
+        """
+        collector, self.failure_collector = self.failure_collector, None
+        retry_paths, self.retry_paths = self.retry_paths, []
+        self.failure_count = 0
+        command = self.job_context.get('command')
+        if collector is None or not command:
+            return
+        options = parse_command(command)
+        if options["list_only"]:
+            return
+        failure_set = self.open_failure_set(options["source_path"], options["dest_path"],
+                                            create=bool(collector.failures or retry_paths))
+        if failure_set is None:
+            return
+        try:
+            if retry_paths:
+                failure_set.record_retry(retry_paths, collector.failures, complete)
+            else:
+                # Watch syncs and verifications cover only part of the tree, so they only add failures
+                failure_set.record_run(command, collector.failures,
+                                       complete and not self.watch_run and not self.verify_run)
+            self.failure_count = failure_set.count()
+            self.logger.info(f"{len(collector.failures)} failed paths in this run, "
+                             f"{self.failure_count} recorded for retry")
+        except Exception as e:
+            self.logger.error(f"Failed to record failed paths: {e}")
+        finally:
+            failure_set.close()
+    
+    def retry_failures(self):
+        """Run a follow-up job over only the paths that failed for the current source and destination"""
+        if self.operation_in_progress or (self.stop_controller and self.stop_controller.active):
+            messagebox.showwarning("Warning", "A command is already running. Please stop it first.")
+            return
+        
+        failure_set = self.open_failure_set(self.source_path.get(), self.dest_path.get())
+        if failure_set is None:
+            messagebox.showinfo("Retry Failed Files", "No failed files recorded for the current source and destination.")
+            return
+        try:
+            command = failure_set.command
+            entries = failure_set.entries()
+        finally:
+            failure_set.close()
+        batches = build_retry_batches(command, entries) if command else []
+        if not batches:
+            messagebox.showinfo("Retry Failed Files", "No failed files recorded for the current source and destination.")
+            return
+        
+        dirs = sum(1 for entry in entries if entry["kind"] == KIND_DIR)
+        preview = "\n".join(f"  ERROR {entry['code']}  {entry['path']}"
+                            + (f"  (retried {entry['retries']}x)" if entry['retries'] else "")
+                            for entry in entries[:10])
+        if len(entries) > 10:
+            preview += f"\n  ... and {len(entries) - 10:,} more"
+        if not messagebox.askyesno(
+            "Retry Failed Files",
+            f"Copy again only the {len(entries) - dirs:,} failed files and {dirs:,} failed directories "
+            f"of:\n\n{command}\n\n{preview}\n\n"
+            f"They will be copied in {len(batches):,} batches, one per directory."
+        ):
+            return
+        
+        self.start_operation(command, batches)
+    
+    def open_plan(self, source, dest, create=False):
+        """Open the copy plan of the job folder for a source/destination pair"""
+        if not source or not dest:
+            return None
+        try:
+            path = os.path.join(get_job_folder(source, dest, create=create), PLAN_FILE)
+            if not create and not os.path.exists(path):
+                return None
+            return CopyPlan(path)
+        except Exception as e:
+            self.logger.error(f"Failed to open copy plan: {e}")
+            return None
+    
+    def record_plan(self):
+        """Store the plan built from a finished list-only run"""
+        builder, self.plan_builder = self.plan_builder, None
+        if builder is None:
+            return
+        plan = self.open_plan(*builder.roots, create=True)
+        if plan is None:
+            return
+        try:
+            plan.save(execution_command(self.job_context.get('command', '')), builder.actions)
+            summary = plan.summary()
+        except Exception as e:
+            self.logger.error(f"Failed to save copy plan: {e}")
+            return
+        finally:
+            plan.close()
+        copies, deletes = summary[ACTION_COPY], summary[ACTION_DELETE]
+        self.output_queue.put(('info', f"\n📋 Copy plan saved: {copies[0]:,} files to copy "
+                                       f"({self.format_bytes(copies[1])}), {deletes[0]:,} to delete, "
+                                       f"{summary[ACTION_SKIP][0]:,} unchanged - "
+                                       f"use Tools → Execute Copy Plan to run it\n"))
+        self.logger.info(f"Copy plan saved with {len(builder.actions)} actions")
+    
+    def plan_jobs(self, command, actions, engine):
+        """
+        Split a copy plan into supervisor jobs
+        
+        Returns:
+            list: (command, engine) tuples
+        """
+        copies = [size for _, action, kind, size in actions if action == ACTION_COPY and kind == KIND_FILE]
+        self.performance_stats['total_files'] = len(copies)
+        if engine.name == "python":
+            # One job copying balanced chunks in parallel
+            return [(command, PlanEngine(actions, throttle=engine.throttle))]
+        # robocopy.exe copies per directory; deletions and new directories are applied directly
+        jobs = [(command, PlanEngine([a for a in actions if a[1] != ACTION_COPY or a[2] != KIND_FILE],
+                                     copy_files=False))]
+        return jobs + [(batch, engine) for batch, _ in robocopy_plan_batches(command, actions)]
+    
+    def create_plan(self):
+        """Run the current command as a listing whose result is stored as a copy plan"""
+        if self.operation_in_progress or (self.stop_controller and self.stop_controller.active):
+            messagebox.showwarning("Warning", "A command is already running. Please stop it first.")
+            return
+        self.generate_command()
+        command = getattr(self, 'current_command', '')
+        if not command or "Please select" in command:
+            messagebox.showerror("Error", "Please select source and destination first.")
+            return
+        self.start_operation(planning_command(command))
+    
+    def execute_plan(self):
+        """Execute the stored copy plan for the current source and destination"""
+        if self.operation_in_progress or (self.stop_controller and self.stop_controller.active):
+            messagebox.showwarning("Warning", "A command is already running. Please stop it first.")
+            return
+        
+        plan = self.open_plan(self.source_path.get(), self.dest_path.get())
+        if plan is None or not plan.command:
+            if plan:
+                plan.close()
+            messagebox.showinfo("Execute Copy Plan", "No copy plan found for the current source and destination.\n"
+                                                     "Use Tools → Create Copy Plan first.")
+            return
+        try:
+            command, created, summary = plan.command, plan.created, plan.summary()
+            actions = plan.actions()
+        finally:
+            plan.close()
+        
+        copies, deletes = summary[ACTION_COPY], summary[ACTION_DELETE]
+        if not copies[0] and not deletes[0] and not summary["dirs"]:
+            messagebox.showinfo("Execute Copy Plan", "The copy plan has nothing to do - source and destination were in sync.")
+            return
+        age = self.format_time(time.time() - created) if created else "unknown"
+        if not messagebox.askyesno(
+            "Execute Copy Plan",
+            f"Execute the copy plan created {age} ago?\n\n{command}\n\n"
+            f"Copy:    {copies[0]:,} files ({self.format_bytes(copies[1])})\n"
+            f"Create:  {summary['dirs']:,} directories\n"
+            f"Delete:  {deletes[0]:,} files/directories ({self.format_bytes(deletes[1])})\n"
+            f"Skip:    {summary[ACTION_SKIP][0]:,} unchanged files\n\n"
+            f"Changes made since the plan was created are not picked up."
+        ):
+            return
+        self.confirm_destination_space(command, lambda: self.start_operation(command, plan_actions=actions),
+                                       needed=copies[1])
+
+    def preview_mirror(self):
+        """Compare source and destination and show what the current command would copy and delete"""
+        self.generate_command()
+        command = getattr(self, 'current_command', '')
+        if not command or "Please select" in command:
+            messagebox.showerror("Error", "Please select a source and a destination first.")
+            return
+        options = parse_command(command)
+        diff = TreeDiff(options["source_path"], options["dest_path"], options)
+        
+        window = tk.Toplevel(self.root)
+        window.title("Mirror Preview")
+        window.geometry("900x560")
+        mode = "/MIR" if options["mirror_mode"] else "/PURGE" if options["purge_dest"] else None
+        
+        summary_frame = ttk.LabelFrame(window, text="Summary", padding="10")
+        summary_frame.pack(fill=tk.X, padx=10, pady=(10, 5))
+        progress_label = ttk.Label(summary_frame, text="Comparing source and destination...")
+        progress_label.grid(row=0, column=0, columnspan=3, sticky="w")
+        rows = [(CATEGORY_NEW, "New (copied)"), (CATEGORY_CHANGED, "Changed (copied)"),
+                (CATEGORY_EXTRA, f"Extra (deleted by {mode})" if mode else "Extra (kept without /MIR or /PURGE)"),
+                (CATEGORY_IDENTICAL, "Identical (skipped)"), (CATEGORY_EXCLUDED, "Excluded by /XC /XN /XO /XL")]
+        summary_labels = {}
+        for row, (category, title) in enumerate(rows, 1):
+            ttk.Label(summary_frame, text=f"{title}:").grid(row=row, column=0, sticky="w", padx=(0, 10))
+            summary_labels[category] = ttk.Label(summary_frame, text="-", font=("Consolas", 9))
+            summary_labels[category].grid(row=row, column=1, sticky="w")
+        
+        tree_frame = ttk.LabelFrame(window, text="By Directory", padding="10")
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        columns = (CATEGORY_NEW, CATEGORY_CHANGED, CATEGORY_EXTRA, CATEGORY_IDENTICAL)
+        tree = ttk.Treeview(tree_frame, columns=columns)
+        tree.heading("#0", text="Directory")
+        for category, (_, title) in zip(columns, rows):
+            tree.heading(category, text=title.split(" (")[0])
+            tree.column(category, width=130, anchor="e")
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        def cell(counts):
+            files, size = counts
+            return f"{files:,} / {self.format_bytes(size)}" if files else ""
+        
+        def insert_children(parent_item, rel_dir):
+            # Children are inserted when a directory is expanded; the placeholder makes it expandable
+            for child, counts in diff.children(rel_dir):
+                item = tree.insert(parent_item, tk.END, text=os.path.basename(child),
+                                   values=[cell(counts[category]) for category in columns])
+                items[item] = child
+                if diff.children(child):
+                    tree.insert(item, tk.END, text="...")
+        
+        items = {}
+        
+        def on_open(event=None):
+            item = tree.focus()
+            rel_dir = items.get(item)
+            if rel_dir is None:
+                return
+            placeholder = tree.get_children(item)
+            if len(placeholder) == 1 and placeholder[0] not in items:
+                tree.delete(placeholder[0])
+                insert_children(item, rel_dir)
+        tree.bind("<<TreeviewOpen>>", on_open)
+        
+        stop_event = diff.stop_event
+        result = {}
+        
+        def compare():
+            try:
+                result["complete"] = diff.run()
+            except Exception as e:
+                result["error"] = e
+        thread = threading.Thread(target=compare, name="mirror-preview", daemon=True)
+        start_time = time.time()
+        
+        def poll():
+            if not window.winfo_exists():
+                stop_event.set()
+                return
+            if thread.is_alive():
+                progress_label.config(text=f"Comparing source and destination... "
+                                           f"{diff.dirs_listed:,} directories")
+                self.root.after(DIFF_POLL_MS, poll)
+                return
+            if "error" in result:
+                progress_label.config(text=f"Comparison failed: {result['error']}", foreground="red")
+                return
+            if not result.get("complete"):
+                return
+            totals = diff.totals
+            for category, label in summary_labels.items():
+                files, size = totals[category]
+                label.config(text=f"{files:>12,} files  {self.format_bytes(size):>10}")
+            text = (f"Compared {diff.dirs_listed:,} directories in {time.time() - start_time:.1f}s - "
+                    f"{totals['new_dirs']:,} new, {totals['extra_dirs']:,} extra directories")
+            if diff.errors:
+                text += f" ({len(diff.errors):,} could not be read)"
+            progress_label.config(text=text)
+            insert_children("", "")
+            self.logger.info(f"Mirror preview: {text}")
+        
+        def close():
+            stop_event.set()
+            window.destroy()
+        window.protocol("WM_DELETE_WINDOW", close)
+        ttk.Button(window, text="Close", command=close).pack(pady=(0, 10))
+        
+        thread.start()
+        poll()
+    
+    def get_verify_threads(self):
+        """Verify workers from the GUI setting"""
+        try:
+            return max(1, int(self.verify_threads.get()))
+        except (ValueError, AttributeError):
+            return DEFAULT_VERIFY_CONCURRENCY
+    
+    def schedule_verification(self):
+        """Start verifying the files the finished copy reported, after its operation has ended"""
+        builder, self.verify_builder = self.verify_builder, None
+        if builder is None:
+            return
+        files = copied_files(builder.actions)
+        if not files:
+            self.output_queue.put(('info', "Nothing to verify - no files were copied"))
+            return
+        command = self.job_context.get('command', '')
+        
+        def start():
+            if self.operation_in_progress or (self.stop_controller and self.stop_controller.active):
+                self.logger.warning("Verification skipped: another command was started")
+                return
+            self.start_operation(command, verify_files=files)
+        self.root.after(100, start)
+    
+    def finish_verification(self, return_code):
+        """Report the outcome of a verification run"""
+        failures = len(self.failure_collector.failures) if self.failure_collector else 0
+        self.record_failures(complete=return_code < 16)
+        if return_code == 0:
+            self.output_queue.put(('success', "\n✅ Verification passed - the destination matches the source\n"))
+            self.logger.info("Verification passed")
+        elif return_code < 16:
+            self.output_queue.put(('error', f"\n❌ Verification found {failures:,} files that do not match - "
+                                            f"use Tools → Retry Failed Files to copy them again\n"))
+            self.logger.error(f"Verification found {failures} mismatched files")
+        else:
+            self.output_queue.put(('error', f"\n❌ Verification failed! Return code: {return_code}\n"))
+            self.logger.error(f"Verification failed with return code: {return_code}")
+        self.update_status("Verification finished")
+    
     def validate_all_paths(self):
         """Validate source and destination paths"""
+        source = self.source_path.get()
+        dest = self.dest_path.get()
+        source_probe = self.path_prober.submit(path_status, source) if source else None
+        dest_probe = self.path_prober.submit(destination_status, dest) if dest else None
+        self.update_status("Validating paths...")
+        self.show_path_validation(source_probe, dest_probe)
+    
+    def show_path_validation(self, source_probe, dest_probe):
+        """Report the path checks once both finished or timed out"""
+        if any(probe is not None and not probe.done() for probe in (source_probe, dest_probe)):
+            self.root.after(INSPECT_POLL_MS, self.show_path_validation, source_probe, dest_probe)
+            return
         messages = []
         
         # Validate source
-        source = self.source_path.get()
-        if not source:
+        if source_probe is None:
             messages.append("❌ Source path is empty")
-        elif not os.path.exists(source):
-            messages.append("❌ Source path does not exist")
-        elif not os.path.isdir(source):
-            messages.append("❌ Source path is not a directory")
         else:
-            messages.append("✅ Source path is valid")
+            try:
+                status = source_probe.result()
+            except PathUnreachable as e:
+                messages.append(f"❌ Source path is not reachable ({e.strerror})")
+            except OSError as e:
+                messages.append(f"❌ Source path cannot be checked: {e.strerror or e}")
+            else:
+                if status == STATUS_MISSING:
+                    messages.append("❌ Source path does not exist")
+                elif status != STATUS_DIR:
+                    messages.append("❌ Source path is not a directory")
+                else:
+                    messages.append("✅ Source path is valid")
         
         # Validate destination
-        dest = self.dest_path.get()
-        if not dest:
+        if dest_probe is None:
             messages.append("❌ Destination path is empty")
         else:
-            if os.path.exists(dest):
-                if os.path.isdir(dest):
+            try:
+                status, parent_status = dest_probe.result()
+            except PathUnreachable as e:
+                messages.append(f"❌ Destination path is not reachable ({e.strerror})")
+            except OSError as e:
+                messages.append(f"❌ Destination path cannot be checked: {e.strerror or e}")
+            else:
+                if status == STATUS_DIR:
                     messages.append("✅ Destination path exists and is valid")
-                else:
+                elif status != STATUS_MISSING:
                     messages.append("❌ Destination path exists but is not a directory")
-            else:
-                parent = os.path.dirname(dest)
-                if os.path.exists(parent):
+                elif parent_status == STATUS_DIR:
                     messages.append("✅ Destination will be created (parent exists)")
                 else:
                     messages.append("❌ Destination parent directory does not exist")
         
+        self.update_status("Path validation finished")
         messagebox.showinfo("Path Validation", "\n".join(messages))
     
     def open_robocopy_docs(self):
@@ -2278,6 +3726,12 @@ F11             Toggle fullscreen
                 speed_str = f"{self.format_bytes(speed)}/s"
                 summary_lines.append(f"⚡ Average Speed:      {speed_str}")
             
+            # Compare with the earlier runs of the same job
+            job, regressions = self.run_regressions()
+            if regressions:
+                summary_lines.append("\n📉 Slower than this job's usual runs:")
+                summary_lines.extend(f"   {line}" for line in regressions)
+            
             summary_lines.append("\n" + "=" * 60)
             
             # Add return code explanation
@@ -2294,6 +3748,13 @@ F11             Toggle fullscreen
             elif return_code >= 8:
                 summary_lines.append("\n❌ Some files could not be copied - check errors above")
             
+            if self.performance_stats.get('dedup_files'):
+                summary_lines.append(self.dedup_summary())
+            
+            if self.failure_count:
+                summary_lines.append(f"🔁 {self.failure_count:,} failed paths recorded - "
+                                     f"use Tools → Retry Failed Files to copy only those")
+            
             summary_lines.append("\n" + "=" * 60 + "\n")
             
             # Display in output area
@@ -2323,6 +3784,14 @@ F11             Toggle fullscreen
                         speed_str = f"{self.format_bytes(speed)}/s"
                         self.summary_text.insert(tk.END, f"⚡ Average Speed:      {speed_str}\n")
                     
+                    if self.performance_stats.get('dedup_files'):
+                        self.summary_text.insert(tk.END, self.dedup_summary() + "\n")
+                    
+                    if regressions:
+                        self.summary_text.insert(tk.END, "\n📉 Slower than this job's usual runs:\n", "warning")
+                        for line in regressions:
+                            self.summary_text.insert(tk.END, f"   {line}\n", "warning")
+                    
                     self.summary_text.insert(tk.END, "\n" + "=" * 60 + "\n\n")
                     
                     # Add explanation
@@ -2348,21 +3817,145 @@ F11             Toggle fullscreen
                     self.logger.error(f"Error updating summary in Performance Monitor: {e}")
             
             # Also show as popup for immediate attention
-            messagebox.showinfo(
-                f"Operation {status_text}",
-                f"{status_icon} ROBOCOPY Operation Completed!\n\n"
-                f"Status: {status_text} (Code: {return_code})\n"
-                f"Files: {files_processed:,} files\n"
-                f"Directories: {dirs_processed:,} folders\n"
-                f"Data: {data_str}\n"
-                f"Time: {time_str}\n"
-                f"\nCheck the Output tab for detailed results.",
-                parent=self.root
-            )
+            popup_text = (f"{status_icon} ROBOCOPY Operation Completed!\n\n"
+                          f"Status: {status_text} (Code: {return_code})\n"
+                          f"Files: {files_processed:,} files\n"
+                          f"Directories: {dirs_processed:,} folders\n"
+                          f"Data: {data_str}\n"
+                          f"Time: {time_str}\n")
+            if regressions:
+                # A regressed run offers the trend of the job's past runs
+                popup_text += "\n📉 Slower than this job's usual runs:\n" + "\n".join(regressions)
+                if messagebox.askyesno(f"Operation {status_text}",
+                                       popup_text + "\n\nShow the trend of this job's past runs?",
+                                       parent=self.root):
+                    self.show_job_trend(job)
+            else:
+                messagebox.showinfo(
+                    f"Operation {status_text}",
+                    popup_text + "\nCheck the Output tab for detailed results.",
+                    parent=self.root
+                )
             
         except Exception as e:
             self.logger.error(f"Error showing operation summary: {e}")
     
+    def run_regressions(self):
+        """
+        Compare the run that just finished with the earlier runs of its job
+        
+        Returns:
+            tuple: (job key, lines describing the regressions - empty if there are none)
+        """
+        if self.last_history_run_id is None:
+            return None, []
+        try:
+            run = self.run_history.get(self.last_history_run_id)
+            if run is None:
+                return None, []
+            _, regressions = detect(self.run_history, run)
+        except Exception as e:
+            self.logger.error(f"Failed to compare the run with its job's history: {str(e)}")
+            return None, []
+        lines = [describe_regression(regression) for regression in regressions]
+        for line in lines:
+            self.logger.warning(f"Performance regression of job {run['job']}: {line}")
+        return run['job'], lines
+    
+    def show_job_trend(self, job=None):
+        """Show the duration and throughput of a job's past runs (the current source and destination by default)"""
+        job = job or job_key(self.source_path.get(), self.dest_path.get())
+        entries = trend(self.run_history, job) if job else []
+        if not entries:
+            messagebox.showinfo("Info", "There are no completed copy runs of this job yet.")
+            return
+        last_run = entries[-1][0]
+        baseline = Baseline([run for run, _ in entries[-BASELINE_RUNS:]])
+        
+        window = tk.Toplevel(self.root)
+        window.title("Job Performance Trend")
+        window.geometry("900x620")
+        
+        header = ttk.LabelFrame(window, text="Job", padding="10")
+        header.pack(fill=tk.X, padx=10, pady=(10, 5))
+        ttk.Label(header, text=f"{last_run['source']}  →  {last_run['dest']}").pack(anchor=tk.W)
+        usual = []
+        if baseline.duration is not None:
+            usual.append(f"usual duration {format_duration(baseline.duration[0])} "
+                         f"(± {format_duration(baseline.duration[1])})")
+        if baseline.throughput is not None:
+            usual.append(f"usual speed {baseline.throughput[0]:.1f} MB/s (± {baseline.throughput[1]:.1f})")
+        flagged = sum(1 for _, regressions in entries if regressions)
+        ttk.Label(header, text=f"{len(entries)} runs, {flagged} slower than usual"
+                               + (f"; {', '.join(usual)}" if usual else "")).pack(anchor=tk.W)
+        
+        # One chart per metric; runs slower than the baseline before them are red
+        width, chart_height = 860, 110
+        canvas = tk.Canvas(window, width=width, height=2 * chart_height + 40, background="white")
+        canvas.pack(fill=tk.X, padx=10, pady=5)
+        
+        def draw_chart(top, title, metric, value_of, label_of):
+            canvas.create_text(10, top, text=title, anchor="nw", font=("Segoe UI", 9, "bold"))
+            points = [(index, value_of(run), any(r['metric'] == metric for r in regressions))
+                      for index, (run, regressions) in enumerate(entries)]
+            points = [point for point in points if point[1] is not None]
+            if not points:
+                canvas.create_text(width // 2, top + chart_height // 2, text="Not enough data")
+                return
+            highest = max(value for _, value, _ in points) or 1
+            left, plot_top, plot_height = 90, top + 18, chart_height - 24
+            step = (width - left - 20) / max(1, len(entries) - 1)
+            
+            def y_of(value):
+                return plot_top + plot_height - value / highest * plot_height
+            canvas.create_text(left - 6, plot_top, text=label_of(highest), anchor="ne", font=("Consolas", 8))
+            canvas.create_line(left, plot_top + plot_height, width - 20, plot_top + plot_height, fill="#999999")
+            coords = []
+            for index, value, _ in points:
+                coords.extend((left + index * step, y_of(value)))
+            if len(coords) >= 4:
+                canvas.create_line(*coords, fill="#4a90d9", width=2)
+            for index, value, regressed in points:
+                x, y = left + index * step, y_of(value)
+                color = "#dc3545" if regressed else "#4a90d9"
+                canvas.create_oval(x - 3, y - 3, x + 3, y + 3, fill=color, outline=color)
+        
+        draw_chart(5, "Duration", METRIC_DURATION, run_duration, format_duration)
+        draw_chart(chart_height + 25, "Average speed", METRIC_THROUGHPUT, run_throughput,
+                   lambda value: f"{value:.0f} MB/s")
+        
+        table_frame = ttk.LabelFrame(window, text="Runs", padding="10")
+        table_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(5, 10))
+        columns = ("started", "duration", "files", "data", "speed", "peak", "flag")
+        titles = ("Started", "Duration", "Files", "Data", "Avg MB/s", "Peak MB/s", "")
+        table = ttk.Treeview(table_frame, columns=columns, show="headings")
+        for column, title in zip(columns, titles):
+            table.heading(column, text=title)
+            table.column(column, width=220 if column == "flag" else 100,
+                         anchor="w" if column in ("started", "flag") else "e")
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=table.yview)
+        table.configure(yscrollcommand=scrollbar.set)
+        table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        for run, regressions in reversed(entries):
+            duration = run_duration(run)
+            table.insert("", tk.END, values=(
+                datetime.fromtimestamp(run['started']).strftime('%Y-%m-%d %H:%M'),
+                format_duration(duration) if duration is not None else "",
+                f"{run['files']:,}", self.format_bytes(run['bytes']),
+                f"{run['avg_mbps']:.1f}" if run['avg_mbps'] else "",
+                f"{run['peak_mbps']:.1f}" if run['peak_mbps'] else "",
+                "📉 " + "; ".join(describe_regression(r) for r in regressions) if regressions else ""))
+    
+    def dedup_summary(self):
+        """Summary line for the files the Python engine hard linked instead of copying"""
+        stats = self.performance_stats
+        line = (f"🔗 Deduplicated:       {stats.get('dedup_files', 0):,} files linked, "
+                f"{self.format_bytes(stats.get('dedup_bytes', 0))} not copied")
+        if stats.get('dedup_seconds'):
+            line += f", ~{self.format_time(stats['dedup_seconds'])} saved"
+        return line
+    
     def show_return_codes(self):
         """Show ROBOCOPY return codes explanation"""
         return_codes_window = tk.Toplevel(self.root)
@@ -2460,6 +4053,7 @@ TIPS:
         """Clear the log display"""
         if hasattr(self, 'log_text'):
             self.log_text.delete(1.0, tk.END)
+            self.log_tail.clear()
         self.output_text.delete(1.0, tk.END)
         self.update_status("Log cleared")
     
@@ -2467,99 +4061,316 @@ TIPS:
         """Save current log to file"""
         self.export_log()
     
-    def refresh_log(self):
-        """Refresh log display with enhanced formatting"""
+    def refresh_log(self, quiet=False):
+        """Show the lines appended to the log since the last refresh"""
         if hasattr(self, 'log_text'):
             try:
-                if os.path.exists('robocopy_gui.log'):
-                    with open('robocopy_gui.log', 'r', encoding='utf-8') as f:
-                        log_content = f.read()
+                result = self.log_tail.read()
+                if result is None:
+                    if self.log_tail.offset is None:
+                        self.log_text.delete(1.0, tk.END)
+                        self.log_text.insert(tk.END, "No log file found. Start an operation to generate logs.")
+                    return
+                
+                lines, reset = result
+                if reset:
                     self.log_text.delete(1.0, tk.END)
-                    
-                    # Format log content with color coding
-                    for line in log_content.split('\n'):
-                        if 'ERROR' in line:
-                            self.log_text.insert(tk.END, line + '\n', 'error')
-                        elif 'WARNING' in line:
-                            self.log_text.insert(tk.END, line + '\n', 'warning')
-                        elif 'INFO' in line:
-                            self.log_text.insert(tk.END, line + '\n', 'info')
-                        else:
-                            self.log_text.insert(tk.END, line + '\n')
-                    
+                    self.log_window_limit = LOG_WINDOW_LINES
+                following = reset or self.log_text.yview()[1] >= 1.0
+                if following:
+                    # Back at the end: older pages loaded before are let go again
+                    self.log_window_limit = LOG_WINDOW_LINES
+                self.insert_log_lines(tk.END, lines)
+                
+                excess = self.log_tail.shown - self.log_window_limit
+                if excess > 0:
+                    self.log_text.delete("1.0", f"{excess + 1}.0")
+                    self.log_tail.trim(excess)
+                
+                if following:
                     self.log_text.see(tk.END)
+                if not quiet:
                     self.update_status("Log refreshed")
-                else:
-                    self.log_text.delete(1.0, tk.END)
-                    self.log_text.insert(tk.END, "No log file found. Start an operation to generate logs.")
             except Exception as e:
                 self.logger.error(f"Failed to refresh log: {str(e)}")
-                messagebox.showerror("Error", f"Failed to refresh log: {str(e)}")
+                if not quiet:
+                    messagebox.showerror("Error", f"Failed to refresh log: {str(e)}")
+    
+    def insert_log_lines(self, index, lines):
+        """Insert log lines with their color tags in one call, runs of lines with the same tag as one chunk"""
+        args = []
+        chunk = []
+        chunk_tag = None
+        for line in lines:
+            tag = line_tag(line)
+            if tag != chunk_tag and chunk:
+                args.extend(("".join(chunk), chunk_tag))
+                chunk = []
+            chunk_tag = tag
+            chunk.append(line + '\n')
+        if chunk:
+            args.extend(("".join(chunk), chunk_tag))
+        if args:
+            self.log_text.insert(index, *args)
+    
+    def load_older_log(self):
+        """Show the page of log lines before the first line shown"""
+        lines = self.log_tail.older_page()
+        if not lines:
+            self.update_status("Start of the log reached")
+            return
+        self.log_window_limit = max(self.log_window_limit, self.log_tail.shown)
+        self.insert_log_lines("1.0", lines)
+        # Keep the line that was at the top in view
+        self.log_text.see(f"{len(lines) + 1}.0")
+    
+    def on_log_scroll(self, event):
+        """Load older log lines when scrolling up past the first line shown"""
+        if (getattr(event, 'delta', 0) > 0 or getattr(event, 'num', None) == 4) and self.log_text.yview()[0] <= 0:
+            self.root.after_idle(self.load_older_log)
+    
+    def poll_log_tail(self):
+        """Follow the log while the Logs tab is open"""
+        try:
+            if self.log_tail.offset is None or self.notebook.select() == str(self.logs_tab):
+                self.refresh_log(quiet=True)
+        finally:
+            self.root.after(LOG_TAIL_POLL_MS, self.poll_log_tail)
     
-    def save_command_history(self, history_entry):
-        """Save command to history file"""
+    def start_history_run(self, command, options, retry_batches, plan_actions, watch_targets, verify_files):
+        """Record the run that is starting in the run history"""
+        if verify_files is not None:
+            kind = KIND_VERIFY
+        elif retry_batches:
+            kind = KIND_RETRY
+        elif plan_actions is not None:
+            kind = KIND_PLAN
+        elif watch_targets:
+            kind = KIND_WATCH
+        elif options["list_only"]:
+            kind = KIND_LIST
+        else:
+            kind = KIND_COPY
+        self.peak_sample = None
         try:
-            with open('command_history.txt', 'a', encoding='utf-8') as f:
-                f.write(history_entry + '\n')
+            self.history_run_id = self.run_history.start_run(command, kind, options["source_path"],
+                                                             options["dest_path"])
         except Exception as e:
-            self.logger.error(f"Failed to save command history: {str(e)}")
+            self.history_run_id = None
+            self.logger.error(f"Failed to record the run in the history: {str(e)}")
+        self.refresh_history_page()
     
-    def load_command_history(self):
-        """Load command history from file"""
+    def finish_history_run(self, return_code, status=None):
+        """Record the outcome and statistics of the run in the run history"""
+        if self.history_run_id is None:
+            return
+        run_id, self.history_run_id = self.history_run_id, None
+        self.last_history_run_id = run_id
+        if status is None:
+            status = STATUS_COMPLETED if return_code < 8 else STATUS_FAILED
+        stats = self.performance_stats
+        elapsed = time.time() - self.operation_start_time if self.operation_start_time else 0
+        avg_mbps = stats.get('bytes_copied', 0) / elapsed / (1024 * 1024) if elapsed > 0 else None
+        peak_mbps = max(stats.get('peak_mbps', 0.0), avg_mbps or 0.0) or None
+        failures = len(self.failure_collector.failures) if self.failure_collector else 0
         try:
-            if os.path.exists('command_history.txt'):
-                with open('command_history.txt', 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                
-                # Load last 20 commands
-                for line in reversed(lines[-20:]):
-                    if line.strip():
-                        self.history_listbox.insert(tk.END, line.strip())
+            self.run_history.finish_run(run_id, status, return_code, {
+                'files': stats.get('files_copied', 0), 'dirs': stats.get('dirs_copied', 0),
+                'bytes': stats.get('bytes_copied', 0), 'avg_mbps': avg_mbps, 'peak_mbps': peak_mbps,
+                'errors': max(stats.get('errors', 0), failures)})
         except Exception as e:
-            self.logger.error(f"Failed to load command history: {str(e)}")
+            self.logger.error(f"Failed to record the run outcome in the history: {str(e)}")
+        self.refresh_history_page()
     
-    def load_from_history(self):
-        """Load selected command from history with improved parsing"""
+    def format_history_run(self, run):
+        """One line of the run history list"""
+        started = datetime.fromtimestamp(run['started']).strftime('%Y-%m-%d %H:%M:%S')
+        parts = [f"[{started}]"]
+        if run['status'] != STATUS_IMPORTED:
+            icon = {STATUS_COMPLETED: "✅", STATUS_FAILED: "❌", STATUS_STOPPED: "🛑",
+                    STATUS_RUNNING: "⏳"}.get(run['status'], "?")
+            parts.append(icon if run['kind'] == KIND_COPY else f"{icon} {run['kind']}")
+            if run['exit_code'] is not None:
+                parts.append(f"rc {run['exit_code']}")
+            if run['ended']:
+                parts.append(self.format_time(run['ended'] - run['started']))
+                parts.append(f"{run['files']:,} files, {self.format_bytes(run['bytes'])}")
+            if run['avg_mbps']:
+                parts.append(f"{run['avg_mbps']:.1f} MB/s")
+        parts.append(run['command'])
+        return "  ".join(parts)
+    
+    def load_command_history(self, before_id=None):
+        """Show a page of the run history, newest first"""
+        try:
+            rows = self.run_history.page(HISTORY_PAGE_SIZE, before_id)
+        except Exception as e:
+            self.logger.error(f"Failed to load run history: {str(e)}")
+            return
+        self.history_rows = rows
+        self.history_listbox.delete(0, tk.END)
+        for run in rows:
+            self.history_listbox.insert(tk.END, self.format_history_run(run))
+        self.history_page_label.config(text=f"Page {len(self.history_page_starts) + 1}")
+    
+    def refresh_history_page(self):
+        """Show new and finished runs if the newest page is shown"""
+        if hasattr(self, 'history_listbox') and not self.history_page_starts:
+            self.load_command_history()
+    
+    def show_older_history(self):
+        if len(self.history_rows) < HISTORY_PAGE_SIZE:
+            self.update_status("No older runs")
+            return
+        self.history_page_starts.append(self.history_rows[-1]['id'])
+        self.load_command_history(self.history_page_starts[-1])
+    
+    def show_newer_history(self):
+        if not self.history_page_starts:
+            self.load_command_history()
+            return
+        self.history_page_starts.pop()
+        self.load_command_history(self.history_page_starts[-1] if self.history_page_starts else None)
+    
+    def selected_history_run(self):
+        """Get the run selected in the run history list, None if there is none"""
         selection = self.history_listbox.curselection()
-        if selection:
-            history_entry = self.history_listbox.get(selection[0])
-            
-            # Extract command from timestamped entry
-            if history_entry.startswith('[') and '] ' in history_entry:
-                command = history_entry.split('] ', 1)[1]  # Remove timestamp
-            else:
-                command = history_entry
-            
-            self.command_display.config(text=command, foreground="blue")
-            self.current_command = command
-            self.update_status("Command loaded from history")
-        else:
-            messagebox.showinfo("Info", "Please select a command from the history list first.")
+        if not selection or selection[0] >= len(self.history_rows):
+            messagebox.showinfo("Info", "Please select a run from the history list first.")
+            return None
+        return self.history_rows[selection[0]]
+    
+    def load_from_history(self):
+        """Load the command of the selected run"""
+        run = self.selected_history_run()
+        if run is None:
+            return
+        command = run['command']
+        self.command_display.config(text=command, foreground="blue")
+        self.current_command = command
+        self.update_status("Command loaded from history")
+    
+    def show_run_log(self):
+        """Show the robocopy log output of the selected run"""
+        history_run = self.selected_history_run()
+        if history_run is None:
+            return
+        
+        # The log position is recorded just before the run is started, so look up the latest
+        # log entry of the command before the run's start time + 1s
+        run = self.log_manager.index.latest(history_run['command'], before=history_run['started'] + 1)
+        if run is None:
+            messagebox.showinfo("Info", "No log was recorded for this command. Only runs with "
+                                        "'Create log file' enabled are logged.")
+            return
+        try:
+            content = self.log_manager.index.read_run(run)
+        except OSError as e:
+            self.logger.error(f"Failed to read run log {run['path']}: {e}")
+            messagebox.showerror("Error", f"The log of this run is no longer available:\n{e}")
+            return
+        
+        log_window = tk.Toplevel(self.root)
+        log_window.title(f"Run Log - {datetime.fromtimestamp(run['started']).strftime('%Y-%m-%d %H:%M:%S')}")
+        log_window.geometry("900x600")
+        log_window.transient(self.root)
+        
+        ttk.Label(log_window, text=run['path'], font=("Consolas", 9)).pack(anchor=tk.W, padx=10, pady=(10, 0))
+        text_widget = scrolledtext.ScrolledText(log_window, wrap=tk.NONE, font=("Consolas", 9))
+        text_widget.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        text_widget.insert(tk.END, content or "(The run wrote nothing to its log.)")
+        text_widget.config(state=tk.DISABLED)
+        ttk.Button(log_window, text="Close", command=log_window.destroy).pack(pady=(0, 10))
     
     def clear_history(self):
-        """Clear command history with confirmation"""
-        if messagebox.askyesno("Confirm", "Are you sure you want to clear all command history?"):
-            self.history_listbox.delete(0, tk.END)
+        """Clear the run history with confirmation"""
+        if messagebox.askyesno("Confirm", "Are you sure you want to clear all run history?"):
             try:
-                if os.path.exists('command_history.txt'):
-                    os.remove('command_history.txt')
+                self.run_history.clear()
             except Exception as e:
-                self.logger.error(f"Failed to delete history file: {str(e)}")
-            self.update_status("Command history cleared")
+                self.logger.error(f"Failed to clear run history: {str(e)}")
+            self.history_page_starts = []
+            self.load_command_history()
+            self.update_status("Run history cleared")
+    
+    def shutdown(self):
+        """Stop the watcher, the jobs and the background workers, then close the window"""
+        if self.watch is not None:
+            self.watch.stop()
+        self.supervisor.shutdown()
+        self.path_inspector.shutdown()
+        self.path_prober.shutdown()
+        if self.tree_stats_stop is not None:
+            self.tree_stats_stop.set()
+        self.tree_stats_executor.shutdown(wait=False)
+        self.log_manager.shutdown()
+        self.log_listener.stop()
+        self.root.destroy()
+
+
+def run_logging_benchmark(line_count=LOGGING_BENCHMARK_LINES):
+    """
+    Print how many robocopy output lines per second the GUI pipeline (parsing,
+    formatting and display) handles with logging disabled, at the default
+    level and at debug level
+    """
+    root = tk.Tk()
+    root.withdraw()
+    app = AdvancedRobocopyGUI(root)
+    lines = []
+    for i in range(line_count):
+        if i % 100 == 0:
+            lines.append(f"\t  New Dir          100\tC:\\bench\\dir_{i // 100}\\")
+        else:
+            lines.append(f"\t    New File  \t\t   {1000 + i % 5000}\tfile_{i}.dat")
+    
+    root_logger = logging.getLogger()
+    results = []
+    # The first pass warms up the caches and is not reported
+    for label, level in (("warm-up", None), ("disabled", None), ("info", logging.INFO), ("debug", logging.DEBUG)):
+        logging.disable(logging.CRITICAL if level is None else logging.NOTSET)
+        root_logger.setLevel(level or logging.INFO)
+        app.performance_stats = {'files_copied': 0, 'dirs_copied': 0, 'bytes_copied': 0,
+                                 'total_files': line_count, 'speed_mbps': 0.0, 'errors': 0}
+        app.output_text.delete(1.0, tk.END)
+        start = time.perf_counter()
+        for line in lines:
+            app.parse_robocopy_output(line)
+            app.output_text.insert(tk.END, app.format_output_line(line) + "\n")
+        elapsed = time.perf_counter() - start
+        results.append((label, line_count / elapsed if elapsed > 0 else float('inf')))
+    logging.disable(logging.NOTSET)
+    root_logger.setLevel(logging.INFO)
+    
+    app.shutdown()
+    
+    print(f"GUI output pipeline, {line_count:,} lines:")
+    for label, rate in results[1:]:
+        print(f"  logging {label:<8} {rate:>12,.0f} lines/s")
+
 
 def main():
     """Main function to run the application"""
+    if "--benchmark-logging" in sys.argv[1:]:
+        run_logging_benchmark()
+        return
     root = tk.Tk()
     app = AdvancedRobocopyGUI(root)
     
     # Handle window closing
+    def close_when_stopped():
+        if app.stop_controller and app.stop_controller.active:
+            root.after(100, close_when_stopped)
+        else:
+            app.shutdown()
+    
     def on_closing():
         if app.current_process and app.current_process.poll() is None:
             if messagebox.askokcancel("Quit", "A command is running. Do you want to stop it and quit?"):
                 app.stop_command()
-                root.destroy()
+                close_when_stopped()
         else:
-            root.destroy()
+            app.shutdown()
     
     root.protocol("WM_DELETE_WINDOW", on_closing)
     root.mainloop()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Run history for ROBOCOPY GUI
+
+Every run is a row in a SQLite database in the jobs folder: the command, the
+job it belongs to (the source/destination pair, keyed like the job folders),
+what kind of run it was, start and end time, exit code and status, and the
+files, directories and bytes copied with the average and peak throughput and
+the error count.
+
+The Logs tab shows the history a page at a time. Pages are read newest first
+by run id (keyset pagination on the primary key), and the runs of one job by
+the (job, started) index, so reading a page costs the same however many
+years of history the database holds.
+
+command_history.txt, the plain text history of earlier versions, is imported
+once and renamed.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+from robocopy_utils import JOBS_DIR, get_job_folder
+from robocopy_checkpoint import STATUS_RUNNING, STATUS_COMPLETED
+
+HISTORY_FILE = "history.sqlite"
+LEGACY_HISTORY_FILE = "command_history.txt"
+
+# Status of runs imported from the plain text history (no outcome known)
+STATUS_IMPORTED = "imported"
+
+KIND_COPY = "copy"
+KIND_LIST = "list"
+KIND_RETRY = "retry"
+KIND_PLAN = "plan"
+KIND_WATCH = "watch"
+KIND_VERIFY = "verify"
+
+RUN_FIELDS = ("id", "job", "kind", "command", "source", "dest", "started", "ended", "status", "exit_code",
+              "files", "dirs", "bytes", "avg_mbps", "peak_mbps", "errors")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    job TEXT,
+    kind TEXT NOT NULL,
+    command TEXT NOT NULL,
+    source TEXT,
+    dest TEXT,
+    started REAL NOT NULL,
+    ended REAL,
+    status TEXT NOT NULL,
+    exit_code INTEGER,
+    files INTEGER NOT NULL DEFAULT 0,
+    dirs INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    avg_mbps REAL,
+    peak_mbps REAL,
+    errors INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS runs_job ON runs (job, started);
+"""
+
+_LEGACY_ENTRY = re.compile(r"^\[(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\] (.*)$")
+
+
+def job_key(source, dest):
+    """Identity of the job a source/destination pair belongs to (its job folder name)"""
+    if not source or not dest:
+        return None
+    return os.path.basename(get_job_folder(source, dest, create=False))
+
+
+class RunHistory:
+    """Indexed store of past runs"""
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): Database file (defaults to the shared file in the jobs folder)
+        """
+        if path is None:
+            os.makedirs(JOBS_DIR, exist_ok=True)
+            path = os.path.join(JOBS_DIR, HISTORY_FILE)
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def _rows(self, sql, args):
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(RUN_FIELDS)} FROM runs {sql}", args).fetchall()
+        return [dict(zip(RUN_FIELDS, row)) for row in rows]
+
+    def start_run(self, command, kind, source, dest, started=None):
+        """
+        Record a run that is starting
+
+        Returns:
+            int: Run id, for finish_run
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO runs (job, kind, command, source, dest, started, status) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_key(source, dest), kind, command, source, dest,
+                 time.time() if started is None else started, STATUS_RUNNING))
+            return cursor.lastrowid
+
+    def finish_run(self, run_id, status, exit_code, stats, ended=None):
+        """
+        Record the outcome of a run
+
+        Args:
+            run_id (int): From start_run
+            status (str): STATUS_COMPLETED, STATUS_FAILED or STATUS_STOPPED
+            exit_code (int): Robocopy exit code, None if the run did not finish
+            stats (dict): 'files', 'dirs', 'bytes', 'avg_mbps', 'peak_mbps' and 'errors'
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE runs SET ended = ?, status = ?, exit_code = ?, files = ?, dirs = ?, bytes = ?, "
+                "avg_mbps = ?, peak_mbps = ?, errors = ? WHERE id = ?",
+                (time.time() if ended is None else ended, status, exit_code, stats.get("files", 0),
+                 stats.get("dirs", 0), stats.get("bytes", 0), stats.get("avg_mbps"), stats.get("peak_mbps"),
+                 stats.get("errors", 0), run_id))
+
+    def get(self, run_id):
+        rows = self._rows("WHERE id = ?", (run_id,))
+        return rows[0] if rows else None
+
+    def page(self, limit, before_id=None):
+        """
+        Get a page of runs, newest first
+
+        Args:
+            limit (int): Runs per page
+            before_id (int): Only runs older than this one (the last id of the previous page)
+
+        Returns:
+            list: Run dictionaries (see RUN_FIELDS)
+        """
+        if before_id is None:
+            return self._rows("ORDER BY id DESC LIMIT ?", (limit,))
+        return self._rows("WHERE id < ? ORDER BY id DESC LIMIT ?", (before_id, limit))
+
+    def job_runs(self, job, limit, status=STATUS_COMPLETED, kind=KIND_COPY, before=None):
+        """
+        Get the latest runs of a job, newest first
+
+        Args:
+            job (str): job_key of the job
+            limit (int): Most runs returned
+            status (str): Only runs with this status (None for all)
+            kind (str): Only runs of this kind (None for all)
+            before (float): Only runs started before this time
+        """
+        sql = "WHERE job = ? AND started < ?"
+        args = [job, time.time() + 1 if before is None else before]
+        if status is not None:
+            sql += " AND status = ?"
+            args.append(status)
+        if kind is not None:
+            sql += " AND kind = ?"
+            args.append(kind)
+        return self._rows(sql + " ORDER BY started DESC LIMIT ?", args + [limit])
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM runs")
+
+    def import_legacy(self, path=LEGACY_HISTORY_FILE):
+        """
+        Import a plain text command history once, then rename it to <path>.imported
+
+        Returns:
+            int: Entries imported
+        """
+        if not os.path.exists(path):
+            return 0
+        entries = []
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                match = _LEGACY_ENTRY.match(line)
+                if match:
+                    started = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S").timestamp()
+                    command = match.group(2)
+                else:
+                    started = os.path.getmtime(path)
+                    command = line
+                entries.append((KIND_COPY, command, started, STATUS_IMPORTED))
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT INTO runs (kind, command, started, status) VALUES (?, ?, ?, ?)",
+                                   entries)
+        os.replace(path, path + ".imported")
+        self.logger.info(f"Imported {len(entries)} entries of {path} into the run history")
+        return len(entries)
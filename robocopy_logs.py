@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Log rotation, compression and the job log index for ROBOCOPY GUI
+
+Three kinds of logs are kept bounded:
+
+    robocopy_gui.log      written by the application through RotatingLogHandler
+    job logs              written by robocopy /LOG+: - one file per source and
+                          destination pair (job_log_path in robocopy_utils)
+                          instead of a shared one; rotated by LogManager.prepare
+                          before a run starts
+    legacy shared logs    robocopy_operation.log and robocopy.log, still named
+                          by commands saved before job logs existed
+
+A log is rotated when it reaches LOG_MAX_BYTES or once its oldest entry is
+LOG_MAX_AGE old. Rotation renames it to '<log>.1', which a LogTail can still
+finish reading, and a background worker compresses that file to
+'<log>.<timestamp>.gz' and deletes the oldest segments beyond
+LOG_KEEP_SEGMENTS. Nothing waits for the compression: while '<log>.1' is still
+pending, the log is not rotated again.
+
+The LogIndex records, for every run, the command and where its output starts
+in which log file, and follows the output when the file is rotated and
+compressed, so the log of an old run can be opened from the history.
+
+Records are not written on the thread that logs them: a DeferredQueueHandler
+puts them on a queue and a QueueListener thread formats and writes them
+(start_log_listener), so the Tk thread never waits for the disk or the
+console. Messages logged for every output line go through a RateLimitedLog.
+"""
+
+import os
+import copy
+import gzip
+import queue
+import time
+import shutil
+import sqlite3
+import logging
+import logging.handlers
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from robocopy_utils import JOBS_DIR
+
+# A log is rotated at this size, or once its oldest entry is this old
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_MAX_AGE = 7 * 24 * 3600
+
+# Compressed segments kept per log
+LOG_KEEP_SEGMENTS = 10
+
+# Shared robocopy logs named by commands saved before job logs existed
+LEGACY_LOGS = ("robocopy_operation.log", "robocopy.log")
+
+LOG_INDEX_FILE = "log_index.sqlite"
+
+# Seconds between two per-line debug messages of the same kind
+LINE_DEBUG_INTERVAL = 1.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    command TEXT NOT NULL,
+    path TEXT NOT NULL,
+    offset INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_command ON runs (command, started);
+CREATE INDEX IF NOT EXISTS runs_path ON runs (path, offset);
+"""
+
+
+def rotated_name(path):
+    """Name a log has between rotation and compression"""
+    return path + ".1"
+
+
+def segment_names(path):
+    """Compressed segments of a log, oldest first"""
+    folder = os.path.dirname(path) or os.curdir
+    prefix = os.path.basename(path) + "."
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return []
+    segments = [os.path.join(os.path.dirname(path), name) for name in names
+                if name.startswith(prefix) and name.endswith(".gz")]
+
+    def written(segment):
+        try:
+            return os.path.getmtime(segment), segment
+        except OSError:
+            return 0.0, segment
+    return sorted(segments, key=written)
+
+
+def _new_segment_name(path):
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    name = f"{path}.{stamp}.gz"
+    count = 1
+    while os.path.exists(name):
+        name = f"{path}.{stamp}-{count}.gz"
+        count += 1
+    return name
+
+
+def file_started(path):
+    """
+    Creation time of a file where the platform records it
+
+    Returns:
+        float or None: Epoch seconds, None if unknown
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    birth = getattr(st, "st_birthtime", None)
+    if birth is not None:
+        return birth
+    return st.st_ctime if os.name == "nt" else None
+
+
+def needs_rotation(size, started, max_bytes=LOG_MAX_BYTES, max_age=LOG_MAX_AGE, now=None):
+    """Check whether a log of this size whose oldest entry is from started should be rotated"""
+    if size <= 0:
+        return False
+    if max_bytes and size >= max_bytes:
+        return True
+    now = time.time() if now is None else now
+    return bool(max_age) and started is not None and now - started >= max_age
+
+
+class LogIndex:
+    """Where the log output of every run is"""
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): Database file (defaults to the shared file in the jobs folder)
+        """
+        if path is None:
+            os.makedirs(JOBS_DIR, exist_ok=True)
+            path = os.path.join(JOBS_DIR, LOG_INDEX_FILE)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def add(self, command, path, offset, started=None):
+        """Record that the output of a run of command starts at offset in path"""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO runs (started, command, path, offset) VALUES (?, ?, ?, ?)",
+                               (time.time() if started is None else started, command,
+                                os.path.abspath(path), offset))
+
+    def first_started(self, path):
+        """Start of the oldest run recorded in a log file, None if there is none"""
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(started) FROM runs WHERE path = ?",
+                                     (os.path.abspath(path),)).fetchone()
+        return row[0]
+
+    def relocate(self, old_path, new_path):
+        """Follow the runs of a log file that was renamed or compressed"""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE runs SET path = ? WHERE path = ?",
+                               (os.path.abspath(new_path), os.path.abspath(old_path)))
+
+    def forget(self, path):
+        """Drop the runs of a log file that was deleted"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM runs WHERE path = ?", (os.path.abspath(path),))
+
+    def latest(self, command, before=None):
+        """
+        Get the most recent run of a command
+
+        Args:
+            command (str): Command of the run
+            before (float): Only runs started before this time
+
+        Returns:
+            dict or None: 'started', 'path' and 'offset' of the run
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT started, path, offset FROM runs WHERE command = ? AND started < ? "
+                                     "ORDER BY started DESC LIMIT 1",
+                                     (command, time.time() + 1 if before is None else before)).fetchone()
+        return None if row is None else dict(zip(("started", "path", "offset"), row))
+
+    def read_run(self, run):
+        """
+        Read the log output of a run (from latest)
+
+        Returns:
+            str: Output from the run's offset up to the next run in the same file
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(offset) FROM runs WHERE path = ? AND offset > ?",
+                                     (run["path"], run["offset"])).fetchone()
+        end = row[0]
+        opener = gzip.open if run["path"].endswith(".gz") else open
+        with opener(run["path"], "rb") as f:
+            f.seek(run["offset"])
+            data = f.read() if end is None else f.read(end - run["offset"])
+        return data.decode("utf-8", errors="replace")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LogManager:
+    """Rotates logs and compresses rotated segments on a background worker"""
+
+    def __init__(self, index=None, max_bytes=LOG_MAX_BYTES, max_age=LOG_MAX_AGE,
+                 keep_segments=LOG_KEEP_SEGMENTS):
+        """
+        Args:
+            index (LogIndex): Run index kept up to date (defaults to the shared index)
+            max_bytes (int): Size at which a log is rotated (0 = no limit)
+            max_age (float): Age of the oldest entry at which a log is rotated (0 = no limit)
+            keep_segments (int): Compressed segments kept per log
+        """
+        self.index = index if index is not None else LogIndex()
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.keep_segments = keep_segments
+        self.logger = logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="logzip")
+
+    def rotate(self, path):
+        """
+        Rename a log aside and compress it in the background
+
+        Returns:
+            bool: False if it could not be renamed, or the previous segment is still being compressed
+        """
+        rotated = rotated_name(path)
+        if os.path.exists(rotated):
+            return False
+        try:
+            os.replace(path, rotated)
+        except OSError as e:
+            # On Windows a log that another process has open cannot be renamed
+            self.logger.debug(f"Cannot rotate {path}: {e}")
+            return False
+        self.index.relocate(path, rotated)
+        self._executor.submit(self._compress, path, rotated)
+        return True
+
+    def _compress(self, path, rotated):
+        segment = _new_segment_name(path)
+        try:
+            with open(rotated, "rb") as src, gzip.open(segment + ".tmp", "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(segment + ".tmp", segment)
+            self.index.relocate(rotated, segment)
+            os.remove(rotated)
+        except OSError as e:
+            # The uncompressed segment stays; it is compressed with the next rotation
+            self.logger.debug(f"Cannot compress {rotated}: {e}")
+            return
+        for old in segment_names(path)[:-self.keep_segments or None]:
+            try:
+                os.remove(old)
+                self.index.forget(old)
+            except OSError:
+                pass
+
+    def rotate_if_needed(self, path, started=None):
+        """Rotate a log that is too big or too old; see needs_rotation"""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return False
+        if started is None:
+            started = self.index.first_started(path) or file_started(path)
+        if needs_rotation(size, started, self.max_bytes, self.max_age):
+            return self.rotate(path)
+        return False
+
+    def prepare(self, command, log_path, append=True):
+        """
+        Get the log file of a run ready before the run starts
+
+        Creates its folder (job folders are not created for commands that
+        never run), rotates it if needed and records where the run's output
+        will start.
+        A log that the run overwrites (/LOG: rather than /LOG+:) is rotated
+        first, so the output of earlier runs is kept.
+        """
+        if not log_path:
+            return
+        folder = os.path.dirname(log_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        if append:
+            self.rotate_if_needed(log_path)
+        elif os.path.exists(log_path) and not self.rotate(log_path):
+            self.index.forget(log_path)
+        try:
+            offset = os.path.getsize(log_path) if append else 0
+        except OSError:
+            offset = 0
+        self.index.add(command, log_path, offset)
+
+    def shutdown(self):
+        """Stop after the pending compressions (they are not cancelled)"""
+        self._executor.shutdown(wait=False)
+
+
+class RotatingLogHandler(logging.handlers.BaseRotatingHandler):
+    """File handler that rotates by size and age through a LogManager"""
+
+    def __init__(self, filename, manager, encoding="utf-8"):
+        """
+        Args:
+            filename (str): Log file
+            manager (LogManager): Rotation limits and compression worker
+        """
+        super().__init__(filename, "a", encoding=encoding, delay=False)
+        self.manager = manager
+        self.started = file_started(self.baseFilename) or time.time()
+
+    def shouldRollover(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        size = self.stream.tell() + len(self.format(record)) + 1
+        if not needs_rotation(size, self.started, self.manager.max_bytes, self.manager.max_age):
+            return False
+        # Not again while the previous segment is still being compressed
+        return not os.path.exists(rotated_name(self.baseFilename))
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if self.manager.rotate(self.baseFilename):
+            self.started = time.time()
+        self.stream = self._open()
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queues records without formatting them; the listener's handlers format them"""
+
+    def prepare(self, record):
+        # Merge the arguments now, they may change before the listener gets to the record
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def start_log_listener(handlers):
+    """
+    Route logging through a queue to handlers run on a background thread
+
+    Returns:
+        tuple: (handler to attach to the logger, started QueueListener; stop it on exit)
+    """
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return DeferredQueueHandler(log_queue), listener
+
+
+class RateLimitedLog:
+    """
+    Logs each kind of message at most once per interval
+
+    Messages left out are counted and the count is added to the next one of
+    their kind. Nothing is formatted while the level is disabled. Not thread
+    safe; used from the Tk thread.
+    """
+
+    def __init__(self, logger, interval=LINE_DEBUG_INTERVAL, level=logging.DEBUG):
+        self.logger = logger
+        self.interval = interval
+        self.level = level
+        self._last = {}
+
+    def log(self, key, msg, *args):
+        """Log msg % args unless a message of this key was logged less than interval ago"""
+        if not self.logger.isEnabledFor(self.level):
+            return
+        now = time.monotonic()
+        last, skipped = self._last.get(key, (None, 0))
+        if last is not None and now - last < self.interval:
+            self._last[key] = (last, skipped + 1)
+            return
+        self._last[key] = (now, 0)
+        if skipped:
+            msg += " (%d similar messages suppressed)"
+            args += (skipped,)
+        self.logger.log(self.level, msg, *args)
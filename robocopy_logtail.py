@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Incremental log reader for the Logs tab
+
+A LogTail remembers how far it has read a log file and which file that was
+(device and inode), so each refresh only reads the bytes appended since the
+last one. A file that became shorter was truncated and is shown again from
+its start; a file with a new identity was rotated, and the rest of the old
+file is read from its rotated name first when it is still there.
+
+Only a window of the newest lines is shown. The first read starts from the
+end of the file, reading backwards until the window is full, and older lines
+are read a page at a time when asked for, so the cost of a refresh depends
+on what was appended and not on the size of the file.
+"""
+
+import os
+from collections import deque
+
+# Lines shown after a (re)load, and lines added per request for older lines
+LOG_WINDOW_LINES = 5000
+LOG_PAGE_LINES = 1000
+
+# Appends larger than this are not read line by line; the view jumps to the end instead
+MAX_APPEND_BYTES = 4 * 1024 * 1024
+
+READ_BLOCK = 64 * 1024
+
+
+def line_tag(line):
+    """Text tag of a log line in the Logs tab ('' for none)"""
+    if 'ERROR' in line:
+        return 'error'
+    if 'WARNING' in line:
+        return 'warning'
+    if 'INFO' in line:
+        return 'info'
+    return ''
+
+
+def _decode(raw):
+    return raw.decode('utf-8', errors='replace').rstrip('\r')
+
+
+def _identity(st):
+    return st.st_dev, st.st_ino
+
+
+def _read_back(f, end, count):
+    """
+    Read up to count complete lines that end at or before a byte offset
+
+    Returns:
+        list: (end offset, raw line) tuples, oldest first
+    """
+    chunks = []
+    newlines = 0
+    pos = end
+    while pos > 0 and newlines <= count:
+        step = min(READ_BLOCK, pos)
+        pos -= step
+        f.seek(pos)
+        chunk = f.read(step)
+        chunks.append(chunk)
+        newlines += chunk.count(b"\n")
+    data = b"".join(reversed(chunks))
+    parts = data.split(b"\n")
+    # The last part follows the final newline: empty, or an incomplete line
+    tail = parts.pop()
+    line_end = end - len(tail) - 1
+    if pos > 0 and parts:
+        # The first part may have started before the bytes read
+        parts.pop(0)
+    lines = []
+    for raw in reversed(parts[-count:] if count else []):
+        lines.append((line_end, raw))
+        line_end -= len(raw) + 1
+    lines.reverse()
+    return lines
+
+
+class LogTail:
+    """Reads the lines appended to a log file since the last read"""
+
+    def __init__(self, path, window_lines=LOG_WINDOW_LINES, page_lines=LOG_PAGE_LINES,
+                 rotated_names=None):
+        """
+        Args:
+            path (str): Log file
+            window_lines (int): Lines read when the log is (re)loaded
+            page_lines (int): Lines read per older_page call
+            rotated_names (list): Names the file may be rotated to, newest first
+                (defaults to path + '.1')
+        """
+        self.path = path
+        self.window_lines = window_lines
+        self.page_lines = page_lines
+        self.rotated_names = rotated_names or [path + ".1"]
+        self.identity = None
+        self.offset = None
+        # End offset and file of every line shown, oldest first
+        self._shown = deque()
+        self._first = None
+        self._paths = {}
+
+    def _start(self, f, identity, size):
+        lines = _read_back(f, size, self.window_lines)
+        # An incomplete last line is read once it ends
+        self.offset = lines[-1][0] + 1 if lines else 0
+        self.identity = identity
+        self._paths = {identity: self.path}
+        self._shown.clear()
+        self._first = (identity, lines[0][0] - len(lines[0][1]) if lines else self.offset)
+        return self._add(identity, lines)
+
+    def _add(self, identity, lines):
+        self._shown.extend((identity, end) for end, _ in lines)
+        return [_decode(raw) for _, raw in lines]
+
+    def _read_from(self, f, identity, offset, size):
+        """Read the complete lines between offset and size"""
+        f.seek(offset)
+        data = f.read(size - offset)
+        cut = data.rfind(b"\n") + 1
+        lines = []
+        end = offset
+        for raw in data[:cut].split(b"\n")[:-1]:
+            end += len(raw) + 1
+            lines.append((end - 1, raw))
+        return lines, offset + cut
+
+    def _drain_rotated(self):
+        """Read the rest of the previous file under its rotated name, if it is there"""
+        for name in self.rotated_names:
+            try:
+                with open(name, 'rb') as f:
+                    st = os.fstat(f.fileno())
+                    if _identity(st) != self.identity:
+                        continue
+                    lines, _ = self._read_from(f, self.identity, self.offset, st.st_size)
+                    self._paths[self.identity] = name
+                    return self._add(self.identity, lines)
+            except OSError:
+                continue
+        self._paths.pop(self.identity, None)
+        return []
+
+    def read(self):
+        """
+        Read the lines appended since the last read
+
+        Returns:
+            tuple: (lines, reset) - reset means the lines replace everything
+                shown before (first read, truncation, or a jump to the end);
+                None if the file does not exist
+        """
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return None
+        with f:
+            st = os.fstat(f.fileno())
+            identity = _identity(st)
+            size = st.st_size
+            if self.offset is None or (identity == self.identity and size < self.offset):
+                return self._start(f, identity, size), True
+
+            lines = []
+            if identity != self.identity:
+                lines = self._drain_rotated()
+                self.identity = identity
+                self.offset = 0
+                self._paths[identity] = self.path
+            if size - self.offset > MAX_APPEND_BYTES:
+                return self._start(f, identity, size), True
+            new_lines, self.offset = self._read_from(f, identity, self.offset, size)
+            return lines + self._add(identity, new_lines), False
+
+    def older_page(self):
+        """
+        Read the page of lines before the first line shown
+
+        Returns:
+            list: Lines, oldest first (empty at the start of the file, or when
+                the file they were in has gone)
+        """
+        if self._first is None:
+            return []
+        identity, start = self._first
+        path = self._paths.get(identity)
+        if path is None or start <= 0:
+            return []
+        try:
+            with open(path, 'rb') as f:
+                if _identity(os.fstat(f.fileno())) != identity:
+                    return []
+                lines = _read_back(f, start, self.page_lines)
+        except OSError:
+            return []
+        if not lines:
+            return []
+        self._first = (identity, lines[0][0] - len(lines[0][1]))
+        self._shown.extendleft((identity, end) for end, _ in reversed(lines))
+        return [_decode(raw) for _, raw in lines]
+
+    @property
+    def shown(self):
+        """Number of lines shown"""
+        return len(self._shown)
+
+    def trim(self, count):
+        """Note that the count oldest lines shown were removed from the view"""
+        count = min(count, len(self._shown))
+        for _ in range(count):
+            identity, end = self._shown.popleft()
+            self._first = (identity, end + 1)
+
+    def clear(self):
+        """Note that the view was cleared; older_page reads the lines again"""
+        self._shown.clear()
+        if self.identity is not None:
+            self._first = (self.identity, self.offset)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Persistent file-state manifest for incremental mirrors
+
+The manifest is a small SQLite database kept in the job folder. For every
+directory synced without errors it stores the source and destination
+directory mtimes (the directory fingerprint), the subdirectory names and the
+number and total size of its files. On the next incremental run a directory
+whose fingerprint is unchanged is not listed or compared again; only its
+recorded subdirectories are visited. Changed directories are compared in
+full, so nothing is stored per file.
+
+A directory mtime changes when entries are added, removed or renamed, but not
+when an existing file is rewritten in place. Incremental runs therefore do not
+see in-place edits that keep the file name; run a full (non-incremental) job
+periodically when that matters.
+"""
+
+import os
+import json
+import sqlite3
+import logging
+from collections import namedtuple
+
+MANIFEST_FILE = "manifest.sqlite"
+
+DirRecord = namedtuple("DirRecord", ["src_mtime_ns", "dst_mtime_ns", "subdirs", "file_count", "total_bytes"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    src_mtime_ns INTEGER NOT NULL,
+    dst_mtime_ns INTEGER NOT NULL,
+    subdirs TEXT NOT NULL,
+    file_count INTEGER NOT NULL,
+    total_bytes INTEGER NOT NULL
+);
+-- Per-file rows of earlier versions; nothing read them
+DROP TABLE IF EXISTS files;
+"""
+
+
+class SyncManifest:
+    """SQLite store of the last synced state of a source/destination pair"""
+
+    def __init__(self, path, signature=""):
+        """
+        Args:
+            path (str): Manifest database file
+            signature (str): Description of the options that decide which
+                files are synced; a different signature discards old records
+        """
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(_SCHEMA)
+
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+        if row is None or row[0] != signature:
+            if row is not None:
+                self.logger.info(f"Manifest options changed, discarding {path}")
+            self.clear()
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('signature', ?)", (signature,))
+            self.conn.commit()
+
+    def clear(self):
+        """Forget every recorded entry"""
+        self.conn.execute("DELETE FROM dirs")
+        self.conn.commit()
+
+    def get_dir(self, rel_dir):
+        """
+        Get the recorded state of a directory
+
+        Args:
+            rel_dir (str): Directory path relative to the job root ('' for the root)
+
+        Returns:
+            DirRecord or None
+        """
+        row = self.conn.execute(
+            "SELECT src_mtime_ns, dst_mtime_ns, subdirs, file_count, total_bytes FROM dirs WHERE path = ?",
+            (rel_dir,)).fetchone()
+        if row is None:
+            return None
+        return DirRecord(row[0], row[1], json.loads(row[2]), row[3], row[4])
+
+    def is_unchanged(self, rel_dir, src_mtime_ns, dst_mtime_ns):
+        """
+        Check a directory fingerprint against the manifest
+
+        Returns:
+            DirRecord or None: The record when both directory mtimes match
+        """
+        record = self.get_dir(rel_dir)
+        if record and record.src_mtime_ns == src_mtime_ns and record.dst_mtime_ns == dst_mtime_ns:
+            return record
+        return None
+
+    def forget_dir(self, rel_dir):
+        """Drop the fingerprint of a directory so the next run compares it again"""
+        self.conn.execute("DELETE FROM dirs WHERE path = ?", (rel_dir,))
+
+    def record_dir(self, rel_dir, src_mtime_ns, dst_mtime_ns, subdirs, file_count, total_bytes):
+        """Store the fingerprint of a directory that was synced without errors"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO dirs (path, src_mtime_ns, dst_mtime_ns, subdirs, file_count, total_bytes) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (rel_dir, src_mtime_ns, dst_mtime_ns, json.dumps(subdirs), file_count, total_bytes))
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def manifest_signature(options):
+    """
+    Build the manifest signature for a set of copy options
+
+    Args:
+        options (dict): Options as returned by robocopy_engine.parse_command
+
+    Returns:
+        str: Signature string
+    """
+    keys = ("copy_subdirs", "copy_empty_subdirs", "mirror_mode", "purge_dest",
+            "exclude_changed", "exclude_newer", "exclude_older", "exclude_lonely")
+    signature = {
+        "source": os.path.normcase(os.path.abspath(options["source_path"])),
+        "dest": os.path.normcase(os.path.abspath(options["dest_path"])),
+        "options": {key: bool(options.get(key)) for key in keys},
+    }
+    if options.get("file_filters"):
+        # Only the named files are synced and recorded
+        signature["file_filters"] = options["file_filters"]
+    if options.get("levels"):
+        signature["levels"] = options["levels"]
+    return json.dumps(signature, sort_keys=True)
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Copy plans for ROBOCOPY GUI jobs
+
+A job can run in two phases. The first phase is a list-only (/L) run of
+robocopy.exe or the Python engine; a PlanBuilder turns its output into a list
+of copy, delete and skip actions with sizes, which is stored as a CopyPlan in
+the job folder. The second phase executes the stored plan without walking
+the tree again:
+
+- with the Python engine, a PlanExecutionJob splits the copies into chunks of
+  about equal size and copies the chunks in parallel;
+- with robocopy.exe, the copies become one command per directory naming its
+  files (largest first), run side by side by the job supervisor, and the
+  planned deletions are applied directly.
+
+Since the total number of files and bytes is known up front, progress is
+exact.
+"""
+
+import os
+import re
+import time
+import heapq
+import shutil
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from robocopy_engine import (PythonCopyJob, CopyEvent, parse_command, EVENT_NEW_DIR, EVENT_NEW_FILE,
+                             EVENT_EXTRA_FILE, EVENT_EXTRA_DIR, TERMINATED_RETURN_CODE)
+from robocopy_failures import batch_switches, file_batches
+from robocopy_utils import relative_path
+
+PLAN_FILE = "plan.sqlite"
+
+ACTION_COPY = "copy"
+ACTION_DELETE = "delete"
+ACTION_SKIP = "skip"
+
+KIND_FILE = "file"
+KIND_DIR = "dir"
+
+# Switches added to the listing run so that the plan gets every file with its exact size
+PLAN_LIST_SWITCHES = ("/L", "/V", "/BYTES")
+
+# Labels robocopy prints for files and directories; excluded classes are skipped
+_FILE_LABELS = {
+    "new file": "exclude_lonely",
+    "newer": "exclude_newer",
+    "older": "exclude_older",
+    "changed": "exclude_changed",
+}
+_SKIP_LABELS = ("same", "tweaked", "lonely", "mismatch")
+_SIZE_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4}
+_LABEL_SIZE = re.compile(r"^(.*?)\s*(-?[\d.]+(?:\s*[kmgt])?)$", re.IGNORECASE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS actions (
+    path TEXT PRIMARY KEY,
+    action TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    reason TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def planning_command(command):
+    """
+    Build the list-only command for the first phase
+
+    /MT is dropped so that file lines always follow their directory line.
+    """
+    parts = [part for part in command.split(" ")
+             if part.upper() not in PLAN_LIST_SWITCHES and not part.upper().startswith("/MT")]
+    return " ".join(parts + list(PLAN_LIST_SWITCHES))
+
+
+def execution_command(command):
+    """Command a plan is executed with: the planning command without the listing switches"""
+    return " ".join(part for part in command.split(" ") if part.upper() not in ("/L", "/BYTES"))
+
+
+def _parse_size(text):
+    text = text.strip().lower()
+    number, unit = text, ""
+    if text and text[-1] in _SIZE_UNITS:
+        number, unit = text[:-1].strip(), text[-1]
+    try:
+        return int(float(number) * _SIZE_UNITS[unit])
+    except ValueError:
+        return 0
+
+
+class PlanBuilder:
+    """Builds a plan from the output of a list-only run"""
+
+    def __init__(self, command):
+        """
+        Args:
+            command (str): The list-only command whose output is fed in
+        """
+        self.options = parse_command(command)
+        self.roots = (self.options["source_path"], self.options["dest_path"])
+        self.actions = {}
+        self._dir = ""
+
+    def _relative(self, path):
+        return relative_path(os.path.normpath(path), self.roots)
+
+    def feed(self, line):
+        """Process one output line"""
+        # robocopy.exe without /NP puts "\r 50%\r100%" progress on the same line
+        line = next((part for part in line.split("\r") if "\t" in part), "")
+        # "<label> <size>\t<name>": the name follows the last tab and may contain spaces
+        prefix, tab, name = line.rstrip("\n").rpartition("\t")
+        match = _LABEL_SIZE.match(prefix.strip())
+        if not tab or not match or not name.strip() or "ERROR" in line:
+            return
+        reason = " ".join(match.group(1).split())
+        label = reason.lower()
+        size = _parse_size(match.group(2))
+        name = name.strip()
+
+        if name.endswith(("\\", "/")):
+            rel = self._relative(name)
+            if rel is None:
+                return
+            if label == "*extra dir":
+                action = ACTION_DELETE if self.options["purge_dest"] else ACTION_SKIP
+                self.actions[rel] = (action, KIND_DIR, 0, "*EXTRA Dir")
+                return
+            # Directory line: the files that follow belong to it
+            self._dir = rel
+            if label == "new dir" and rel:
+                self.actions[rel] = (ACTION_COPY, KIND_DIR, 0, "New Dir")
+            return
+
+        if os.path.isabs(name) or "\\" in name:
+            rel = self._relative(name)
+            if rel is None:
+                return
+        else:
+            rel = os.path.join(self._dir, name) if self._dir else name
+
+        if label == "*extra file":
+            action = ACTION_DELETE if self.options["purge_dest"] else ACTION_SKIP
+            self.actions[rel] = (action, KIND_FILE, size, "*EXTRA File")
+        elif label in _FILE_LABELS:
+            excluded = self.options.get(_FILE_LABELS[label])
+            self.actions[rel] = (ACTION_SKIP if excluded else ACTION_COPY, KIND_FILE, size, reason)
+        elif label in _SKIP_LABELS:
+            self.actions[rel] = (ACTION_SKIP, KIND_FILE, size, reason)
+
+
+class CopyPlan:
+    """A stored plan in the job folder"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Plan database file
+        """
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def save(self, command, actions):
+        """
+        Replace the plan
+
+        Args:
+            command (str): Command the plan will be executed with
+            actions (dict): PlanBuilder.actions
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM actions")
+            self._conn.executemany("INSERT INTO actions (path, action, kind, size, reason) VALUES (?, ?, ?, ?, ?)",
+                                   [(path,) + action for path, action in actions.items()])
+            self._conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                   [("command", command), ("created", str(time.time()))])
+
+    def _meta(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @property
+    def command(self):
+        return self._meta("command")
+
+    @property
+    def created(self):
+        value = self._meta("created")
+        return float(value) if value else None
+
+    def summary(self):
+        """
+        Count the planned actions
+
+        Returns:
+            dict: {action: (count, bytes)} for file actions, plus 'dirs' for
+                directories to create
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT action, kind, COUNT(*), COALESCE(SUM(size), 0) "
+                                      "FROM actions GROUP BY action, kind").fetchall()
+        summary = {ACTION_COPY: (0, 0), ACTION_DELETE: (0, 0), ACTION_SKIP: (0, 0), "dirs": 0}
+        for action, kind, count, size in rows:
+            if kind == KIND_DIR and action == ACTION_COPY:
+                summary["dirs"] = count
+                continue
+            previous = summary[action]
+            summary[action] = (previous[0] + count, previous[1] + size)
+        return summary
+
+    def actions(self, action=None):
+        """
+        Get planned actions
+
+        Returns:
+            list: (path, action, kind, size) tuples ordered by path
+        """
+        query = "SELECT path, action, kind, size FROM actions"
+        args = ()
+        if action:
+            query += " WHERE action = ?"
+            args = (action,)
+        with self._lock:
+            return self._conn.execute(query + " ORDER BY path", args).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def balance_chunks(items, count):
+    """
+    Split sized items into chunks of about equal total size
+
+    Largest items are placed first, each into the chunk that is smallest so
+    far (longest-processing-time scheduling).
+
+    Args:
+        items (list): (payload, size) tuples
+        count (int): Number of chunks
+
+    Returns:
+        list: Non-empty lists of payloads
+    """
+    heap = [(0, index, []) for index in range(max(1, count))]
+    for payload, size in sorted(items, key=lambda item: item[1], reverse=True):
+        total, index, chunk = heapq.heappop(heap)
+        chunk.append(payload)
+        heapq.heappush(heap, (total + size, index, chunk))
+    return [chunk for _, _, chunk in sorted(heap, key=lambda entry: entry[1]) if chunk]
+
+
+class PlanExecutionJob(PythonCopyJob):
+    """Executes a stored plan with the Python engine"""
+
+    def __init__(self, options, actions, copy_files=True, **kwargs):
+        """
+        Args:
+            options (dict): Options of the execution command (parse_command)
+            actions (list): CopyPlan.actions() tuples
+            copy_files (bool): False to apply only the planned deletions
+                (the copies are done by robocopy.exe)
+        """
+        super().__init__(options, **kwargs)
+        self.actions = actions
+        self.copy_files = copy_files
+
+    def run(self):
+        opts = self.options
+        source, dest = opts["source_path"], opts["dest_path"]
+        self._emit_header(source, dest)
+        start_time = time.time()
+        self._register_thread()
+        try:
+            self._apply_deletions(dest)
+            for path, action, kind, _ in self.actions:
+                if action == ACTION_COPY and kind == KIND_DIR and not self.stop_event.is_set():
+                    self._create_dir(dest, path)
+            if self.copy_files and not self.stop_event.is_set():
+                copies = [(path, size) for path, action, kind, size in self.actions
+                          if action == ACTION_COPY and kind == KIND_FILE]
+                self._add(files_total=len(copies), bytes_total=sum(size for _, size in copies))
+                threads = max(1, int(opts.get("threads") or 1))
+                chunks = balance_chunks(copies, threads)
+                if self.executor is not None:
+                    futures = [self.executor.submit(self._pooled, self._copy_chunk, chunk, source, dest)
+                               for chunk in chunks]
+                    for future in futures:
+                        future.result()
+                else:
+                    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="pycopy",
+                                            initializer=self._register_thread) as pool:
+                        list(pool.map(lambda chunk: self._copy_chunk(chunk, source, dest), chunks))
+
+            if self.stop_event.is_set():
+                return TERMINATED_RETURN_CODE
+            self._emit_summary(time.time() - start_time)
+            return self.exit_code()
+        finally:
+            if self.executor is not None:
+                # The thread running the job is pooled as well
+                self._release_thread()
+
+    def _apply_deletions(self, dest):
+        deletions = [(path, kind, size) for path, action, kind, size in self.actions if action == ACTION_DELETE]
+        # Files first, then directories deepest first
+        deletions.sort(key=lambda item: (item[1] == KIND_DIR, -item[0].count(os.sep)))
+        for rel_path, kind, size in deletions:
+            if self.stop_event.is_set():
+                return
+            self.run_gate.wait()
+            path = os.path.join(dest, rel_path)
+            if kind == KIND_DIR:
+                self._add(dirs_extra=1)
+                self.emit(CopyEvent(EVENT_EXTRA_DIR, path + os.sep, 0))
+            else:
+                self._add(files_extra=1, bytes_extra=size)
+                self.emit(CopyEvent(EVENT_EXTRA_FILE, path, size))
+            try:
+                if kind == KIND_DIR:
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                self._report_failure("Deleting Extra " + ("Directory" if kind == KIND_DIR else "File"), path, e)
+
+    def _create_dir(self, dest, rel_dir):
+        path = os.path.join(dest, rel_dir)
+        self._add(dirs_total=1, dirs_copied=1)
+        self.emit(CopyEvent(EVENT_NEW_DIR, path + os.sep, 0))
+        try:
+            os.makedirs(path, exist_ok=True)
+        except OSError as e:
+            self._report_failure("Creating Destination Directory", path, e)
+            self._add(dirs_failed=1)
+
+    def _copy_chunk(self, chunk, source, dest):
+        for rel_path in chunk:
+            if self.stop_event.is_set():
+                return
+            self.run_gate.wait()
+            src = os.path.join(source, rel_path)
+            try:
+                size = os.stat(src).st_size
+            except OSError as e:
+                # The source changed since the plan was made
+                self._report_failure("Copying File", src, e)
+                self._add(files_failed=1)
+                continue
+            self.emit(CopyEvent(EVENT_NEW_FILE, src, size))
+            self._copy_with_retries(os.path.dirname(rel_path), src, os.path.join(dest, rel_path), size)
+
+
+class PlanEngine:
+    """Engine that runs a PlanExecutionJob; used through the job supervisor"""
+
+    name = "python"
+
+    def __init__(self, actions, copy_files=True, throttle=None):
+        self.actions = actions
+        self.copy_files = copy_files
+        self.throttle = throttle
+
+    def create_job(self, command, executor=None):
+        return PlanExecutionJob(parse_command(command), self.actions, copy_files=self.copy_files,
+                                throttle=self.throttle, executor=executor)
+
+
+def robocopy_plan_batches(command, actions):
+    """
+    Build the robocopy.exe commands that carry out the copies of a plan
+
+    Args:
+        command (str): Execution command of the plan
+        actions (list): CopyPlan.actions() tuples
+
+    Returns:
+        list: (command, bytes) tuples, largest first
+    """
+    options = parse_command(command)
+    _, file_switches = batch_switches(options)
+    by_dir = {}
+    for path, action, kind, size in actions:
+        if action == ACTION_COPY and kind == KIND_FILE:
+            by_dir.setdefault(os.path.dirname(path), []).append((os.path.basename(path), size))
+    batches = []
+    for rel_dir, files in by_dir.items():
+        for batch, sizes in file_batches(options["source_path"], options["dest_path"], rel_dir,
+                                         sorted(files), file_switches):
+            batches.append((batch, sum(sizes)))
+    batches.sort(key=lambda batch: batch[1], reverse=True)
+    return batches
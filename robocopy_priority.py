@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+CPU and I/O priority control for ROBOCOPY GUI jobs
+
+robocopy.exe jobs are separate processes; their priority is set through
+psutil (optional) on the process and its children. Python engine jobs run
+inside the GUI process, so their priority is applied per thread (walker and
+copy workers) and the GUI itself keeps normal priority. Per-thread control
+uses the Linux thread-level nice value and ioprio_set; on other systems it
+is not available and only robocopy.exe jobs can be re-prioritized.
+
+UsageMonitor samples the CPU time and storage I/O of a job so the effect of
+a priority change can be checked on the Monitoring tab.
+"""
+
+import os
+import time
+import ctypes
+import logging
+import platform
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+CPU_PRIORITIES = ("normal", "below_normal", "low", "idle")
+IO_PRIORITIES = ("normal", "low", "idle")
+
+# Linux nice values per CPU priority
+_NICE_VALUES = {"normal": 0, "below_normal": 5, "low": 10, "idle": 19}
+
+# Linux I/O scheduling (class, level) per I/O priority
+_IOPRIO_CLASS_BE = 2
+_IOPRIO_CLASS_IDLE = 3
+_IOPRIO_CLASS_SHIFT = 13
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_VALUES = {"normal": (_IOPRIO_CLASS_BE, 4), "low": (_IOPRIO_CLASS_BE, 7), "idle": (_IOPRIO_CLASS_IDLE, 0)}
+_IOPRIO_SET_SYSCALLS = {"x86_64": 251, "aarch64": 30, "i386": 289, "i686": 289, "armv7l": 314, "ppc64le": 273}
+
+logger = logging.getLogger(__name__)
+_libc = None
+
+
+def thread_priority_supported():
+    """Check whether individual threads can be re-prioritized on this system"""
+    return platform.system() == "Linux" and hasattr(os, "setpriority")
+
+
+def _ioprio_set(tid, io_priority):
+    global _libc
+    number = _IOPRIO_SET_SYSCALLS.get(platform.machine())
+    if number is None:
+        return False
+    if _libc is None:
+        _libc = ctypes.CDLL(None, use_errno=True)
+    io_class, level = _IOPRIO_VALUES[io_priority]
+    if _libc.syscall(number, _IOPRIO_WHO_PROCESS, tid, (io_class << _IOPRIO_CLASS_SHIFT) | level) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    return True
+
+
+def set_thread_priority(tid, cpu_priority="normal", io_priority="normal"):
+    """
+    Set the CPU and I/O priority of one thread (Linux)
+
+    Going back to a higher priority needs administrator rights; the error is
+    logged and the thread keeps its current priority.
+
+    Args:
+        tid (int): Native thread id (threading.get_native_id)
+        cpu_priority (str): One of CPU_PRIORITIES
+        io_priority (str): One of IO_PRIORITIES
+
+    Returns:
+        bool: True if both priorities were applied
+    """
+    if not thread_priority_supported():
+        return False
+    applied = True
+    try:
+        os.setpriority(os.PRIO_PROCESS, tid, _NICE_VALUES[cpu_priority])
+    except ProcessLookupError:
+        return False
+    except OSError as e:
+        logger.warning(f"Could not set CPU priority '{cpu_priority}' for thread {tid}: {e}")
+        applied = False
+    try:
+        applied = _ioprio_set(tid, io_priority) and applied
+    except ProcessLookupError:
+        return False
+    except OSError as e:
+        logger.warning(f"Could not set I/O priority '{io_priority}' for thread {tid}: {e}")
+        applied = False
+    return applied
+
+
+def _psutil_priorities(cpu_priority, io_priority):
+    if platform.system() == "Windows":
+        cpu = {"normal": psutil.NORMAL_PRIORITY_CLASS, "below_normal": psutil.BELOW_NORMAL_PRIORITY_CLASS,
+               "low": psutil.IDLE_PRIORITY_CLASS, "idle": psutil.IDLE_PRIORITY_CLASS}[cpu_priority]
+        io = {"normal": (psutil.IOPRIO_NORMAL,), "low": (psutil.IOPRIO_LOW,),
+              "idle": (psutil.IOPRIO_VERYLOW,)}[io_priority]
+        return cpu, io
+    io = None
+    if hasattr(psutil, "IOPRIO_CLASS_BE"):
+        io_class, level = _IOPRIO_VALUES[io_priority]
+        io = (psutil.IOPRIO_CLASS_IDLE,) if io_class == _IOPRIO_CLASS_IDLE else (psutil.IOPRIO_CLASS_BE, level)
+    return _NICE_VALUES[cpu_priority], io
+
+
+def set_process_priority(process, cpu_priority="normal", io_priority="normal"):
+    """
+    Set the CPU and I/O priority of a running job
+
+    Args:
+        process: Handle returned by an engine's start()
+        cpu_priority (str): One of CPU_PRIORITIES
+        io_priority (str): One of IO_PRIORITIES
+
+    Returns:
+        bool: False if the priority could not be changed on this system
+    """
+    if cpu_priority not in CPU_PRIORITIES or io_priority not in IO_PRIORITIES:
+        raise ValueError(f"Unknown priority: {cpu_priority}/{io_priority}")
+    if hasattr(process, "set_priority"):
+        return process.set_priority(cpu_priority, io_priority)
+    if psutil is None:
+        return False
+
+    cpu, io = _psutil_priorities(cpu_priority, io_priority)
+    try:
+        parent = psutil.Process(process.pid)
+        for proc in [parent] + parent.children(recursive=True):
+            proc.nice(cpu)
+            if io is not None:
+                proc.ionice(*io)
+        return True
+    except psutil.Error as e:
+        logger.warning(f"Could not set priority of process {process.pid}: {e}")
+        return False
+
+
+def _read_thread_counters(tids):
+    """CPU seconds and storage bytes read/written by threads of this process (Linux)"""
+    ticks = os.sysconf("SC_CLK_TCK")
+    cpu = read = write = 0
+    for tid in tids:
+        base = f"/proc/self/task/{tid}"
+        try:
+            with open(f"{base}/stat", "r") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu += (int(fields[11]) + int(fields[12])) / ticks
+            with open(f"{base}/io", "r") as f:
+                for line in f:
+                    key, _, value = line.partition(":")
+                    if key == "read_bytes":
+                        read += int(value)
+                    elif key == "write_bytes":
+                        write += int(value)
+        except (OSError, IndexError, ValueError):
+            continue
+    return cpu, read, write
+
+
+def _read_process_counters(pid):
+    """CPU seconds and bytes read/written by a process and its children (psutil)"""
+    parent = psutil.Process(pid)
+    cpu = read = write = 0
+    for proc in [parent] + parent.children(recursive=True):
+        try:
+            times = proc.cpu_times()
+            cpu += times.user + times.system
+            io = proc.io_counters()
+            read += io.read_bytes
+            write += io.write_bytes
+        except (psutil.Error, AttributeError):
+            continue
+    return cpu, read, write
+
+
+class UsageMonitor:
+    """Samples the effective CPU and I/O usage of a running job"""
+
+    def __init__(self, process):
+        """
+        Args:
+            process: Handle returned by an engine's start()
+        """
+        self.process = process
+        self._last = None
+        self._totals = {}
+
+    def _counters(self):
+        if hasattr(self.process, "native_ids"):
+            if not thread_priority_supported():
+                return None
+            # Finished worker threads drop out of /proc, so keep their last totals
+            for tid in self.process.native_ids():
+                counters = _read_thread_counters([tid])
+                if counters != (0, 0, 0):
+                    self._totals[tid] = counters
+            return tuple(sum(values) for values in zip(*self._totals.values())) if self._totals else (0, 0, 0)
+        if psutil is None:
+            return None
+        try:
+            return _read_process_counters(self.process.pid)
+        except psutil.Error:
+            return None
+
+    def sample(self):
+        """
+        Measure usage since the previous sample
+
+        Returns:
+            dict or None: cpu_percent (100 = one core), read_mbps, write_mbps;
+                None when usage cannot be measured or on the first sample
+        """
+        counters = self._counters()
+        now = time.monotonic()
+        if counters is None:
+            return None
+        last, self._last = self._last, (now, counters)
+        if last is None or now <= last[0]:
+            return None
+        elapsed = now - last[0]
+        cpu, read, write = (max(0, new - old) for new, old in zip(counters, last[1]))
+        return {
+            "cpu_percent": cpu / elapsed * 100,
+            "read_mbps": read / elapsed / (1024 * 1024),
+            "write_mbps": write / elapsed / (1024 * 1024),
+        }
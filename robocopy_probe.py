@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Timeout-guarded filesystem probes for ROBOCOPY GUI
+
+Checking whether a path exists can block for the OS network timeout when the
+share behind it is unreachable. A PathProber runs such checks on a small
+worker pool instead; the caller either polls the returned Probe from a Tk
+timer or waits at most until the probe's deadline.
+
+A probe's deadline starts when a worker starts it. A probe that misses its
+deadline is abandoned and raises PathUnreachable. Its share - the UNC root,
+or the path itself where there is none - and everything below it is then
+reported unreachable without probing again for a short time, so a hung share
+does not tie up more workers. A probe that waited too long for a worker
+(all of them hanging on stalled shares) is cancelled and raises ProberBusy
+instead: nothing is known about its own path.
+
+All probes go through a filesystem object. LocalFilesystem uses the os
+module; LatencyFilesystem wraps it and delays or hangs calls for chosen
+paths, so slow and unreachable shares can be tried on a local disk:
+
+    prober = PathProber(fs=LatencyFilesystem(delay=10, prefixes=["/tmp/slow"]))
+"""
+
+import os
+import stat
+import shutil
+import time
+import errno
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeout
+
+# Seconds a probe may take before its path counts as unreachable
+PROBE_TIMEOUT = 3.0
+
+# Seconds a probe may wait for a free worker
+PROBE_QUEUE_TIMEOUT = 5.0
+
+# Seconds an unreachable share is reported without probing it again
+UNREACHABLE_TTL = 15.0
+
+PROBE_WORKERS = 4
+
+STATUS_MISSING = "missing"
+STATUS_DIR = "dir"
+STATUS_FILE = "file"
+STATUS_OTHER = "other"
+
+
+class PathUnreachable(OSError):
+    """A filesystem probe did not finish before its deadline"""
+
+    def __init__(self, path, timeout):
+        super().__init__(errno.ETIMEDOUT, f"No response within {timeout:g}s", path)
+        self.timeout = timeout
+
+
+class ProberBusy(OSError):
+    """A filesystem probe could not start because every worker was busy"""
+
+    def __init__(self, path, waited):
+        super().__init__(errno.EBUSY, f"Queued behind stalled probes for {waited:g}s", path)
+        self.waited = waited
+
+
+class LocalFilesystem:
+    """The filesystem calls used by probes, backed by the os module"""
+
+    def stat(self, path):
+        return os.stat(path)
+
+    def scandir(self, path):
+        return os.scandir(path)
+
+    def open(self, path, mode="rb"):
+        return open(path, mode)
+
+    def disk_usage(self, path):
+        return shutil.disk_usage(path)
+
+
+class LatencyFilesystem(LocalFilesystem):
+    """
+    Test double that makes some paths slow or unreachable
+
+    Calls for paths under one of the prefixes (all paths if none are given)
+    are delayed by delay seconds first; with hang set they block until
+    release() is called, like a share that never answers.
+    """
+
+    def __init__(self, delay=0.0, prefixes=None, hang=False):
+        self.delay = delay
+        self.prefixes = [os.path.normcase(os.path.abspath(p)) for p in prefixes or []]
+        self.hang = hang
+        self.calls = 0
+        self._released = threading.Event()
+
+    def _matches(self, path):
+        if not self.prefixes:
+            return True
+        path = os.path.normcase(os.path.abspath(path))
+        return any(path == prefix or path.startswith(prefix.rstrip(os.sep) + os.sep)
+                   for prefix in self.prefixes)
+
+    def _wait(self, path):
+        self.calls += 1
+        if not self._matches(path):
+            return
+        if self.hang:
+            self._released.wait()
+        elif self.delay > 0:
+            time.sleep(self.delay)
+
+    def release(self):
+        """Let hanging calls continue"""
+        self._released.set()
+
+    def stat(self, path):
+        self._wait(path)
+        return super().stat(path)
+
+    def scandir(self, path):
+        self._wait(path)
+        return super().scandir(path)
+
+    def open(self, path, mode="rb"):
+        self._wait(path)
+        return super().open(path, mode)
+
+    def disk_usage(self, path):
+        self._wait(path)
+        return super().disk_usage(path)
+
+
+def path_status(fs, path):
+    """Get whether a path is missing, a directory, a file or something else"""
+    try:
+        mode = fs.stat(path).st_mode
+    except (FileNotFoundError, NotADirectoryError):
+        return STATUS_MISSING
+    if stat.S_ISDIR(mode):
+        return STATUS_DIR
+    if stat.S_ISREG(mode):
+        return STATUS_FILE
+    return STATUS_OTHER
+
+
+def destination_status(fs, path):
+    """
+    Get path_status of a destination and, if it is missing, of its parent
+
+    Returns:
+        tuple: (status, parent status or None)
+    """
+    status = path_status(fs, path)
+    if status != STATUS_MISSING:
+        return status, None
+    parent = os.path.dirname(path)
+    return status, path_status(fs, parent) if parent else STATUS_MISSING
+
+
+def share_key(path):
+    """Key under which unreachability is remembered: the UNC share, else the path"""
+    path = os.path.normcase(os.path.abspath(path))
+    drive = os.path.splitdrive(path)[0]
+    if drive[:2] in ("\\\\", "//"):
+        return drive
+    return path
+
+
+class Probe:
+    """A filesystem probe running on the prober's workers"""
+
+    def __init__(self, prober, path, timeout, queue_timeout):
+        self.prober = prober
+        self.path = path
+        self.future = None
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.submitted = time.monotonic()
+        # Set by the worker when it starts the probe
+        self.started = None
+        self._queue_expired = False
+
+    def _run(self, func, fs, *args):
+        self.started = time.monotonic()
+        return func(fs, self.path, *args)
+
+    def _deadline(self, started):
+        if started is None:
+            return self.submitted + self.queue_timeout
+        return started + self.timeout
+
+    def done(self):
+        """True once the probe finished or its deadline passed (never blocks)"""
+        if self.future.done():
+            return True
+        started = self.started
+        if time.monotonic() < self._deadline(started):
+            return False
+        if started is None:
+            # result() must not wait for a probe that only starts now
+            self._queue_expired = True
+        return True
+
+    def result(self):
+        """
+        Get the probe result, waiting at most until the deadline
+
+        Raises:
+            PathUnreachable: The probe did not finish in time
+            ProberBusy: The probe did not get a worker in time
+        """
+        while True:
+            started = self.started
+            try:
+                return self.future.result(timeout=max(0.0, self._deadline(started) - time.monotonic()))
+            except FutureTimeout:
+                pass
+            if started is None and self.started is not None and not self._queue_expired:
+                # It got a worker while we waited: its own deadline applies
+                continue
+            self.cancel()
+            if started is None:
+                raise ProberBusy(self.path, self.queue_timeout) from None
+            self.prober.mark_unreachable(self.path)
+            raise PathUnreachable(self.path, self.timeout) from None
+
+    def cancel(self):
+        """Abandon the probe; it is only stopped if it has not started yet"""
+        self.future.cancel()
+
+
+class PathProber:
+    """Runs filesystem probes on a worker pool with per-call deadlines"""
+
+    def __init__(self, fs=None, timeout=PROBE_TIMEOUT, unreachable_ttl=UNREACHABLE_TTL,
+                 max_workers=PROBE_WORKERS, queue_timeout=PROBE_QUEUE_TIMEOUT):
+        """
+        Args:
+            fs: Filesystem used by probes (defaults to LocalFilesystem)
+            timeout (float): Default seconds a probe may take once it started
+            queue_timeout (float): Seconds a probe may wait for a free worker
+            unreachable_ttl (float): Seconds a share that timed out is reported
+                unreachable without probing it again
+        """
+        self.fs = fs or LocalFilesystem()
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.unreachable_ttl = unreachable_ttl
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._unreachable = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="probe")
+
+    def is_unreachable(self, path):
+        """True while a recent probe of the path's share, or of a folder above it, timed out"""
+        key = share_key(path)
+        now = time.monotonic()
+        with self._lock:
+            for expired in [k for k, until in self._unreachable.items() if now >= until]:
+                del self._unreachable[expired]
+            while True:
+                if key in self._unreachable:
+                    return True
+                parent = os.path.dirname(key)
+                if parent == key:
+                    return False
+                key = parent
+
+    def mark_unreachable(self, path):
+        with self._lock:
+            self._unreachable[share_key(path)] = time.monotonic() + self.unreachable_ttl
+        self.logger.warning(f"No response from {path}; treating it as unreachable "
+                            f"for {self.unreachable_ttl:g}s")
+
+    def submit(self, func, path, *args, timeout=None):
+        """
+        Start a probe
+
+        Args:
+            func (callable): Called as func(fs, path, *args) on a worker
+            path (str): Path probed
+            timeout (float): Seconds allowed once a worker started it (defaults to the prober's timeout)
+
+        Returns:
+            Probe: Poll with done(), then get the value with result()
+        """
+        timeout = self.timeout if timeout is None else timeout
+        probe = Probe(self, path, timeout, self.queue_timeout)
+        if self.is_unreachable(path):
+            # Fail at once instead of queueing behind the calls still hanging there
+            probe.future = Future()
+            probe.future.set_exception(PathUnreachable(path, timeout))
+        else:
+            probe.future = self._executor.submit(probe._run, func, self.fs, *args)
+        return probe
+
+    def call(self, func, path, *args, timeout=None):
+        """
+        Run a probe and wait for its result (at most until its deadline)
+
+        Raises:
+            PathUnreachable: The probe did not finish in time
+            ProberBusy: The probe did not get a worker in time
+        """
+        return self.submit(func, path, *args, timeout=timeout).result()
+
+    def status(self, path, timeout=None):
+        """Get path_status for a path (see call)"""
+        return self.call(path_status, path, timeout=timeout)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Run-over-run performance regression detection for ROBOCOPY GUI
+
+The baseline of a job is built from its last BASELINE_RUNS completed copy
+runs in the run history: the median and the spread (median absolute
+deviation) of their duration and of their average throughput. A run has
+regressed when it took REGRESSION_FACTOR times the median duration or more,
+or reached the median throughput divided by that factor or less - and, so
+that jobs whose runs always vary a lot are not flagged for their usual
+variation, the difference is also more than SPREAD_LIMIT spreads.
+
+Runs that copied too little for a meaningful throughput, and duration
+increases of less than MIN_DURATION_INCREASE, are never flagged. A baseline
+needs MIN_BASELINE_RUNS runs.
+"""
+
+from robocopy_checkpoint import STATUS_COMPLETED
+from robocopy_history import KIND_COPY
+
+BASELINE_RUNS = 20
+MIN_BASELINE_RUNS = 3
+
+REGRESSION_FACTOR = 1.5
+SPREAD_LIMIT = 3.0
+
+# Runs copying less than this have no meaningful throughput
+MIN_THROUGHPUT_BYTES = 16 * 1024 * 1024
+
+# Seconds a run must take longer than usual before its duration counts as a regression
+MIN_DURATION_INCREASE = 60
+
+# Runs shown in the trend view
+TREND_RUNS = 50
+
+METRIC_DURATION = "duration"
+METRIC_THROUGHPUT = "throughput"
+
+
+def run_duration(run):
+    """Seconds a run took, None if it did not finish"""
+    if run.get("ended") is None:
+        return None
+    return max(0.0, run["ended"] - run["started"])
+
+
+def run_throughput(run):
+    """Average MB/s of a run, None if it copied too little to tell"""
+    if not run.get("avg_mbps") or (run.get("bytes") or 0) < MIN_THROUGHPUT_BYTES:
+        return None
+    return run["avg_mbps"]
+
+
+def median(values):
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2
+
+
+def _center_and_spread(values):
+    if len(values) < MIN_BASELINE_RUNS:
+        return None
+    center = median(values)
+    return center, median([abs(value - center) for value in values])
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class Baseline:
+    """Median and spread of the duration and throughput of a job's earlier runs"""
+
+    def __init__(self, runs):
+        """
+        Args:
+            runs (list): Earlier completed copy runs of the job (run history dictionaries)
+        """
+        self.runs = len(runs)
+        self.duration = _center_and_spread([d for d in map(run_duration, runs) if d is not None])
+        self.throughput = _center_and_spread([t for t in map(run_throughput, runs) if t is not None])
+
+    def check(self, run, factor=REGRESSION_FACTOR, spread_limit=SPREAD_LIMIT):
+        """
+        Compare a run with the baseline
+
+        Returns:
+            list: Regressions, dictionaries with 'metric' (METRIC_DURATION or
+                METRIC_THROUGHPUT), 'value', 'median' and 'ratio' (value / median)
+        """
+        regressions = []
+        duration = run_duration(run)
+        if self.duration is not None and duration is not None:
+            center, spread = self.duration
+            if (duration >= center * factor and duration - center > spread_limit * spread
+                    and duration - center >= MIN_DURATION_INCREASE):
+                regressions.append({"metric": METRIC_DURATION, "value": duration, "median": center,
+                                    "ratio": duration / center if center else float("inf")})
+        throughput = run_throughput(run)
+        if self.throughput is not None and throughput is not None:
+            center, spread = self.throughput
+            if throughput * factor <= center and center - throughput > spread_limit * spread:
+                regressions.append({"metric": METRIC_THROUGHPUT, "value": throughput, "median": center,
+                                    "ratio": throughput / center})
+        return regressions
+
+
+def describe_regression(regression):
+    """One line describing a regression for the summary"""
+    if regression["metric"] == METRIC_DURATION:
+        ratio = regression["ratio"]
+        times = f"{ratio:.1f}x" if ratio != float("inf") else "far more than"
+        return (f"Took {format_duration(regression['value'])}, {times} the usual "
+                f"{format_duration(regression['median'])}")
+    return (f"Averaged {regression['value']:.1f} MB/s, {regression['ratio']:.0%} of the usual "
+            f"{regression['median']:.1f} MB/s")
+
+
+def comparable(run):
+    """Check whether a run is compared with its job's baseline (completed copy runs)"""
+    return bool(run.get("job")) and run.get("kind") == KIND_COPY and run.get("status") == STATUS_COMPLETED
+
+
+def detect(history, run, baseline_runs=BASELINE_RUNS):
+    """
+    Compare a finished run with the runs of its job before it
+
+    Args:
+        history (RunHistory): Run history
+        run (dict): The finished run
+
+    Returns:
+        tuple: (Baseline or None, list of regressions from Baseline.check)
+    """
+    if not comparable(run):
+        return None, []
+    baseline = Baseline(history.job_runs(run["job"], baseline_runs, before=run["started"]))
+    return baseline, baseline.check(run)
+
+
+def trend(history, job, runs=TREND_RUNS, baseline_runs=BASELINE_RUNS):
+    """
+    Get a job's latest runs, each compared with the runs before it
+
+    Returns:
+        list: (run, regressions) tuples, oldest first
+    """
+    history_runs = history.job_runs(job, runs + baseline_runs)
+    history_runs.reverse()
+    first = max(0, len(history_runs) - runs)
+    return [(run, Baseline(history_runs[max(0, index - baseline_runs):index]).check(run))
+            for index, run in enumerate(history_runs) if index >= first]
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Declarative validation rules for ROBOCOPY options
+
+Each Rule names the option fields it reads and a check that returns a
+message (or None) for their values. A RuleEngine evaluates a table of rules
+against option dictionaries and remembers every rule's answer per
+combination of its field values, so a rule only runs again when one of its
+own fields changed; regenerating the command after a checkbox change, or
+validating thousands of batch jobs that share most of their settings,
+mostly consists of dictionary lookups.
+"""
+
+import os
+import functools
+
+SEVERITY_WARNING = "warning"
+SEVERITY_ERROR = "error"
+
+GROUP_CONFLICTS = "conflicts"
+GROUP_RANGES = "ranges"
+GROUP_PATHS = "paths"
+
+# Values used for fields missing from an options dictionary (others default to None)
+FIELD_DEFAULTS = {
+    "retries": "0",
+    "wait_time": "30",
+    "threads": "8",
+    "source_path": "",
+    "dest_path": "",
+}
+
+# Remembered answers per rule before its memo is cleared
+MEMO_LIMIT = 4096
+
+
+class Rule:
+    """A validation rule over some option fields"""
+
+    def __init__(self, name, fields, check, severity=SEVERITY_ERROR, group=GROUP_CONFLICTS):
+        """
+        Args:
+            name (str): Rule identifier
+            fields (tuple): Option fields the rule reads
+            check (callable): Called with the field values; returns a message or None
+            severity (str): SEVERITY_WARNING or SEVERITY_ERROR
+            group (str): GROUP_CONFLICTS, GROUP_RANGES or GROUP_PATHS
+        """
+        self.name = name
+        self.fields = tuple(fields)
+        self.check = check
+        self.severity = severity
+        self.group = group
+
+    def __repr__(self):
+        return f"Rule({self.name!r}, {self.fields})"
+
+
+def check_numeric(value, field_name, min_val=0, max_val=None):
+    """
+    Validate a numeric input value
+
+    Returns:
+        tuple: (is_valid, error_message, converted_value)
+    """
+    if not value:
+        return False, f"{field_name} cannot be empty", None
+
+    try:
+        num_val = int(value)
+    except ValueError:
+        return False, f"{field_name} must be a number", None
+
+    if num_val < min_val:
+        return False, f"{field_name} must be at least {min_val}", None
+
+    if max_val is not None and num_val > max_val:
+        return False, f"{field_name} cannot exceed {max_val}", None
+
+    return True, "", num_val
+
+
+def _range_rule(name, field, label, min_val, max_val):
+    def check(value):
+        valid, error, _ = check_numeric(value, label, min_val, max_val)
+        return None if valid else error
+    return Rule(name, (field,), check, SEVERITY_ERROR, GROUP_RANGES)
+
+
+@functools.lru_cache(maxsize=MEMO_LIMIT)
+def _normalized(path):
+    return os.path.normpath(os.path.abspath(path)).lower()
+
+
+def _path_relation(source, dest):
+    """'same', 'dest_in_source', 'source_in_dest' or None; raises if a path cannot be normalized"""
+    norm_source = _normalized(source)
+    norm_dest = _normalized(dest)
+    if norm_source == norm_dest:
+        return "same"
+    if norm_dest.startswith(norm_source + os.sep):
+        return "dest_in_source"
+    if norm_source.startswith(norm_dest + os.sep):
+        return "source_in_dest"
+    return None
+
+
+def _check_same(source, dest):
+    if source and dest:
+        try:
+            if _path_relation(source, dest) == "same":
+                return "Source and destination cannot be the same directory."
+        except Exception:
+            return None
+    return None
+
+
+def _check_dest_in_source(source, dest):
+    if source and dest:
+        try:
+            if _path_relation(source, dest) == "dest_in_source":
+                return "Destination cannot be a subdirectory of source."
+        except Exception:
+            return None
+    return None
+
+
+def _check_source_in_dest(source, dest, mirror):
+    if source and dest:
+        try:
+            if mirror and _path_relation(source, dest) == "source_in_dest":
+                return "Source is subdirectory of destination with mirror mode. This may cause data loss."
+        except Exception as e:
+            return f"Could not validate path relationship: {str(e)}"
+    return None
+
+
+def _check_thread_count(threads):
+    valid, _, thread_val = check_numeric(threads, "Threads", 1, 128)
+    if valid and thread_val > 64:
+        return "High thread count may impact system performance."
+    return None
+
+
+RULES = [
+    Rule("mirror_with_s", ("mirror_mode", "copy_subdirs"),
+         lambda mirror, s: "Mirror mode (/MIR) includes subdirectory copying. /S option is redundant."
+         if mirror and s else None, SEVERITY_WARNING),
+    Rule("mirror_with_e", ("mirror_mode", "copy_empty_subdirs"),
+         lambda mirror, e: "Mirror mode (/MIR) includes empty subdirectories. /E option is redundant."
+         if mirror and e else None, SEVERITY_WARNING),
+    Rule("s_with_e", ("copy_subdirs", "copy_empty_subdirs"),
+         lambda s, e: "/E option includes /S functionality. /S option is redundant."
+         if s and e else None, SEVERITY_WARNING),
+    _range_rule("retries_range", "retries", "Retries", 0, 10000),
+    _range_rule("wait_range", "wait_time", "Wait time", 1, 3600),
+    _range_rule("threads_range", "threads", "Threads", 1, 128),
+    Rule("threads_high", ("threads",), _check_thread_count, SEVERITY_WARNING, GROUP_RANGES),
+    Rule("same_paths", ("source_path", "dest_path"), _check_same, SEVERITY_ERROR, GROUP_PATHS),
+    Rule("dest_in_source", ("source_path", "dest_path"), _check_dest_in_source, SEVERITY_ERROR, GROUP_PATHS),
+    Rule("source_in_dest", ("source_path", "dest_path", "mirror_mode"), _check_source_in_dest,
+         SEVERITY_WARNING, GROUP_PATHS),
+]
+
+
+class RuleEngine:
+    """Evaluates a rule table with memoized results"""
+
+    def __init__(self, rules=None, groups=None):
+        """
+        Args:
+            rules (list): Rules to evaluate (defaults to RULES)
+            groups (tuple): Only evaluate rules of these groups
+        """
+        rules = RULES if rules is None else rules
+        self.rules = [rule for rule in rules if groups is None or rule.group in groups]
+        self._memo = {rule.name: {} for rule in self.rules}
+        self.evaluations = 0
+
+    def evaluate(self, options):
+        """
+        Validate one options dictionary
+
+        Returns:
+            tuple: (is_valid, warnings_list, errors_list)
+        """
+        warnings = []
+        errors = []
+        for rule in self.rules:
+            values = tuple(options.get(field, FIELD_DEFAULTS.get(field)) for field in rule.fields)
+            memo = self._memo[rule.name]
+            try:
+                message = memo[values]
+            except KeyError:
+                self.evaluations += 1
+                message = rule.check(*values)
+                if len(memo) >= MEMO_LIMIT:
+                    memo.clear()
+                memo[values] = message
+            except TypeError:
+                # Unhashable field values are checked without the memo
+                self.evaluations += 1
+                message = rule.check(*values)
+            if message:
+                (errors if rule.severity == SEVERITY_ERROR else warnings).append(message)
+        return not errors, warnings, errors
+
+    def validate_batch(self, options_list):
+        """
+        Validate many options dictionaries (e.g. batch jobs)
+
+        Returns:
+            list: evaluate results in the order of options_list
+        """
+        return [self.evaluate(options) for options in options_list]
+
+
+def command_fields(options):
+    """
+    Option fields of a parsed ROBOCOPY command line (parse_command) for rule evaluation
+
+    Numeric switches keep their text, so malformed values are reported by
+    the range rules; switches that are absent are left to the defaults.
+    """
+    fields = {key: options[key] for key in ("source_path", "dest_path", "copy_subdirs",
+                                            "copy_empty_subdirs", "mirror_mode")}
+    for switch in options["switches"]:
+        name, colon, value = switch[1:].partition(":")
+        field = {"R": "retries", "W": "wait_time", "MT": "threads"}.get(name.upper())
+        if field and colon:
+            fields[field] = value
+    return fields
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Job scheduler for ROBOCOPY GUI
+
+Scheduled jobs refer to saved configuration files. A job can start at
+cron-like times, be restricted to allowed time windows, or both. The
+scheduler itself holds no threads: the GUI calls tick() from a Tk timer and
+carries out the actions it returns (start, suspend or resume a job), so the
+Tk loop is never blocked.
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+
+SCHEDULE_FILE = "robocopy_schedule.json"
+
+ACTION_START = "start"
+ACTION_SUSPEND = "suspend"
+ACTION_RESUME = "resume"
+
+DAY_NAMES = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+# Minutes of missed cron times still started after the GUI was busy or closed
+CATCH_UP_MINUTES = 5
+
+
+class ScheduleError(ValueError):
+    """Raised for an invalid cron expression or time window"""
+
+
+def _parse_cron_field(text, low, high, names=None):
+    values = set()
+    for part in text.lower().split(","):
+        step = 1
+        if "/" in part:
+            part, _, step_text = part.partition("/")
+            if not step_text.isdigit() or int(step_text) == 0:
+                raise ScheduleError(f"Invalid step in cron field: {text}")
+            step = int(step_text)
+
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            first, _, last = part.partition("-")
+            start, end = _cron_value(first, names), _cron_value(last, names)
+        else:
+            start = _cron_value(part, names)
+            end = high if step > 1 else start
+
+        if not (low <= start <= high and low <= end <= high) or start > end:
+            raise ScheduleError(f"Cron field out of range: {text}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def _cron_value(text, names):
+    if names and text[:3] in names:
+        return names.index(text[:3])
+    if not text.isdigit():
+        raise ScheduleError(f"Invalid cron value: {text}")
+    return int(text)
+
+
+class CronExpression:
+    """Five-field cron expression: minute hour day-of-month month day-of-week"""
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ScheduleError(f"Cron expression needs 5 fields: {expression}")
+        self.expression = expression
+        self.minutes = _parse_cron_field(fields[0], 0, 59)
+        self.hours = _parse_cron_field(fields[1], 0, 23)
+        self.days = _parse_cron_field(fields[2], 1, 31)
+        self.months = _parse_cron_field(fields[3], 1, 12)
+        # Cron numbers Sunday 0 (or 7); day names follow cron order
+        weekdays = _parse_cron_field(fields[4], 0, 7, ["sun", "mon", "tue", "wed", "thu", "fri", "sat"])
+        self.weekdays = {(day - 1) % 7 for day in weekdays}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def matches(self, when):
+        """Check whether a time (to the minute) matches the expression"""
+        if when.minute not in self.minutes or when.hour not in self.hours or when.month not in self.months:
+            return False
+        day_ok = when.day in self.days
+        weekday_ok = when.weekday() in self.weekdays
+        # As in cron, a restricted day-of-month and day-of-week match either
+        if self.any_day or self.any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, when, limit_days=366):
+        """
+        Get the first matching minute after a time
+
+        Returns:
+            datetime or None: None if nothing matches within limit_days
+        """
+        candidate = when.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        end = candidate + timedelta(days=limit_days)
+        while candidate < end:
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+                continue
+            if candidate.minute in self.minutes:
+                return candidate
+            candidate += timedelta(minutes=1)
+        return None
+
+    def _day_matches(self, when):
+        day_ok = when.day in self.days
+        weekday_ok = when.weekday() in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def __str__(self):
+        return self.expression
+
+
+class TimeWindow:
+    """
+    Daily time window such as "Mon-Fri 22:00-06:00" or "00:00-07:30"
+
+    A window that ends before it starts runs past midnight and belongs to the
+    day it starts on.
+    """
+
+    def __init__(self, text):
+        self.text = text.strip()
+        parts = self.text.split()
+        if len(parts) == 1:
+            days, span = set(range(7)), parts[0]
+        elif len(parts) == 2:
+            days, span = self._parse_days(parts[0]), parts[1]
+        else:
+            raise ScheduleError(f"Invalid time window: {text}")
+
+        start, sep, end = span.partition("-")
+        if not sep:
+            raise ScheduleError(f"Invalid time window: {text}")
+        self.days = days
+        self.start = self._parse_time(start)
+        self.end = self._parse_time(end)
+
+    @staticmethod
+    def _parse_days(text):
+        days = set()
+        for part in text.lower().split(","):
+            first, _, last = part.partition("-")
+            if first[:3] not in DAY_NAMES or (last and last[:3] not in DAY_NAMES):
+                raise ScheduleError(f"Invalid day in time window: {text}")
+            start = DAY_NAMES.index(first[:3])
+            end = DAY_NAMES.index(last[:3]) if last else start
+            day = start
+            days.add(day)
+            while day != end:
+                day = (day + 1) % 7
+                days.add(day)
+        return days
+
+    @staticmethod
+    def _parse_time(text):
+        hours, sep, minutes = text.partition(":")
+        if not sep or not hours.isdigit() or not minutes.isdigit():
+            raise ScheduleError(f"Invalid time: {text}")
+        value = int(hours) * 60 + int(minutes)
+        if int(hours) > 24 or int(minutes) > 59 or value > 24 * 60:
+            raise ScheduleError(f"Invalid time: {text}")
+        return value
+
+    def opened_at(self, when):
+        """
+        Get the time the window containing a moment opened
+
+        Returns:
+            datetime or None: None if the moment is outside the window
+        """
+        minute = when.hour * 60 + when.minute
+        today = when.replace(hour=0, minute=0, second=0, microsecond=0)
+        if self.start < self.end or self.start == self.end == 0:
+            if when.weekday() in self.days and self.start <= minute < (self.end or 24 * 60):
+                return today + timedelta(minutes=self.start)
+            return None
+        # Overnight window: either the part after today's start or the part
+        # before today's end that belongs to yesterday
+        if when.weekday() in self.days and minute >= self.start:
+            return today + timedelta(minutes=self.start)
+        if (when.weekday() - 1) % 7 in self.days and minute < self.end:
+            return today - timedelta(days=1) + timedelta(minutes=self.start)
+        return None
+
+    def contains(self, when):
+        return self.opened_at(when) is not None
+
+    def __str__(self):
+        return self.text
+
+
+class ScheduledJob:
+    """A saved configuration run on a schedule"""
+
+    def __init__(self, name, config_file, cron="", windows=None, enabled=True, last_run=None):
+        """
+        Args:
+            name (str): Unique job name
+            config_file (str): Saved configuration (JSON) to run
+            cron (str): Cron expression for start times ('' = start when a window opens)
+            windows (list): Allowed time window strings ([] = always allowed)
+            enabled (bool): Whether the scheduler considers the job
+            last_run (str): ISO time of the last scheduled start
+        """
+        self.name = name
+        self.config_file = config_file
+        self.cron = CronExpression(cron) if cron else None
+        self.windows = [TimeWindow(w) for w in (windows or [])]
+        self.enabled = enabled
+        self.last_run = datetime.fromisoformat(last_run) if last_run else None
+        if not self.cron and not self.windows:
+            raise ScheduleError(f"Job '{name}' needs a cron expression or a time window")
+
+    def window_opened_at(self, when):
+        """Opening time of the allowed window containing a moment (None if outside)"""
+        if not self.windows:
+            return datetime.min
+        openings = [w.opened_at(when) for w in self.windows]
+        openings = [o for o in openings if o is not None]
+        return max(openings) if openings else None
+
+    def in_window(self, when):
+        return self.window_opened_at(when) is not None
+
+    def is_due(self, when):
+        """
+        Check whether the job should start
+
+        Cron jobs are due when a matching minute inside an allowed window has
+        passed since their last start, looking back at most CATCH_UP_MINUTES.
+        Window-only jobs are due once per window opening.
+        """
+        if not self.enabled:
+            return False
+        opened = self.window_opened_at(when)
+        if opened is None:
+            return False
+        if self.cron:
+            minute = (when - timedelta(minutes=CATCH_UP_MINUTES)).replace(second=0, microsecond=0)
+            while minute <= when:
+                if minute >= opened and (self.last_run is None or minute > self.last_run) \
+                        and self.cron.matches(minute):
+                    return True
+                minute += timedelta(minutes=1)
+            return False
+        return self.last_run is None or self.last_run < opened
+
+    def next_run(self, when):
+        """Describe the next start time for display"""
+        if not self.enabled:
+            return "disabled"
+        if self.cron:
+            candidate = self.cron.next_after(when)
+            return candidate.strftime("%Y-%m-%d %H:%M") if candidate else "never"
+        return "when window opens" if not self.in_window(when) else "now"
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "config_file": self.config_file,
+            "cron": str(self.cron) if self.cron else "",
+            "windows": [str(w) for w in self.windows],
+            "enabled": self.enabled,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["name"], data["config_file"], data.get("cron", ""), data.get("windows", []),
+                   data.get("enabled", True), data.get("last_run"))
+
+
+class JobScheduler:
+    """Decides when scheduled jobs start, suspend and resume"""
+
+    def __init__(self, schedule_file=SCHEDULE_FILE):
+        self.schedule_file = schedule_file
+        self.logger = logging.getLogger(__name__)
+        self.jobs = []
+        self.active = None
+        self.suspended = False
+        self.load()
+
+    def load(self):
+        """Load scheduled jobs; invalid entries are logged and skipped"""
+        self.jobs = []
+        try:
+            with open(self.schedule_file, 'r') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Failed to load schedule: {e}")
+            return
+        for entry in entries:
+            try:
+                self.jobs.append(ScheduledJob.from_dict(entry))
+            except (KeyError, ValueError) as e:
+                self.logger.error(f"Skipping invalid scheduled job {entry.get('name')}: {e}")
+
+    def save(self):
+        try:
+            with open(self.schedule_file, 'w') as f:
+                json.dump([job.to_dict() for job in self.jobs], f, indent=2)
+        except OSError as e:
+            self.logger.error(f"Failed to save schedule: {e}")
+
+    def get(self, name):
+        for job in self.jobs:
+            if job.name == name:
+                return job
+        return None
+
+    def add(self, job):
+        """Add or replace a scheduled job"""
+        self.jobs = [j for j in self.jobs if j.name != job.name] + [job]
+        self.save()
+
+    def remove(self, name):
+        self.jobs = [j for j in self.jobs if j.name != name]
+        if self.active and self.active.name == name:
+            self.active = None
+            self.suspended = False
+        self.save()
+
+    def job_started(self, job, when):
+        self.active = job
+        self.suspended = False
+        job.last_run = when.replace(second=0, microsecond=0)
+        self.save()
+
+    def job_suspended(self):
+        self.suspended = True
+
+    def job_resumed(self):
+        self.suspended = False
+
+    def job_finished(self):
+        if self.active:
+            self.logger.info(f"Scheduled job '{self.active.name}' finished")
+        self.active = None
+        self.suspended = False
+
+    def tick(self, when=None, busy=False):
+        """
+        Work out what to do now
+
+        Args:
+            when (datetime): Current time (defaults to now)
+            busy (bool): A job not started by the scheduler is running
+
+        Returns:
+            list: (action, ScheduledJob) tuples for the caller to carry out
+        """
+        when = when or datetime.now()
+        actions = []
+
+        if self.active:
+            inside = self.active.in_window(when)
+            if not inside and not self.suspended:
+                actions.append((ACTION_SUSPEND, self.active))
+            elif inside and self.suspended:
+                actions.append((ACTION_RESUME, self.active))
+            return actions
+
+        if busy:
+            return actions
+        for job in self.jobs:
+            if job.is_due(when):
+                actions.append((ACTION_START, job))
+                break
+        return actions
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Destination free-space checks for ROBOCOPY GUI
+
+Before a job starts, the bytes it will write - taken from a copy plan, or
+estimated from the stored tree statistics of the source and destination -
+are compared with the free space of the destination volume.
+
+While it runs, a SpaceForecaster is fed free-space samples of the
+destination and fits the rate at which the space is used over the last
+minute. From that rate it forecasts when the volume will be full, so the GUI
+can warn early and pause the job before robocopy fails with ERROR 112
+("There is not enough space on the disk").
+"""
+
+import os
+import time
+from collections import deque
+
+# Seconds between free-space samples of a running job
+SPACE_SAMPLE_INTERVAL = 5.0
+
+# Samples older than this do not count towards the write rate
+FORECAST_WINDOW = 60.0
+
+# Space left free on the destination; the job is paused before it is used
+SPACE_MARGIN = 256 * 1024 * 1024
+
+# Free space needed before a job paused for lack of space is resumed; at
+# least enough for WARN_SECONDS of writing at the rate measured before the pause
+SPACE_RESUME_FREE = SPACE_MARGIN + 1024 * 1024 * 1024
+
+# Forecast time to full at which the GUI warns, and at which it pauses the job
+WARN_SECONDS = 15 * 60
+PAUSE_SECONDS = 30
+
+FORECAST_OK = "ok"
+FORECAST_WARN = "warn"
+FORECAST_PAUSE = "pause"
+
+
+def free_space(fs, path):
+    """
+    Get the free bytes of the volume a path is (or will be) on
+
+    The nearest existing folder is measured, so a destination that does not
+    exist yet is measured on its parent's volume. Runs as a PathProber probe.
+    """
+    path = os.path.abspath(path)
+    while True:
+        try:
+            fs.stat(path)
+            break
+        except (FileNotFoundError, NotADirectoryError):
+            parent = os.path.dirname(path)
+            if parent == path:
+                raise
+            path = parent
+    return fs.disk_usage(path).free
+
+
+def estimate_needed(source_summary, dest_summary=None):
+    """
+    Estimate the bytes a copy adds to the destination from tree statistics
+
+    Files already on the destination are assumed to be copies of source
+    files, so their bytes are not needed again.
+
+    Returns:
+        int or None: Bytes needed, None without source statistics
+    """
+    if source_summary is None:
+        return None
+    existing = dest_summary["bytes"] if dest_summary is not None else 0
+    return max(0, source_summary["bytes"] - existing)
+
+
+class SpaceForecaster:
+    """Forecasts when the destination of a running job will be full"""
+
+    def __init__(self, window=FORECAST_WINDOW, margin=SPACE_MARGIN, resume_free=SPACE_RESUME_FREE,
+                 warn_seconds=WARN_SECONDS, pause_seconds=PAUSE_SECONDS):
+        self.window = window
+        self.margin = margin
+        self.resume_free = resume_free
+        self.warn_seconds = warn_seconds
+        self.pause_seconds = pause_seconds
+        self.paused_rate = None
+        self._samples = deque()
+
+    def add(self, free, when=None):
+        """Record a free-space sample (bytes)"""
+        when = time.monotonic() if when is None else when
+        self._samples.append((when, free))
+        while self._samples and when - self._samples[0][0] > self.window:
+            self._samples.popleft()
+
+    def paused(self):
+        """Note that the job was paused; the samples taken so far are dropped"""
+        self.paused_rate = self.rate() or 0.0
+        self._samples.clear()
+
+    def resumed(self):
+        self.paused_rate = None
+        self._samples.clear()
+
+    def can_resume(self):
+        """True once a paused job has room again for WARN_SECONDS of writing at its previous rate"""
+        free = self.free
+        if free is None:
+            return False
+        needed = max(self.resume_free, self.margin + (self.paused_rate or 0.0) * self.warn_seconds)
+        return free >= needed
+
+    @property
+    def free(self):
+        return self._samples[-1][1] if self._samples else None
+
+    def rate(self):
+        """Bytes per second the free space shrinks by (least-squares fit), None without enough samples"""
+        if len(self._samples) < 2:
+            return None
+        count = len(self._samples)
+        mean_t = sum(t for t, _ in self._samples) / count
+        mean_f = sum(f for _, f in self._samples) / count
+        variance = sum((t - mean_t) ** 2 for t, _ in self._samples)
+        if variance <= 0:
+            return None
+        slope = sum((t - mean_t) * (f - mean_f) for t, f in self._samples) / variance
+        return -slope
+
+    def seconds_left(self):
+        """Forecast seconds until only the margin is left, None if the space is not shrinking"""
+        free, rate = self.free, self.rate()
+        if free is None or not rate or rate <= 0:
+            return None
+        return max(0.0, (free - self.margin) / rate)
+
+    def state(self):
+        """FORECAST_OK, FORECAST_WARN or FORECAST_PAUSE"""
+        free = self.free
+        if free is None:
+            return FORECAST_OK
+        if free <= self.margin:
+            return FORECAST_PAUSE
+        seconds = self.seconds_left()
+        if seconds is None:
+            return FORECAST_OK
+        if seconds <= self.pause_seconds:
+            return FORECAST_PAUSE
+        if seconds <= self.warn_seconds:
+            return FORECAST_WARN
+        return FORECAST_OK
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Non-blocking stop for ROBOCOPY GUI jobs
+
+Stopping a job goes through a small state machine instead of sleeping and
+waiting on the Tk thread:
+
+    requested -> terminating -> killing -> draining -> finalized
+
+step() only polls and never waits, so it can be driven from a Tk timer. Each
+transition is reported through the GUI output queue; the final
+('control', STOP_FINALIZED_MESSAGE) item tells the GUI that all output has
+been read and the statistics can be finalized.
+"""
+
+import time
+import logging
+
+STOP_IDLE = "idle"
+STOP_REQUESTED = "requested"
+STOP_TERMINATING = "terminating"
+STOP_KILLING = "killing"
+STOP_DRAINING = "draining"
+STOP_FINALIZED = "finalized"
+
+STOP_FINALIZED_MESSAGE = "STOP_FINALIZED"
+
+# Seconds allowed for each step before moving on
+PROCESS_START_TIMEOUT = 2.0
+TERMINATE_TIMEOUT = 3.0
+KILL_TIMEOUT = 5.0
+DRAIN_TIMEOUT = 5.0
+
+
+class StopController:
+    """Drives the termination of one job without blocking the caller"""
+
+    def __init__(self, get_process, output_queue, is_drained, kill=None,
+                 terminate_timeout=TERMINATE_TIMEOUT, kill_timeout=KILL_TIMEOUT,
+                 drain_timeout=DRAIN_TIMEOUT, start_timeout=PROCESS_START_TIMEOUT):
+        """
+        Args:
+            get_process (callable): Returns the running process handle (or None
+                while the job is still starting)
+            output_queue (queue.Queue): GUI queue for progress notifications
+            is_drained (callable): Returns True once all job output was read
+            kill (callable): Kills a process handle (defaults to process.kill)
+        """
+        self.get_process = get_process
+        self.output_queue = output_queue
+        self.is_drained = is_drained
+        self.kill = kill or (lambda process: process.kill())
+        self.timeouts = {
+            STOP_REQUESTED: start_timeout,
+            STOP_TERMINATING: terminate_timeout,
+            STOP_KILLING: kill_timeout,
+            STOP_DRAINING: drain_timeout,
+        }
+        self.logger = logging.getLogger(__name__)
+        self.state = STOP_IDLE
+        self.deadline = None
+        self.process = None
+
+    @property
+    def active(self):
+        return self.state not in (STOP_IDLE, STOP_FINALIZED)
+
+    def request(self):
+        """
+        Start stopping the job
+
+        Returns:
+            bool: False if a stop is already in progress
+        """
+        if self.active:
+            return False
+        self.process = None
+        self._enter(STOP_REQUESTED)
+        self.output_queue.put(('warning', "\n🛑 Stopping command...\n"))
+        return True
+
+    def _enter(self, state):
+        self.state = state
+        self.deadline = time.monotonic() + self.timeouts.get(state, 0)
+        self.logger.info(f"Stop state: {state}")
+
+    def _expired(self):
+        return time.monotonic() >= self.deadline
+
+    def step(self):
+        """
+        Advance the state machine as far as possible without waiting
+
+        Returns:
+            bool: True while further steps are needed
+        """
+        if self.state == STOP_REQUESTED:
+            self.process = self.get_process()
+            if self.process is None:
+                if not self._expired():
+                    return True
+                self.logger.warning("No process appeared to stop")
+                self._enter(STOP_DRAINING)
+            elif self.process.poll() is not None:
+                self._enter(STOP_DRAINING)
+            else:
+                self.process.terminate()
+                self._enter(STOP_TERMINATING)
+                return True
+
+        if self.state == STOP_TERMINATING:
+            if self.process.poll() is None:
+                if not self._expired():
+                    return True
+                self.logger.warning("Process did not terminate gracefully, forcing kill...")
+                self.output_queue.put(('warning', "Process did not stop gracefully, forcing kill...\n"))
+                try:
+                    self.kill(self.process)
+                except Exception as e:
+                    self.logger.error(f"Error killing process: {e}")
+                self._enter(STOP_KILLING)
+                return True
+            self._enter(STOP_DRAINING)
+
+        if self.state == STOP_KILLING:
+            if self.process.poll() is None and not self._expired():
+                return True
+            if self.process.poll() is None:
+                self.logger.error("Process is still running after kill")
+            self._enter(STOP_DRAINING)
+
+        if self.state == STOP_DRAINING:
+            if not self.is_drained() and not self._expired():
+                return True
+            if not self.is_drained():
+                self.logger.warning("Gave up waiting for remaining job output")
+            self._enter(STOP_FINALIZED)
+            self.output_queue.put(('control', STOP_FINALIZED_MESSAGE))
+
+        return False
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+asyncio job supervisor for ROBOCOPY GUI
+
+All jobs are run by one asyncio event loop in a single background thread.
+robocopy.exe jobs are child processes whose output pipes are read
+asynchronously, so they need no threads of their own. Python engine jobs run
+their directory walk in a small pool bounded by the number of concurrent jobs
+and share one pool of copy workers. At most max_concurrent jobs run at a
+time; further jobs wait in the queue.
+
+Each job has a JobState object. Everything the GUI needs to know is posted to
+one thread-safe channel (a queue.Queue) as (job_id, kind, payload) tuples, in
+order: EVENT_STARTED, one EVENT_LINE per output line, then EVENT_FINISHED.
+Several jobs can be submitted as one operation (for example the batches of a
+retry run); their JobGroup is a single handle for all of them.
+"""
+
+import os
+import time
+import queue
+import signal
+import asyncio
+import logging
+import locale
+import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+from robocopy_engine import (EngineProcess, TERMINATED_RETURN_CODE, EXIT_FATAL, suspend_process,
+                             resume_process)
+from robocopy_priority import set_process_priority
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_FINISHED = "finished"
+JOB_STOPPED = "stopped"
+JOB_FAILED = "failed"
+
+EVENT_STARTED = "started"
+EVENT_LINE = "line"
+EVENT_FINISHED = "finished"
+
+DEFAULT_MAX_CONCURRENT = 8
+DEFAULT_COPY_WORKERS = 32
+
+
+class _AsyncProcess:
+    """
+    Thread-safe controls for an asyncio child process
+
+    The command runs under a shell, so signals go to the whole process group
+    on POSIX and to the shell's children (through psutil, when installed) on
+    Windows; otherwise the child would keep the output pipe open.
+    """
+
+    def __init__(self, process, loop):
+        self.process = process
+        self.loop = loop
+        self.pid = process.pid
+
+    @property
+    def returncode(self):
+        return self.process.returncode
+
+    def _signal(self, kill):
+        def send():
+            try:
+                if os.name == "posix":
+                    os.killpg(self.pid, signal.SIGKILL if kill else signal.SIGTERM)
+                    return
+                if psutil is not None:
+                    for child in psutil.Process(self.pid).children(recursive=True):
+                        child.kill() if kill else child.terminate()
+                self.process.kill() if kill else self.process.terminate()
+            except ProcessLookupError:
+                pass
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"Could not signal process {self.pid}: {e}")
+        self.loop.call_soon_threadsafe(send)
+
+    def terminate(self):
+        self._signal(kill=False)
+
+    def kill(self):
+        self._signal(kill=True)
+
+
+class JobState:
+    """
+    State of one supervised job
+
+    A JobState is also a Popen-compatible handle (poll, wait, terminate, kill,
+    pid, suspend, resume), so the GUI can hold it as soon as the job is
+    submitted; a job suspended while queued starts suspended. Other
+    attributes (set_priority, native_ids, ...) come from the engine's process
+    once it has started.
+    """
+
+    def __init__(self, job_id, command, engine, name=None):
+        self.job_id = job_id
+        self.command = command
+        self.engine = engine
+        self.name = name or f"job-{job_id}"
+        self.status = JOB_QUEUED
+        self.process = None
+        self.returncode = None
+        self.submitted = time.time()
+        self.started = None
+        self.ended = None
+        self.lines = 0
+        self.stop_requested = False
+        self.suspended = False
+        self._supervisor = None
+        self._task = None
+        self._done = threading.Event()
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process else None
+
+    def poll(self):
+        return self.returncode if self._done.is_set() else None
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"{self.name} still running")
+        return self.returncode
+
+    def terminate(self):
+        self._supervisor.stop(self.job_id)
+
+    def kill(self):
+        self._supervisor.stop(self.job_id, kill=True)
+
+    def suspend(self):
+        self.suspended = True
+        process = self.process
+        return process is None or suspend_process(process)
+
+    def resume(self):
+        self.suspended = False
+        process = self.process
+        return process is None or resume_process(process)
+
+    def __getattr__(self, name):
+        # Only called for attributes JobState does not define
+        process = self.__dict__.get("process")
+        if process is None or name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(process, name)
+
+
+class JobGroup:
+    """
+    Popen-compatible handle for several jobs run as one operation
+
+    The group's exit code combines the ROBOCOPY exit codes of its jobs
+    (bitwise OR); if any job was stopped the group reports that instead.
+    """
+
+    def __init__(self, jobs):
+        self.jobs = list(jobs)
+        self.job_ids = {job.job_id for job in self.jobs}
+
+    @property
+    def pid(self):
+        running = [job.pid for job in self.jobs if job.pid is not None and job.poll() is None]
+        return running[0] if running else None
+
+    def poll(self):
+        codes = [job.poll() for job in self.jobs]
+        if any(code is None for code in codes):
+            return None
+        stopped = [code for code in codes if code < 0]
+        if stopped:
+            return stopped[0]
+        combined = 0
+        for code in codes:
+            combined |= code
+        return combined
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for job in self.jobs:
+            job.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return self.poll()
+
+    def terminate(self):
+        for job in self.jobs:
+            job.terminate()
+
+    def kill(self):
+        for job in self.jobs:
+            job.kill()
+
+    def suspend(self):
+        """Suspend every job of the group; queued jobs start suspended"""
+        results = [job.suspend() for job in self.jobs if job.poll() is None]
+        return all(results)
+
+    def resume(self):
+        results = [job.resume() for job in self.jobs if job.poll() is None]
+        return all(results)
+
+    def set_priority(self, cpu_priority, io_priority):
+        """Apply a priority to the jobs that are running; queued jobs keep normal priority"""
+        applied = True
+        for job in self.jobs:
+            if job.process is not None and job.poll() is None:
+                applied = set_process_priority(job, cpu_priority, io_priority) and applied
+        return applied
+
+
+class JobSupervisor:
+    """Runs many copy jobs from one asyncio event loop thread"""
+
+    def __init__(self, channel=None, max_concurrent=DEFAULT_MAX_CONCURRENT,
+                 copy_workers=DEFAULT_COPY_WORKERS):
+        """
+        Args:
+            channel (queue.Queue): Receives (job_id, kind, payload) events
+            max_concurrent (int): Jobs allowed to run at the same time
+            copy_workers (int): Copy threads shared by all Python engine jobs
+        """
+        self.channel = channel if channel is not None else queue.Queue()
+        self.max_concurrent = max_concurrent
+        self.logger = logging.getLogger(__name__)
+        # Queued and running jobs by id
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._encoding = locale.getpreferredencoding(False)
+        self._walker_pool = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="pycopy-job")
+        self._copy_pool = ThreadPoolExecutor(max_workers=copy_workers, thread_name_prefix="pycopy")
+        self._loop = asyncio.new_event_loop()
+        self._slots = None
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, args=(ready,), daemon=True,
+                                        name="job-supervisor")
+        self._thread.start()
+        ready.wait()
+
+    def _run_loop(self, ready):
+        asyncio.set_event_loop(self._loop)
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self._loop.call_soon(ready.set)
+        self._loop.run_forever()
+
+    def submit(self, command, engine, name=None):
+        """
+        Queue a job
+
+        Args:
+            command (str): ROBOCOPY command line
+            engine: Engine from robocopy_engine.get_engine
+            name (str): Display name
+
+        Returns:
+            JobState: State and handle of the job
+        """
+        with self._lock:
+            state = JobState(next(self._ids), command, engine, name)
+            state._supervisor = self
+            self.jobs[state.job_id] = state
+        asyncio.run_coroutine_threadsafe(self._run_job(state), self._loop)
+        return state
+
+    def submit_group(self, jobs, name=None):
+        """
+        Queue several jobs as one operation
+
+        Args:
+            jobs (list): (command, engine) tuples; jobs sharing an engine
+                share its bandwidth cap
+            name (str): Display name prefix
+
+        Returns:
+            JobGroup: Handle for all the jobs
+        """
+        name = name or "group"
+        return JobGroup(self.submit(command, engine, f"{name}-{index}")
+                        for index, (command, engine) in enumerate(jobs, 1))
+
+    def stop(self, job_id, kill=False):
+        """Stop a job; a queued job is dropped before it starts. Safe from any thread."""
+        state = self.jobs.get(job_id)
+        if state is None or state.poll() is not None:
+            return
+        state.stop_requested = True
+        process = state.process
+        if process is not None:
+            process.kill() if kill else process.terminate()
+        else:
+            self._loop.call_soon_threadsafe(self._cancel_queued, state)
+
+    def _cancel_queued(self, state):
+        # Runs in the loop thread, so the job cannot start in between
+        if state.status == JOB_QUEUED and state._task is not None:
+            state._task.cancel()
+
+    def active_jobs(self):
+        with self._lock:
+            return [s for s in self.jobs.values() if s.status in (JOB_QUEUED, JOB_RUNNING)]
+
+    def shutdown(self):
+        """Stop all jobs and the event loop"""
+        for state in self.active_jobs():
+            self.stop(state.job_id, kill=True)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._walker_pool.shutdown(wait=False)
+        self._copy_pool.shutdown(wait=False)
+
+    def _post(self, state, kind, payload=None):
+        self.channel.put((state.job_id, kind, payload))
+
+    def _line(self, state, line):
+        state.lines += 1
+        self._post(state, EVENT_LINE, line)
+
+    async def _run_job(self, state):
+        state._task = asyncio.current_task()
+        try:
+            await self._slots.acquire()
+        except asyncio.CancelledError:
+            self._finish(state, TERMINATED_RETURN_CODE)
+            return
+        try:
+            if state.stop_requested:
+                self._finish(state, TERMINATED_RETURN_CODE)
+                return
+            state.status = JOB_RUNNING
+            state.started = time.time()
+            try:
+                if state.engine.name == "python":
+                    code = await self._run_python(state)
+                else:
+                    code = await self._run_subprocess(state)
+            except Exception as e:
+                self.logger.error(f"{state.name} failed: {e}")
+                self._line(state, f"ERROR : {e}")
+                code = None
+            self._finish(state, code)
+        finally:
+            self._slots.release()
+
+    async def _run_subprocess(self, state):
+        process = await asyncio.create_subprocess_shell(
+            state.command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+            start_new_session=os.name == "posix")
+        state.process = _AsyncProcess(process, self._loop)
+        self._post(state, EVENT_STARTED, state.pid)
+        if state.stop_requested:
+            state.process.terminate()
+        elif state.suspended:
+            suspend_process(state.process)
+        while True:
+            data = await process.stdout.readline()
+            if not data:
+                break
+            self._line(state, data.decode(self._encoding, errors="replace").rstrip("\r\n"))
+        return await process.wait()
+
+    async def _run_python(self, state):
+        job = state.engine.create_job(state.command, executor=self._copy_pool)
+        state.process = EngineProcess(job, on_line=lambda line: self._line(state, line), threaded=False)
+        self._post(state, EVENT_STARTED, state.pid)
+        if state.stop_requested:
+            job.stop()
+        elif state.suspended:
+            job.pause()
+        return await self._loop.run_in_executor(self._walker_pool, state.process.run)
+
+    def _finish(self, state, code):
+        state.returncode = code if code is not None else EXIT_FATAL
+        state.ended = time.time()
+        if state.stop_requested:
+            state.status = JOB_STOPPED
+        elif code is None:
+            state.status = JOB_FAILED
+        else:
+            state.status = JOB_FINISHED
+        state._done.set()
+        self._post(state, EVENT_FINISHED, state.returncode)
+        # Only queued and running jobs are kept; the holder of the handle keeps a finished one
+        with self._lock:
+            self.jobs.pop(state.job_id, None)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Bandwidth limiting for ROBOCOPY GUI jobs
+
+The Python engine enforces a bandwidth cap exactly with a token bucket shared
+by all copy threads. robocopy.exe has no byte-rate limit, only /IPG (an
+inter-packet gap in milliseconds between 64 KB blocks), so for robocopy jobs
+an IpgController estimates the gap from the throughput measured on earlier
+runs of the same job and adjusts it after every run.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+
+BYTES_PER_MB = 1024 * 1024
+
+# robocopy.exe sends data in 64 KB blocks and waits /IPG ms after each one
+IPG_PACKET_SIZE = 64 * 1024
+MAX_IPG_MS = 5000
+
+# Runs that copy less than this are dominated by per-file overhead and are
+# not used to tune the gap
+MIN_SAMPLE_BYTES = 32 * BYTES_PER_MB
+
+THROTTLE_STATE_FILE = "throttle.json"
+
+
+class TokenBucket:
+    """Thread-safe token bucket measured in bytes"""
+
+    def __init__(self, rate_mbps, burst_seconds=0.1):
+        """
+        Args:
+            rate_mbps (float): Sustained rate in MB/s
+            burst_seconds (float): Bucket capacity expressed in seconds of rate
+        """
+        self._lock = threading.Lock()
+        self.burst_seconds = burst_seconds
+        self.set_rate(rate_mbps)
+        self._tokens = self.capacity
+        self._timestamp = time.monotonic()
+
+    def set_rate(self, rate_mbps):
+        """Change the rate; takes effect for the next consume call"""
+        with self._lock:
+            self.rate = max(float(rate_mbps), 0.001) * BYTES_PER_MB
+            self.capacity = max(self.rate * self.burst_seconds, IPG_PACKET_SIZE)
+
+    @property
+    def chunk_size(self):
+        """Largest transfer that should be requested per consume call"""
+        return int(self.capacity)
+
+    def consume(self, amount, stop_event=None):
+        """
+        Take tokens for a transfer, waiting until the transfer is allowed
+
+        Tokens are reserved first and the caller then sleeps off its own
+        deficit, so concurrent callers are serialized at exactly the rate.
+
+        Args:
+            amount (int): Bytes about to be transferred
+            stop_event (threading.Event): Abort the wait when set
+
+        Returns:
+            bool: False if the wait was aborted by stop_event
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._timestamp) * self.rate)
+            self._timestamp = now
+            self._tokens -= amount
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if delay <= 0:
+            return True
+        if stop_event is not None:
+            return not stop_event.wait(delay)
+        time.sleep(delay)
+        return True
+
+
+def initial_ipg(target_mbps):
+    """
+    Estimate /IPG for a target rate assuming the transfer itself takes no time
+
+    Args:
+        target_mbps (float): Target rate in MB/s
+
+    Returns:
+        int: Inter-packet gap in milliseconds
+    """
+    if target_mbps <= 0:
+        return 0
+    return min(MAX_IPG_MS, int(round(IPG_PACKET_SIZE / (target_mbps * BYTES_PER_MB) * 1000)))
+
+
+class IpgController:
+    """Adjusts robocopy /IPG between runs from the measured throughput"""
+
+    def __init__(self, state_path, damping=0.5):
+        """
+        Args:
+            state_path (str): JSON file in the job folder holding the learned gap;
+                the folder is created when the gap is first saved
+            damping (float): Fraction of the computed correction applied per run
+        """
+        self.state_path = state_path
+        self.damping = damping
+        self.logger = logging.getLogger(__name__)
+
+    def _load(self):
+        try:
+            with open(self.state_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def ipg_for(self, target_mbps):
+        """
+        Get the gap to use for the next run
+
+        Args:
+            target_mbps (float): Target rate in MB/s
+
+        Returns:
+            int: Inter-packet gap in milliseconds (0 when uncapped)
+        """
+        if target_mbps <= 0:
+            return 0
+        state = self._load()
+        if state.get("target_mbps") == target_mbps and "ipg_ms" in state:
+            return int(state["ipg_ms"])
+        return initial_ipg(target_mbps)
+
+    def record_run(self, target_mbps, ipg_ms, measured_mbps, bytes_copied):
+        """
+        Update the learned gap from a finished run
+
+        The time per 64 KB block is the transfer time plus the gap. The
+        transfer time is derived from the measured rate and the gap that was
+        used, and the new gap is whatever makes the block time match the
+        target rate. Only part of the correction is applied per run so that
+        noisy measurements do not make the gap oscillate.
+
+        Args:
+            target_mbps (float): Target rate in MB/s
+            ipg_ms (int): Gap used for the run
+            measured_mbps (float): Average rate achieved by the run
+            bytes_copied (int): Bytes copied by the run
+
+        Returns:
+            int: Gap to use for the next run
+        """
+        if target_mbps <= 0 or measured_mbps <= 0 or bytes_copied < MIN_SAMPLE_BYTES:
+            return ipg_ms
+
+        target_block = IPG_PACKET_SIZE / (target_mbps * BYTES_PER_MB)
+        measured_block = IPG_PACKET_SIZE / (measured_mbps * BYTES_PER_MB)
+        transfer_time = measured_block - ipg_ms / 1000.0
+        if transfer_time >= 0:
+            ideal_ipg = (target_block - transfer_time) * 1000.0
+        else:
+            # Faster than one gapped stream allows (/MT threads wait in
+            # parallel): scale the gap with the overshoot instead
+            ideal_ipg = ipg_ms * measured_mbps / target_mbps
+        new_ipg = ipg_ms + self.damping * (ideal_ipg - ipg_ms)
+        new_ipg = int(round(min(MAX_IPG_MS, max(0.0, new_ipg))))
+
+        state = {"target_mbps": target_mbps, "ipg_ms": new_ipg,
+                 "measured_mbps": round(measured_mbps, 3), "updated": time.time()}
+        try:
+            folder = os.path.dirname(self.state_path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            with open(self.state_path, 'w') as f:
+                json.dump(state, f, indent=2)
+        except OSError as e:
+            self.logger.error(f"Failed to save throttle state: {e}")
+
+        self.logger.info(f"Bandwidth cap {target_mbps} MB/s: measured {measured_mbps:.2f} MB/s "
+                         f"with /IPG:{ipg_ms}, next run uses /IPG:{new_ipg}")
+        return new_ipg
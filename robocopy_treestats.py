@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Persistent source-tree statistics for ROBOCOPY GUI
+
+The GUI shows the file count, total size and depth of the whole source tree.
+Counting a large tree takes a full walk, so the result is kept in a SQLite
+database in the jobs folder together with the counts of every directory and
+its mtime. The last summary of a root is available at once; a refresh walks
+the tree again but only lists directories whose mtime changed (adding,
+removing or renaming an entry changes it) and reuses the stored counts of
+the others, so it costs one stat per directory.
+
+Rewriting a file in place does not change its directory's mtime, so sizes can
+lag behind; a summary older than FULL_RESCAN_AGE is refreshed by listing
+every directory again.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+from robocopy_utils import JOBS_DIR
+
+TREE_STATS_FILE = "tree_stats.sqlite"
+
+# Age after which a refresh lists every directory instead of trusting mtimes
+FULL_RESCAN_AGE = 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    root TEXT NOT NULL,
+    rel TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    files INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    subdirs TEXT NOT NULL,
+    PRIMARY KEY (root, rel)
+);
+CREATE TABLE IF NOT EXISTS roots (
+    root TEXT PRIMARY KEY,
+    files INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    dirs INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    updated REAL NOT NULL,
+    full_scan REAL NOT NULL
+);
+"""
+
+
+def root_key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def default_stats_path():
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    return os.path.join(JOBS_DIR, TREE_STATS_FILE)
+
+
+def _list_dir(path):
+    """Count the files of one directory and name its subdirectories"""
+    files = size = 0
+    subdirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                elif entry.is_file():
+                    files += 1
+                    size += entry.stat().st_size
+            except OSError:
+                continue
+    return files, size, subdirs
+
+
+class TreeStatsCache:
+    """Stored recursive statistics of source trees"""
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): Database file (defaults to the shared file in the jobs folder)
+        """
+        self.path = path or default_stats_path()
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def summary(self, root):
+        """
+        Get the stored statistics of a tree
+
+        Returns:
+            dict or None: 'files', 'bytes', 'dirs', 'depth' and 'updated'
+                (epoch seconds), None if the tree was never counted
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT files, bytes, dirs, depth, updated FROM roots WHERE root = ?",
+                                     (root_key(root),)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("files", "bytes", "dirs", "depth", "updated"), row))
+
+    def refresh(self, root, stop_event=None):
+        """
+        Count a tree again, listing only the directories that changed
+
+        Args:
+            root (str): Root directory of the tree
+            stop_event (threading.Event): Abandons the refresh when set
+
+        Returns:
+            dict or None: The new summary, None if stopped
+        """
+        key = root_key(root)
+        with self._lock:
+            last_full = self._conn.execute("SELECT full_scan FROM roots WHERE root = ?", (key,)).fetchone()
+            full = last_full is None or time.time() - last_full[0] >= FULL_RESCAN_AGE
+            cached = {} if full else {
+                rel: (mtime_ns, files, size, subdirs)
+                for rel, mtime_ns, files, size, subdirs in self._conn.execute(
+                    "SELECT rel, mtime_ns, files, bytes, subdirs FROM dirs WHERE root = ?", (key,))}
+
+        start_time = time.time()
+        totals = {"files": 0, "bytes": 0, "dirs": 0, "depth": 0}
+        changed = []
+        seen = set()
+        listed = 0
+        stack = [""]
+        while stack:
+            if stop_event is not None and stop_event.is_set():
+                return None
+            rel = stack.pop()
+            path = os.path.join(root, rel) if rel else root
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                if not rel:
+                    raise
+                continue
+
+            entry = cached.get(rel)
+            if entry is not None and entry[0] == mtime_ns:
+                files, size, subdirs = entry[1], entry[2], json.loads(entry[3])
+            else:
+                try:
+                    files, size, subdirs = _list_dir(path)
+                except OSError as e:
+                    if not rel:
+                        raise
+                    self.logger.debug(f"Cannot list {path}: {e}")
+                    files, size, subdirs = 0, 0, []
+                listed += 1
+                changed.append((key, rel, mtime_ns, files, size, json.dumps(subdirs)))
+
+            seen.add(rel)
+            totals["files"] += files
+            totals["bytes"] += size
+            if rel:
+                totals["dirs"] += 1
+                totals["depth"] = max(totals["depth"], rel.count(os.sep) + 1)
+            stack.extend(os.path.join(rel, name) for name in subdirs)
+
+        removed = [(key, rel) for rel in cached if rel not in seen]
+        now = time.time()
+        with self._lock, self._conn:
+            if full:
+                self._conn.execute("DELETE FROM dirs WHERE root = ?", (key,))
+            self._conn.executemany("INSERT OR REPLACE INTO dirs (root, rel, mtime_ns, files, bytes, subdirs) "
+                                   "VALUES (?, ?, ?, ?, ?, ?)", changed)
+            self._conn.executemany("DELETE FROM dirs WHERE root = ? AND rel = ?", removed)
+            self._conn.execute("INSERT OR REPLACE INTO roots (root, files, bytes, dirs, depth, updated, full_scan) "
+                               "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (key, totals["files"], totals["bytes"], totals["dirs"], totals["depth"], now,
+                                now if full else last_full[0]))
+        self.logger.info(f"Tree statistics of {root} refreshed in {now - start_time:.1f}s "
+                         f"({listed} of {len(seen)} directories listed)")
+        totals["updated"] = now
+        return totals
@@ -5,18 +5,227 @@ Configuration and validation utilities for ROBOCOPY GUI
 
 import os
 import re
+import stat
+import time
+import hashlib
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from robocopy_probe import PathProber, PathUnreachable, ProberBusy, LocalFilesystem, STATUS_MISSING
+from robocopy_rules import RuleEngine, check_numeric
+
+JOBS_DIR = "robocopy_jobs"
+
+# Log file robocopy writes to in each job folder
+JOB_LOG_NAME = "robocopy.log"
+
+def get_job_folder(source, dest, base_dir=JOBS_DIR, create=True):
+    """
+    Get the per-job state folder for a source/destination pair
+    
+    Args:
+        source (str): Source directory
+        dest (str): Destination directory
+        base_dir (str): Folder holding all job folders
+        create (bool): Create the folder if it does not exist
+    
+    Returns:
+        str: Path of the job folder
+    """
+    key = "|".join(os.path.normcase(os.path.abspath(p)) for p in (source, dest))
+    folder = os.path.join(base_dir, hashlib.sha1(key.encode("utf-8")).hexdigest()[:16])
+    if create:
+        os.makedirs(folder, exist_ok=True)
+    return folder
+
+def job_log_path(source, dest):
+    """
+    Get the log file robocopy appends to for a source/destination pair
+    
+    The job folder is not created here (commands are generated while paths
+    are typed); LogManager.prepare creates it when a run starts.
+    """
+    return os.path.join(get_job_folder(source, dest, create=False), JOB_LOG_NAME)
+
+def relative_path(path, roots):
+    """
+    Get a path relative to the first root that contains it
+    
+    Args:
+        path (str): Absolute path
+        roots (tuple): Candidate root directories
+    
+    Returns:
+        str or None: Relative path ('' for a root itself), None if outside all roots
+    """
+    for root in roots:
+        try:
+            rel = os.path.relpath(path, os.path.normpath(root))
+        except ValueError:
+            # Different drive on Windows
+            continue
+        if rel == os.curdir:
+            return ""
+        if rel != os.pardir and not rel.startswith(os.pardir + os.sep):
+            return rel
+    return None
+
+# How long a source path inspection result is reused
+INSPECT_CACHE_TTL = 30.0
+
+# Directory entries counted between checks for a newer inspection request
+_INSPECT_CHECK_EVERY = 256
+
+class PathInspector:
+    """
+    Inspects directories on a background worker
+    
+    A directory is listed in a single os.scandir pass, counting files and
+    subdirectories from the entry types the listing already returned.
+    Listings are cached per path for a short time. Starting a new inspection
+    supersedes the previous one: a scan still running for an older request
+    stops at its next check and its future resolves to None.
+    """
+    
+    def __init__(self, ttl=INSPECT_CACHE_TTL, fs=None):
+        self.ttl = ttl
+        self.fs = fs or LocalFilesystem()
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._generation = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inspect")
+    
+    def inspect(self, path):
+        """
+        Inspect a directory in the background
+        
+        Args:
+            path (str): Directory to inspect
+        
+        Returns:
+            concurrent.futures.Future: Resolves to a result dict with 'exists',
+                'is_dir', 'files', 'dirs' and 'error' keys, or to None if a
+                newer inspection superseded this one
+        """
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        return self._executor.submit(self._inspect, path, generation)
+    
+    def cancel(self):
+        """Supersede the running inspection, if any"""
+        with self._lock:
+            self._generation += 1
+    
+    def _stale(self, generation):
+        return generation != self._generation
+    
+    def _inspect(self, path, generation):
+        if self._stale(generation):
+            return None
+        key = os.path.normcase(os.path.abspath(path))
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None and now - cached[0] < self.ttl:
+            return cached[1]
+        
+        result = {"exists": False, "is_dir": False, "files": 0, "dirs": 0, "error": None}
+        try:
+            with self.fs.scandir(path) as entries:
+                result["exists"] = result["is_dir"] = True
+                for count, entry in enumerate(entries, 1):
+                    if count % _INSPECT_CHECK_EVERY == 0 and self._stale(generation):
+                        return None
+                    try:
+                        if entry.is_dir():
+                            result["dirs"] += 1
+                        elif entry.is_file():
+                            result["files"] += 1
+                    except OSError:
+                        continue
+        except FileNotFoundError:
+            pass
+        except NotADirectoryError:
+            result["exists"] = True
+        except PermissionError as e:
+            result["exists"] = result["is_dir"] = True
+            result["error"] = e
+        except OSError as e:
+            result["error"] = e
+            try:
+                result["is_dir"] = stat.S_ISDIR(self.fs.stat(path).st_mode)
+                result["exists"] = True
+            except OSError:
+                pass
+        
+        if result["is_dir"] and result["error"] is None:
+            # Missing or unreadable paths are checked again next time
+            with self._lock:
+                self._cache[key] = (time.monotonic(), result)
+        return result
+    
+    def invalidate(self, path=None):
+        """Drop the cached result for a path, or all cached results"""
+        with self._lock:
+            if path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(os.path.normcase(os.path.abspath(path)), None)
+    
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False)
+
+# How long a path validation result is reused
+VALIDATION_CACHE_TTL = 10.0
+
+# Paths validated at the same time by validate_paths
+VALIDATION_WORKERS = 8
 
 class RobocopyValidator:
     """Validates ROBOCOPY parameters and paths"""
     
-    def __init__(self):
+    def __init__(self, cache_ttl=VALIDATION_CACHE_TTL, prober=None):
+        """
+        Args:
+            cache_ttl (float): Seconds a path validation result is reused
+            prober (PathProber): Runs the filesystem probes with a deadline
+        """
         self.logger = logging.getLogger(__name__)
+        self.cache_ttl = cache_ttl
+        self.prober = prober or PathProber()
+        self.rules = RuleEngine()
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+    
+    def _cached(self, key, probe):
+        now = time.monotonic()
+        with self._cache_lock:
+            cached = self._cache.get(key)
+        if cached is not None and now - cached[0] < self.cache_ttl:
+            return cached[1]
+        result = probe()
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic(), result)
+        return result
+    
+    def clear_cache(self):
+        """Forget cached path validation results"""
+        with self._cache_lock:
+            self._cache.clear()
     
     def validate_path(self, path, path_type="directory"):
         """
         Validate if a path exists and is accessible
         
+        A directory is opened for listing and only its first entry is read;
+        a file is opened without reading. The probe runs on the prober's
+        workers, so an unreachable share fails after the probe timeout.
+        Results are cached for cache_ttl seconds.
+        
         Args:
             path (str): Path to validate
             path_type (str): Type of path ('directory' or 'file')
@@ -26,23 +235,31 @@ class RobocopyValidator:
         """
         if not path:
             return False, f"{path_type.capitalize()} path cannot be empty"
-        
-        if not os.path.exists(path):
-            return False, f"{path_type.capitalize()} does not exist: {path}"
-        
-        if path_type == "directory" and not os.path.isdir(path):
-            return False, f"Path is not a directory: {path}"
-        
-        if path_type == "file" and not os.path.isfile(path):
-            return False, f"Path is not a file: {path}"
-        
-        # Check if path is accessible
+        key = (path_type, os.path.normcase(os.path.abspath(path)))
+        return self._cached(key, lambda: self._probe_path(path, path_type))
+    
+    def _probe_path(self, path, path_type):
+        try:
+            return self.prober.call(self._check_access, path, path_type)
+        except PathUnreachable as e:
+            return False, f"{path_type.capitalize()} is not reachable: {path} ({e.strerror})"
+        except ProberBusy as e:
+            return False, f"{path_type.capitalize()} could not be checked: {path} ({e.strerror})"
+    
+    def _check_access(self, fs, path, path_type):
         try:
             if path_type == "directory":
-                os.listdir(path)
+                with fs.scandir(path) as entries:
+                    next(entries, None)
             else:
-                with open(path, 'r'):
+                if stat.S_ISDIR(fs.stat(path).st_mode):
+                    return False, f"Path is not a file: {path}"
+                with fs.open(path, 'rb'):
                     pass
+        except FileNotFoundError:
+            return False, f"{path_type.capitalize()} does not exist: {path}"
+        except NotADirectoryError:
+            return False, f"Path is not a directory: {path}"
         except PermissionError:
             return False, f"Permission denied accessing: {path}"
         except Exception as e:
@@ -50,6 +267,37 @@ class RobocopyValidator:
         
         return True, ""
     
+    def path_exists(self, path):
+        """Check if a path exists (cached like validate_path; False if unreachable)"""
+        key = ("exists", os.path.normcase(os.path.abspath(path)))
+        return self._cached(key, lambda: self._probe_exists(path))
+    
+    def _probe_exists(self, path):
+        try:
+            return self.prober.status(path) != STATUS_MISSING
+        except PathUnreachable:
+            return False
+        except OSError:
+            return True
+    
+    def validate_paths(self, paths, max_workers=VALIDATION_WORKERS):
+        """
+        Validate several paths at the same time
+        
+        Args:
+            paths (list): (path, path_type) tuples
+            max_workers (int): Paths probed at the same time
+        
+        Returns:
+            list: (is_valid, error_message) tuples in the order of paths
+        """
+        paths = list(paths)
+        if len(paths) < 2:
+            return [self.validate_path(path, path_type) for path, path_type in paths]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(paths)),
+                                thread_name_prefix="validate") as pool:
+            return list(pool.map(lambda item: self.validate_path(*item), paths))
+    
     def validate_numeric_input(self, value, field_name, min_val=0, max_val=None):
         """
         Validate numeric input fields
@@ -63,83 +311,31 @@ class RobocopyValidator:
         Returns:
             tuple: (is_valid, error_message, converted_value)
         """
-        if not value:
-            return False, f"{field_name} cannot be empty", None
-        
-        try:
-            num_val = int(value)
-        except ValueError:
-            return False, f"{field_name} must be a number", None
-        
-        if num_val < min_val:
-            return False, f"{field_name} must be at least {min_val}", None
-        
-        if max_val is not None and num_val > max_val:
-            return False, f"{field_name} cannot exceed {max_val}", None
-        
-        return True, "", num_val
+        return check_numeric(value, field_name, min_val, max_val)
     
     def validate_robocopy_options(self, options_dict):
         """
         Validate ROBOCOPY options for conflicts and correctness
         
+        The checks are the rule table of robocopy_rules; rules whose fields
+        did not change since an earlier call are answered from its memo.
+        
         Args:
             options_dict (dict): Dictionary of ROBOCOPY options
         
         Returns:
             tuple: (is_valid, warnings_list, errors_list)
         """
-        warnings = []
-        errors = []
-        
-        # Check for conflicting options
-        if options_dict.get('mirror_mode') and options_dict.get('copy_subdirs'):
-            warnings.append("Mirror mode (/MIR) includes subdirectory copying. /S option is redundant.")
-        
-        if options_dict.get('mirror_mode') and options_dict.get('copy_empty_subdirs'):
-            warnings.append("Mirror mode (/MIR) includes empty subdirectories. /E option is redundant.")
-        
-        if options_dict.get('copy_subdirs') and options_dict.get('copy_empty_subdirs'):
-            warnings.append("/E option includes /S functionality. /S option is redundant.")
-        
-        # Validate numeric fields
-        retries = options_dict.get('retries', '0')
-        valid, error, _ = self.validate_numeric_input(retries, "Retries", 0, 10000)
-        if not valid:
-            errors.append(error)
-        
-        wait_time = options_dict.get('wait_time', '30')
-        valid, error, _ = self.validate_numeric_input(wait_time, "Wait time", 1, 3600)
-        if not valid:
-            errors.append(error)
-        
-        threads = options_dict.get('threads', '8')
-        valid, error, thread_val = self.validate_numeric_input(threads, "Threads", 1, 128)
-        if not valid:
-            errors.append(error)
-        elif thread_val is not None and thread_val > 64:
-            warnings.append("High thread count may impact system performance.")
-        
-        # Check source and destination
-        source = options_dict.get('source_path', '')
-        dest = options_dict.get('dest_path', '')
+        return self.rules.evaluate(options_dict)
+    
+    def validate_batch(self, options_list):
+        """
+        Validate the options of many jobs
         
-        if source and dest:
-            # Normalize paths for comparison
-            try:
-                norm_source = os.path.normpath(os.path.abspath(source)).lower()
-                norm_dest = os.path.normpath(os.path.abspath(dest)).lower()
-                
-                if norm_source == norm_dest:
-                    errors.append("Source and destination cannot be the same directory.")
-                elif norm_dest.startswith(norm_source + os.sep):
-                    errors.append("Destination cannot be a subdirectory of source.")
-                elif options_dict.get('mirror_mode') and norm_source.startswith(norm_dest + os.sep):
-                    warnings.append("Source is subdirectory of destination with mirror mode. This may cause data loss.")
-            except Exception as e:
-                warnings.append(f"Could not validate path relationship: {str(e)}")
-        
-        return len(errors) == 0, warnings, errors
+        Returns:
+            list: (is_valid, warnings_list, errors_list) tuples in the order of options_list
+        """
+        return self.rules.validate_batch(options_list)
     
     def generate_safe_command(self, options_dict):
         """
@@ -168,7 +364,7 @@ class RobocopyValidator:
         # For destination, just check if parent directory exists
         if dest:
             dest_parent = os.path.dirname(dest)
-            if dest_parent and not os.path.exists(dest_parent):
+            if dest_parent and not self.path_exists(dest_parent):
                 errors.append(f"Destination parent directory does not exist: {dest_parent}")
         
         if errors:
@@ -216,10 +412,28 @@ class RobocopyValidator:
             cmd_parts.append("/V")
         
         # Always add these for better output and logging
-        cmd_parts.extend(["/TEE", "/NP", "/LOG+:robocopy.log"])
+        cmd_parts.extend(["/TEE", "/NP", f"/LOG+:{job_log_path(source, dest)}"])
         
         command = " ".join(cmd_parts)
         return command, True, warnings, []
+    
+    def generate_safe_commands(self, options_list, max_workers=VALIDATION_WORKERS):
+        """
+        Generate commands for several jobs, validating their paths at the same time
+        
+        Args:
+            options_list (list): Option dictionaries, one per job
+            max_workers (int): Jobs validated at the same time
+        
+        Returns:
+            list: generate_safe_command results in the order of options_list
+        """
+        options_list = list(options_list)
+        if len(options_list) < 2:
+            return [self.generate_safe_command(options) for options in options_list]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(options_list)),
+                                thread_name_prefix="validate") as pool:
+            return list(pool.map(self.generate_safe_command, options_list))
 
 class ConfigManager:
     """Manages configuration loading and saving"""
@@ -245,7 +459,12 @@ class ConfigManager:
             "purge_dest": False,
             "exclude_changed": False,
             "exclude_newer": False,
-            "verbose": True
+            "verbose": True,
+            "copy_engine": "auto",
+            "incremental": False,
+            "bandwidth_cap": "0",
+            "cpu_priority": "normal",
+            "io_priority": "normal"
         }
     
     def validate_config(self, config):
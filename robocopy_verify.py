@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Post-copy verification for ROBOCOPY GUI jobs
+
+When verification is enabled, the files a run copied are collected from its
+output (by a PlanBuilder, the same parser that builds copy plans) and, once
+the run has finished, compared with their source files by a VerifyJob run
+through the job supervisor.
+
+Each pair of files is read in chunks through memory maps (plain reads where a
+file cannot be mapped) and the digests of matching chunks are compared, so a
+difference is found without reading the rest of the file. A fixed number of
+verify workers limits how many files are read at the same time; the files are
+shared among them by size so they finish together.
+
+A file that differs is printed as a ROBOCOPY error line
+("ERROR 23 (0x00000017) Verifying File ..."), so FailureCollector records it
+and Tools → Retry Failed Files copies it again. The summary line reports the
+verified bytes per second.
+"""
+
+import os
+import mmap
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from robocopy_engine import (PythonCopyJob, CopyEvent, parse_command, EVENT_ERROR, EVENT_INFO,
+                             EXIT_FAILED, TERMINATED_RETURN_CODE)
+from robocopy_plan import balance_chunks, ACTION_COPY, KIND_FILE
+
+VERIFY_CHUNK_SIZE = 4 * 1024 * 1024
+DEFAULT_VERIFY_CONCURRENCY = 4
+
+# ERROR_CRC, the code Windows reports for data that does not read back correctly
+VERIFY_ERROR_CODE = 23
+
+
+def _map(f):
+    """Map an open file for reading; None where the file cannot be mapped"""
+    try:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def compare_files(src, dst, chunk_size=VERIFY_CHUNK_SIZE, stop_event=None, run_gate=None):
+    """
+    Compare the contents of two files chunk by chunk
+
+    Args:
+        src (str): Source file
+        dst (str): Destination file
+        stop_event (threading.Event): Abandons the comparison when set
+        run_gate (threading.Event): Cleared while the job is paused
+
+    Returns:
+        tuple: (equal, bytes compared); equal is None if stopped
+    """
+    with open(src, "rb", buffering=0) as f_src, open(dst, "rb", buffering=0) as f_dst:
+        size = os.fstat(f_src.fileno()).st_size
+        if os.fstat(f_dst.fileno()).st_size != size:
+            return False, 0
+        if not size:
+            return True, 0
+
+        src_map, dst_map = _map(f_src), _map(f_dst)
+        try:
+            if src_map is not None and dst_map is not None and len(src_map) == len(dst_map) == size:
+                with memoryview(src_map) as src_view, memoryview(dst_map) as dst_view:
+                    for offset in range(0, size, chunk_size):
+                        if run_gate is not None:
+                            run_gate.wait()
+                        if stop_event is not None and stop_event.is_set():
+                            return None, offset
+                        end = offset + chunk_size
+                        if _digest(src_view[offset:end]) != _digest(dst_view[offset:end]):
+                            return False, offset
+                return True, size
+
+            src_buffer, dst_buffer = bytearray(chunk_size), bytearray(chunk_size)
+            compared = 0
+            while True:
+                if run_gate is not None:
+                    run_gate.wait()
+                if stop_event is not None and stop_event.is_set():
+                    return None, compared
+                count = f_src.readinto(src_buffer)
+                if f_dst.readinto(dst_buffer) != count:
+                    return False, compared
+                if not count:
+                    return True, compared
+                if _digest(memoryview(src_buffer)[:count]) != _digest(memoryview(dst_buffer)[:count]):
+                    return False, compared
+                compared += count
+        finally:
+            for mapped in (src_map, dst_map):
+                if mapped is not None:
+                    mapped.close()
+
+
+def copied_files(actions):
+    """
+    Files copied by a run, from PlanBuilder.actions
+
+    Returns:
+        list: (relative path, size) tuples
+    """
+    return [(path, size) for path, (action, kind, size, _) in actions.items()
+            if action == ACTION_COPY and kind == KIND_FILE]
+
+
+class VerifyJob(PythonCopyJob):
+    """Compares copied files with their sources on a pool of verify workers"""
+
+    def __init__(self, options, files, concurrency=DEFAULT_VERIFY_CONCURRENCY, **kwargs):
+        """
+        Args:
+            options (dict): Options of the copy command (parse_command)
+            files (list): (relative path, size) tuples to verify
+            concurrency (int): Files read at the same time
+        """
+        super().__init__(options, **kwargs)
+        self.files = files
+        self.concurrency = max(1, int(concurrency))
+        self.bytes_verified = 0
+
+    def run(self):
+        opts = self.options
+        source, dest = opts["source_path"], opts["dest_path"]
+        self._emit_header(source, dest)
+        total = sum(size for _, size in self.files)
+        self.emit(CopyEvent(EVENT_INFO, message=f"  Verifying {len(self.files)} files ({total} bytes) "
+                                                f"with {self.concurrency} workers"))
+        self.emit(CopyEvent(EVENT_INFO, message=""))
+        self._add(files_total=len(self.files), bytes_total=total)
+        start_time = time.time()
+        self._register_thread()
+
+        chunks = balance_chunks(self.files, self.concurrency)
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="verify",
+                                    initializer=self._register_thread) as pool:
+                list(pool.map(lambda chunk: self._verify_chunk(chunk, source, dest), chunks))
+        finally:
+            # The job runs on a pooled supervisor thread
+            self._release_thread()
+
+        if self.stop_event.is_set():
+            return TERMINATED_RETURN_CODE
+        self._emit_verify_summary(time.time() - start_time)
+        return self.exit_code()
+
+    def _verify_chunk(self, chunk, source, dest):
+        for rel_path in chunk:
+            if self.stop_event.is_set():
+                return
+            self._verify_file(os.path.join(source, rel_path), os.path.join(dest, rel_path))
+
+    def _verify_file(self, src, dst):
+        try:
+            src_stat = os.stat(src)
+            dst_stat = os.stat(dst)
+        except FileNotFoundError as e:
+            if e.filename == src or not os.path.exists(src):
+                # Removed from the source since the copy; nothing to verify
+                self._add(files_skipped=1)
+                return
+            self._report_failure("Verifying File", src, e)
+            self._add(files_failed=1)
+            return
+        except OSError as e:
+            self._report_failure("Verifying File", src, e)
+            self._add(files_failed=1)
+            return
+        if src_stat.st_mtime_ns > dst_stat.st_mtime_ns:
+            # Changed in the source after it was copied; the next run copies it
+            self._add(files_skipped=1, bytes_skipped=src_stat.st_size)
+            return
+
+        try:
+            equal, compared = compare_files(src, dst, stop_event=self.stop_event, run_gate=self.run_gate)
+        except OSError as e:
+            self._report_failure("Verifying File", src, e)
+            self._add(files_failed=1, bytes_failed=src_stat.st_size)
+            return
+        with self._lock:
+            self.bytes_verified += compared
+        if equal is None:
+            return
+        if equal:
+            self._add(files_copied=1, bytes_copied=src_stat.st_size)
+            return
+        self._add(files_failed=1, bytes_failed=src_stat.st_size)
+        self.emit(CopyEvent(EVENT_ERROR, src, 0, f"ERROR {VERIFY_ERROR_CODE} (0x{VERIFY_ERROR_CODE:08X}) "
+                                                 f"Verifying File {src}"))
+        self.emit(CopyEvent(EVENT_INFO, src, 0, "The destination file does not match the source."))
+
+    def exit_code(self):
+        return EXIT_FAILED if self.stats["files_failed"] else 0
+
+    def _emit_verify_summary(self, elapsed):
+        s = self.stats
+        rate = self.bytes_verified / elapsed if elapsed > 0 else 0
+        for line in ("", "-" * 79, "",
+                     f"{'Verified':>10} : {s['files_copied']} files match, {s['files_failed']} differ, "
+                     f"{s['files_skipped']} changed since the copy",
+                     f"{'Compared':>10} : {self.bytes_verified} bytes in {elapsed:.1f}s "
+                     f"({rate / (1024 * 1024):.1f} MB/s per side)",
+                     f"{'Ended':>10} : {time.strftime('%A, %B %d, %Y %H:%M:%S')}"):
+            self.emit(CopyEvent(EVENT_INFO, message=line))
+
+
+class VerifyEngine:
+    """Engine that runs a VerifyJob; used through the job supervisor"""
+
+    name = "python"
+
+    def __init__(self, files, concurrency=DEFAULT_VERIFY_CONCURRENCY):
+        self.files = files
+        self.concurrency = concurrency
+
+    def create_job(self, command, executor=None):
+        # Verification keeps its own workers so that its I/O concurrency stays as configured
+        return VerifyJob(parse_command(command), self.files, concurrency=self.concurrency)
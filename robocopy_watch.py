@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Watch mode for ROBOCOPY GUI
+
+A watcher follows changes below the source directory and reports the
+directories they happened in. On Linux it uses inotify (through ctypes, so no
+extra package is needed); elsewhere it polls the directory tree and compares
+directory mtimes. On Windows the file sizes and mtimes come with the directory
+listing at no extra cost, so in-place edits are seen as well; on other
+systems without inotify only added, removed and renamed entries are.
+
+Reported directories are collected by a ChangeCoalescer. A directory is
+synced once no further change arrived for the debounce time (or the changes
+have been coming for the maximum delay), and nested or numerous directories
+are merged, so a burst of changes becomes a few small jobs instead of many.
+watch_commands turns the directories into targeted robocopy commands:
+directories whose files changed are copied one level deep (/LEV:1), new
+directories with their whole subtree.
+"""
+
+import os
+import sys
+import time
+import errno
+import ctypes
+import select
+import struct
+import logging
+import threading
+
+from robocopy_engine import parse_command
+from robocopy_failures import batch_switches
+from robocopy_utils import relative_path
+
+# Seconds without further changes before a directory is synced
+WATCH_DEBOUNCE = 2.0
+# Seconds a directory that keeps changing waits at most
+WATCH_MAX_DELAY = 30.0
+# Seconds between two scans of the polling watcher
+POLL_INTERVAL = 5.0
+# Directories synced by one dispatch; more are merged into their parents
+MAX_WATCH_TARGETS = 16
+
+BACKEND_INOTIFY = "inotify"
+BACKEND_POLLING = "polling"
+
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_DONT_FOLLOW = 0x02000000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (_IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+               | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR | _IN_DONT_FOLLOW)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _parent(rel_dir):
+    return os.path.dirname(rel_dir)
+
+
+def _contains(ancestor, rel_dir):
+    return ancestor == "" or rel_dir == ancestor or rel_dir.startswith(ancestor + os.sep)
+
+
+class ChangeCoalescer:
+    """Collects changed directories and releases them after a debounce window"""
+
+    def __init__(self, debounce=WATCH_DEBOUNCE, max_delay=WATCH_MAX_DELAY, max_targets=MAX_WATCH_TARGETS):
+        """
+        Args:
+            debounce (float): Quiet seconds before changes are released
+            max_delay (float): Seconds after the first change at which changes
+                are released even if more keep arriving
+            max_targets (int): Directories released at once; more are merged
+                into their parent directories
+        """
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.max_targets = max_targets
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._first = None
+        self._last = None
+        self.events = 0
+
+    def add(self, rel_dir, recursive=False, when=None):
+        """
+        Record a change (safe from any thread)
+
+        Args:
+            rel_dir (str): Changed directory relative to the source ('' = root)
+            recursive (bool): The whole subtree needs syncing (a new or moved
+                directory), not only the directory's own entries
+        """
+        when = time.monotonic() if when is None else when
+        with self._lock:
+            self.events += 1
+            self._first = self._first if self._first is not None else when
+            self._last = when
+            for pending, pending_recursive in self._pending.items():
+                if pending_recursive and _contains(pending, rel_dir):
+                    return
+            if recursive:
+                self._pending = {path: flag for path, flag in self._pending.items()
+                                 if not _contains(rel_dir, path)}
+            self._pending[rel_dir] = recursive or self._pending.get(rel_dir, False)
+            if len(self._pending) > self.max_targets:
+                self._merge()
+
+    def _merge(self):
+        # Sync the deepest directories through their parents until few enough are left
+        while len(self._pending) > self.max_targets:
+            depth = max(path.count(os.sep) + 1 if path else 0 for path in self._pending)
+            if depth == 0:
+                break
+            merged = {}
+            for path, recursive in self._pending.items():
+                if path and path.count(os.sep) + 1 == depth:
+                    path, recursive = _parent(path), True
+                merged[path] = merged.get(path, False) or recursive
+            self._pending = {path: recursive for path, recursive in merged.items()
+                             if not any(flag and other != path and _contains(other, path)
+                                        for other, flag in merged.items())}
+
+    @property
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def due(self, when=None):
+        """
+        Release the collected changes once the debounce window has passed
+
+        Returns:
+            list: (rel_dir, recursive) tuples sorted by path; [] while waiting
+        """
+        when = time.monotonic() if when is None else when
+        with self._lock:
+            if not self._pending:
+                return []
+            if when - self._last < self.debounce and when - self._first < self.max_delay:
+                return []
+            targets = sorted(self._pending.items())
+            self._pending = {}
+            self._first = self._last = None
+            return targets
+
+
+class _Watcher:
+    """Background thread reporting changed directories below a source directory"""
+
+    backend = None
+
+    def __init__(self, source, on_change, ignore=None):
+        """
+        Args:
+            source (str): Directory to watch
+            on_change (callable): Called as on_change(rel_dir, recursive) from
+                the watcher thread
+            ignore (list): Directories (relative to source) whose changes are
+                not reported, such as a destination inside the source
+        """
+        self.source = os.path.normpath(source)
+        self.on_change = on_change
+        self.ignore = [path for path in (ignore or []) if path is not None]
+        self.logger = logging.getLogger(__name__)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"watch-{self.backend}")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _ignored(self, rel_dir):
+        return any(_contains(path, rel_dir) for path in self.ignore)
+
+    def _report(self, rel_dir, recursive=False):
+        if not self._ignored(rel_dir):
+            self.on_change(rel_dir, recursive)
+
+    def _run(self):
+        try:
+            self._watch()
+        except Exception as e:
+            self.logger.error(f"Watching {self.source} failed: {e}")
+
+    def _walk_dirs(self, rel_dir=""):
+        """Yield (rel_dir, DirEntry list) for a subtree, skipping ignored directories"""
+        stack = [rel_dir]
+        while stack and not self._stop.is_set():
+            rel = stack.pop()
+            if self._ignored(rel) and rel:
+                continue
+            try:
+                with os.scandir(os.path.join(self.source, rel) if rel else self.source) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            yield rel, entries
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(os.path.join(rel, entry.name) if rel else entry.name)
+                except OSError:
+                    continue
+
+
+class PollingWatcher(_Watcher):
+    """Finds changed directories by comparing directory mtimes between scans"""
+
+    backend = BACKEND_POLLING
+
+    def __init__(self, source, on_change, ignore=None, interval=POLL_INTERVAL):
+        super().__init__(source, on_change, ignore)
+        self.interval = interval
+
+    def _snapshot(self):
+        snapshot = {}
+        for rel, entries in self._walk_dirs():
+            try:
+                signature = [os.stat(os.path.join(self.source, rel) if rel else self.source).st_mtime_ns]
+            except OSError:
+                continue
+            if os.name == "nt":
+                # Windows directory listings include sizes and mtimes, so in-place edits are seen too
+                for entry in entries:
+                    try:
+                        if not entry.is_dir(follow_symlinks=False):
+                            stat = entry.stat(follow_symlinks=False)
+                            signature.append((entry.name, stat.st_size, stat.st_mtime_ns))
+                    except OSError:
+                        continue
+            snapshot[rel] = tuple(signature)
+        return snapshot
+
+    def _watch(self):
+        previous = self._snapshot()
+        self.logger.info(f"Polling {len(previous)} directories of {self.source} every {self.interval}s")
+        while not self._stop.wait(self.interval):
+            current = self._snapshot()
+            if self._stop.is_set():
+                break
+            for rel, signature in current.items():
+                old = previous.get(rel)
+                if old is None:
+                    self._report(rel, recursive=True)
+                elif old != signature:
+                    self._report(rel)
+            for rel in previous:
+                # A removed directory is purged through its parent
+                if rel not in current and rel and _parent(rel) in current:
+                    self._report(_parent(rel))
+            previous = current
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class InotifyWatcher(_Watcher):
+    """Receives change events from the Linux kernel (inotify)"""
+
+    backend = BACKEND_INOTIFY
+
+    def __init__(self, source, on_change, ignore=None):
+        super().__init__(source, on_change, ignore)
+        self._libc = _load_libc()
+        if self._libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self._dirs = {}
+
+    def _add_watch(self, rel_dir):
+        path = os.path.join(self.source, rel_dir) if rel_dir else self.source
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                raise OSError(error, "Too many directories for inotify (raise fs.inotify.max_user_watches)")
+            return
+        self._dirs[wd] = rel_dir
+
+    def _add_tree(self, rel_dir):
+        for rel, _ in self._walk_dirs(rel_dir):
+            self._add_watch(rel)
+
+    def _watch(self):
+        try:
+            self._add_tree("")
+            self.logger.info(f"Watching {len(self._dirs)} directories of {self.source} with inotify")
+            while not self._stop.is_set():
+                ready, _, _ = select.select([self._fd], [], [], 0.5)
+                if not ready:
+                    continue
+                try:
+                    data = os.read(self._fd, 256 * 1024)
+                except BlockingIOError:
+                    continue
+                self._handle(data)
+        finally:
+            os.close(self._fd)
+
+    def _handle(self, data):
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length].rstrip(b"\0"))
+            offset += _EVENT_HEADER.size + length
+
+            if mask & _IN_Q_OVERFLOW:
+                # Events were lost; sync the whole tree once
+                self.logger.warning("inotify queue overflowed, syncing the whole tree")
+                self._report("", recursive=True)
+                continue
+            rel_dir = self._dirs.get(wd)
+            if rel_dir is None:
+                continue
+            if mask & _IN_IGNORED:
+                del self._dirs[wd]
+                continue
+            if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF):
+                if rel_dir:
+                    self._report(_parent(rel_dir))
+                continue
+
+            rel = os.path.join(rel_dir, name) if rel_dir else name
+            if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO):
+                if not self._ignored(rel):
+                    self._add_tree(rel)
+                    self._report(rel, recursive=True)
+                continue
+            self._report(rel_dir)
+
+
+def create_watcher(source, on_change, ignore=None):
+    """
+    Create the best available watcher for a source directory
+
+    Returns:
+        InotifyWatcher or PollingWatcher: Watcher, not yet started
+    """
+    if _load_libc() is not None:
+        try:
+            return InotifyWatcher(source, on_change, ignore)
+        except OSError as e:
+            logging.getLogger(__name__).warning(f"inotify unavailable, polling instead: {e}")
+    return PollingWatcher(source, on_change, ignore)
+
+
+def job_syncs(options, rel_dir):
+    """
+    Check whether a job copies the files of a directory below its source
+
+    Args:
+        options (dict): Options of the job (parse_command)
+        rel_dir (str): Directory relative to the source ('' for the source itself)
+    """
+    if not rel_dir:
+        return True
+    if not (options["copy_subdirs"] or options["copy_empty_subdirs"]):
+        # Only the top directory is copied; changes below it do not matter
+        return False
+    return not options["levels"] or rel_dir.count(os.sep) + 1 < options["levels"]
+
+
+class SyncWatcher:
+    """Watches the source of a command and collects the directories to sync"""
+
+    def __init__(self, command, debounce=WATCH_DEBOUNCE, max_delay=WATCH_MAX_DELAY,
+                 max_targets=MAX_WATCH_TARGETS):
+        """
+        Args:
+            command (str): ROBOCOPY command whose source is watched
+        """
+        self.command = command
+        options = parse_command(command)
+        self.source, self.dest = options["source_path"], options["dest_path"]
+        self.options = options
+        self.coalescer = ChangeCoalescer(debounce, max_delay, max_targets)
+        # Our own copies must not trigger further syncs
+        ignore = [relative_path(self.dest, (self.source,))]
+        self.watcher = create_watcher(self.source, self._add, ignore)
+
+    def _add(self, rel_dir, recursive):
+        # The whole tree is watched, but changes the job would not copy are dropped
+        if job_syncs(self.options, rel_dir):
+            self.coalescer.add(rel_dir, recursive)
+
+    @property
+    def backend(self):
+        return self.watcher.backend
+
+    @property
+    def running(self):
+        return self.watcher.running
+
+    def start(self):
+        self.watcher.start()
+
+    def stop(self):
+        self.watcher.stop()
+
+    def due(self):
+        """Directories to sync now (see ChangeCoalescer.due)"""
+        return self.coalescer.due()
+
+
+def _quote(path):
+    return f'"{path}"'
+
+
+def watch_commands(command, targets):
+    """
+    Build the targeted commands syncing changed directories
+
+    Args:
+        command (str): Command of the watched job
+        targets (list): (rel_dir, recursive) tuples from ChangeCoalescer.due
+
+    Returns:
+        list: Commands, one per directory; empty when the job copies none of
+            the directories
+    """
+    options = parse_command(command)
+    source, dest = options["source_path"], options["dest_path"]
+    recursive_job = options["copy_subdirs"] or options["copy_empty_subdirs"]
+    switches, _ = batch_switches(options)
+    switches = [s for s in switches if not s.upper().startswith("/LEV:")]
+
+    resolved = {}
+    for rel_dir, recursive in targets:
+        if not job_syncs(options, rel_dir):
+            continue
+        # A directory removed again before the sync is purged through its parent
+        while rel_dir and not os.path.isdir(os.path.join(source, rel_dir)):
+            rel_dir, recursive = _parent(rel_dir), False
+        resolved[rel_dir] = resolved.get(rel_dir, False) or recursive
+
+    commands = []
+    for rel_dir in sorted(resolved):
+        if any(flag and other != rel_dir and _contains(other, rel_dir) for other, flag in resolved.items()):
+            continue
+        src = os.path.join(source, rel_dir) if rel_dir else source
+        dst = os.path.join(dest, rel_dir) if rel_dir else dest
+        levels = []
+        if recursive_job and not resolved[rel_dir]:
+            levels = ["/LEV:1"]
+        elif options["levels"] and rel_dir:
+            levels = [f"/LEV:{options['levels'] - rel_dir.count(os.sep) - 1}"]
+        commands.append(" ".join(["robocopy", _quote(src), _quote(dst)] + switches + levels))
+    return commands